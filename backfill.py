@@ -0,0 +1,274 @@
+"""Загрузка полной истории домашек при подключении новых студентов.
+
+Ответ API читается потоком: элементы массива `homeworks` разбираются
+по одному по мере поступления данных и пачками записываются в хранилище,
+поэтому расход памяти не зависит от длины истории. Прерванная загрузка
+продолжается с последней сохранённой домашки, а её статус становится
+начальным статусом студента (от него зависит приоритет его запросов).
+"""
+import argparse
+import codecs
+from http import HTTPStatus
+from itertools import islice
+import json
+import logging
+import time
+
+import homework
+from history import changed_at
+from state import StateStore, TenantState
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 16 * 1024
+BATCH_SIZE = 500
+PAUSE = 1
+WHITESPACE = ' \t\n\r'
+STREAMED = object()
+
+UNEXPECTED_TOKEN = 'Ожидался символ {expected!r}, получен {got!r}.'
+UNEXPECTED_KEY = 'Ключ объекта JSON должен быть строкой: {key!r}'
+BACKFILL_DONE = 'История студента {tenant} загружена: {count} работ.'
+BACKFILL_ERROR = 'Не удалось загрузить историю студента {tenant}: {error}'
+BACKFILL_TOTAL = ('Загрузка истории завершена: {count} работ '
+                  'у {tenants} студентов.')
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Буфер над потоком кусков байтов для поэлементного разбора JSON."""
+
+    def __init__(self, chunks):
+        """Запоминаем источник данных, пока ничего не читая."""
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Дочитываем следующий кусок. False — поток закончился."""
+        if self.eof:
+            return False
+        for chunk in self._chunks:
+            text = self._text_decoder.decode(chunk)
+            if text:
+                self.buffer += text
+                return True
+        self.buffer += self._text_decoder.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def compact(self):
+        """Отбрасываем уже разобранную часть буфера."""
+        if self.pos > len(self.buffer) // 2:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+    def peek(self):
+        """Следующий значащий символ или пустая строка в конце потока."""
+        while True:
+            while (
+                self.pos < len(self.buffer)
+                and self.buffer[self.pos] in WHITESPACE
+            ):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, *chars):
+        """Пропускаем один из ожидаемых символов и возвращаем его."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(UNEXPECTED_TOKEN.format(
+                expected=''.join(chars), got=char
+            ))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Разбираем одно значение JSON целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # Число на границе куска могло оборваться: дочитываем и
+            # разбираем заново, пока после значения не появится символ.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Отдаём элементы массива по одному; '[' уже пропущена."""
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            self.compact()
+            if self.expect(',', ']') == ']':
+                return
+
+
+def iter_json_array(chunks, key, extra=None, streamed=None):
+    """Потоково отдаём элементы массива под ключом key объекта JSON.
+
+    Остальные значения верхнего уровня (например, `current_date`)
+    складываются в словарь extra, сам key — со значением streamed.
+    """
+    stream = JsonStream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        stream.pos += 1
+        return
+    while True:
+        name = stream.value()
+        if not isinstance(name, str):
+            raise ValueError(UNEXPECTED_KEY.format(key=name))
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.pos += 1
+            yield from stream.items()
+            if extra is not None:
+                extra[key] = streamed
+        else:
+            value = stream.value()
+            if extra is not None:
+                extra[name] = value
+        if stream.expect(',', '}') == '}':
+            return
+
+
+def batched(iterable, size):
+    """Делим поток на списки не длиннее size."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def fetch_history(tenant, from_date=0, extra=None, timeout=None):
+    """Потоково получаем домашки студента, изменённые после from_date.
+
+    timeout — пара (connect, read) для requests; по умолчанию берётся
+    у общего AdaptiveFetcher (latency.py), как и при обычном опросе.
+    """
+    import requests
+
+    from latency import default_fetcher
+
+    if timeout is None:
+        timeout = default_fetcher().timeout(homework.ENDPOINT)
+    request_params = dict(
+        url=homework.ENDPOINT,
+        headers={'Authorization': f'OAuth {tenant.practicum_token}'},
+        params={'from_date': from_date}
+    )
+    try:
+        response = requests.get(
+            **request_params, stream=True, timeout=timeout
+        )
+    except requests.RequestException as err:
+        raise ConnectionError(
+            homework.CONNECTION_ERROR.format(**request_params, err=err)
+        )
+    if extra is None:
+        extra = {}
+    with response:
+        if response.status_code != HTTPStatus.OK:
+            raise homework.ServerAnswerException(
+                homework.NOT_OK_STATUS_CODE.format(
+                    **request_params,
+                    code=response.status_code)
+            )
+        yield from iter_json_array(
+            response.iter_content(CHUNK_SIZE), 'homeworks', extra
+        )
+    for key in ('code', 'error'):
+        if key in extra:
+            raise homework.ServerAnswerException(
+                homework.SERVER_FAILURE_ERROR.format(
+                    **request_params,
+                    key=key,
+                    err=extra[key])
+            )
+    if 'homeworks' not in extra:
+        raise KeyError(homework.NO_HOMEWORK_KEY_ERROR)
+
+
+def resume_date(store, tenant, from_date=0):
+    """Откуда загружать историю: не раньше уже сохранённых домашек.
+
+    Последняя сохранённая домашка загружается повторно и перезаписывается:
+    так не теряются домашки, изменённые в ту же секунду.
+    """
+    latest = store.latest_homework(tenant.name)
+    if latest is None:
+        return from_date
+    return max(from_date, int(changed_at(latest, from_date)))
+
+
+def backfill_tenant(tenant, store, from_date=0, batch_size=BATCH_SIZE):
+    """Загружаем историю одного студента и ставим его курсор на сейчас.
+
+    Загрузка продолжается с последней сохранённой домашки (resume_date).
+    Новый студент получает статус последней домашки из истории.
+    """
+    extra = {}
+    count = 0
+    from_date = resume_date(store, tenant, from_date)
+    for batch in batched(fetch_history(tenant, from_date, extra), batch_size):
+        count += store.save_homeworks(tenant.name, batch)
+    current_date = extra.get('current_date')
+    if current_date is not None and store.load_tenant(tenant.name) is None:
+        latest = store.latest_homework(tenant.name) or {}
+        store.save_tenants({tenant.name: TenantState(
+            timestamp=current_date, last_status=latest.get('status')
+        )})
+    logger.info(BACKFILL_DONE.format(tenant=tenant.name, count=count))
+    return count
+
+
+def backfill(tenants, store, from_date=0, batch_size=BATCH_SIZE, pause=PAUSE):
+    """Загружаем историю студентов по очереди, с паузой между запросами."""
+    total = 0
+    for index, tenant in enumerate(tenants):
+        if index:
+            time.sleep(pause)
+        try:
+            total += backfill_tenant(tenant, store, from_date, batch_size)
+        except Exception as error:
+            logger.error(
+                BACKFILL_ERROR.format(tenant=tenant.name, error=error)
+            )
+    logger.info(BACKFILL_TOTAL.format(count=total, tenants=len(tenants)))
+    return total
+
+
+if __name__ == '__main__':
+    from config import ConfigWatcher
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--from-date', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=PAUSE)
+    parser.add_argument('--state', default=None)
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    homework.check_tokens()
+    settings = ConfigWatcher(homework.current_settings()).settings
+    homework.apply_settings(settings)
+    backfill(
+        settings.tenants, StateStore(args.state),
+        args.from_date, args.batch_size, args.pause
+    )
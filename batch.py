@@ -0,0 +1,218 @@
+"""Проверка пачки ответов API за один проход.
+
+В отличие от check_response и parse_status, ошибки не выбрасываются,
+а собираются в результат по номеру ответа, а статусы переводятся
+в целочисленные коды. Сравнение скорости с поэлементными функциями
+(с исключениями и с результатами validate_response/validate_homework),
+в том числе когда некорректна заметная доля ответов:
+
+    python batch.py --responses 10000 --repeat 5 --malformed 0.5
+"""
+import argparse
+import logging
+import timeit
+from typing import List, NamedTuple, Optional
+
+import homework
+
+logger = logging.getLogger(__name__)
+
+NO_HOMEWORK = -1
+INVALID = -2
+NAME_PLACEHOLDER = '\x00'
+
+BENCHMARK_RESULT = ('{name}: {per_response:.2f} мкс на ответ '
+                    '({responses} ответов, лучшее из {repeat}).')
+BENCHMARK_SPEEDUP = ('{name} быстрее поэлементной проверки с исключениями '
+                     'в {speedup:.1f} раза.')
+MALFORMED_SHARE_ERROR = 'Доля некорректных ответов должна быть от 0 до 1.'
+
+
+class BatchResult(NamedTuple):
+    """Результат проверки пачки ответов.
+
+    codes[i] — код статуса первой домашки i-го ответа (номер в
+    statuses), NO_HOMEWORK для пустого списка или INVALID при ошибке;
+    errors — {номер ответа: сообщение об ошибке}.
+    """
+
+    codes: List[int]
+    homeworks: List[Optional[dict]]
+    errors: dict
+    statuses: tuple
+
+
+def status_codes(verdicts=None):
+    """Словарь {статус: код} в порядке вердиктов из настроек."""
+    verdicts = verdicts if verdicts is not None else homework.HOMEWORK_VERDICTS
+    return {status: code for code, status in enumerate(verdicts)}
+
+
+def check_one(response, codes):
+    """Код статуса и домашка одного ответа или сообщение об ошибке."""
+    checked = homework.validate_response(response)
+    if not checked.ok:
+        return INVALID, None, checked.message
+    works = checked.value
+    if not works:
+        return NO_HOMEWORK, None, None
+    work = works[0]
+    if not isinstance(work, dict) or 'homework_name' not in work:
+        return INVALID, work, homework.HOMEWORK_NAME_ERROR
+    code = codes.get(work.get('status'), INVALID)
+    if code == INVALID:
+        if 'status' not in work:
+            return INVALID, work, homework.HOMEWORK_STATUS_ERROR
+        return INVALID, work, homework.UNEXPECTED_HOMEWORK_STATUS.format(
+            status=work['status']
+        )
+    return code, work, None
+
+
+def validate_batch(responses, verdicts=None):
+    """Проверяем пачку ответов API, не выбрасывая исключений."""
+    codes = status_codes(verdicts)
+    result = BatchResult([], [], {}, tuple(codes))
+    append_code = result.codes.append
+    append_homework = result.homeworks.append
+    for index, response in enumerate(responses):
+        code, work, error = check_one(response, codes)
+        append_code(code)
+        append_homework(work)
+        if error is not None:
+            result.errors[index] = error
+    return result
+
+
+def batch_messages(result, verdicts=None):
+    """Сообщения о статусе для проверенной пачки; None — нечего слать.
+
+    Текст совпадает с тем, что вернула бы parse_status. Шаблон
+    форматируется один раз на статус, а для каждой домашки остаётся
+    склеить начало, название и конец.
+    """
+    verdicts = verdicts if verdicts is not None else homework.HOMEWORK_VERDICTS
+    parts = [
+        homework.STATUS_CHANGE_MESSAGE.format(
+            name=NAME_PLACEHOLDER, status=verdicts[status]
+        ).split(NAME_PLACEHOLDER, 1)
+        for status in result.statuses
+    ]
+    return [
+        f'{parts[code][0]}{work["homework_name"]}{parts[code][1]}'
+        if code >= 0 else None
+        for code, work in zip(result.codes, result.homeworks)
+    ]
+
+
+def check_each(responses):
+    """Та же проверка поэлементными функциями — для сравнения."""
+    messages = []
+    errors = {}
+    for index, response in enumerate(responses):
+        try:
+            homework.check_response(response)
+            works = response['homeworks']
+            messages.append(homework.parse_status(works[0]) if works else None)
+        except Exception as error:
+            messages.append(None)
+            errors[index] = error.args[0]
+    return messages, errors
+
+
+def check_results(responses):
+    """Поэлементная проверка без исключений, как в poll с validate."""
+    messages = []
+    errors = {}
+    for index, response in enumerate(responses):
+        checked = homework.validate_response(response)
+        if checked.ok and checked.value:
+            work = checked.value[0]
+            checked = homework.validate_homework(work)
+            message = (
+                homework.status_message(work, checked.value) if checked.ok
+                else None
+            )
+        else:
+            message = None
+        messages.append(message)
+        if not checked.ok:
+            errors[index] = checked.message
+    return messages, errors
+
+
+MALFORMED = (
+    lambda index: [{'homework_name': f'hw{index}'}],
+    lambda index: {'homework_name': f'hw{index}', 'status': 'unknown'},
+    lambda index: [{'status': 'approved'}],
+    lambda index: 'homeworks',
+)
+
+
+def malformed_response(index):
+    """Некорректный ответ одного из видов, которые встречаются в API."""
+    kind = MALFORMED[index % len(MALFORMED)](index)
+    if isinstance(kind, dict):
+        return {'homeworks': [kind], 'current_date': index}
+    if isinstance(kind, list):
+        return {'homeworks': kind, 'current_date': index}
+    return {kind: None, 'current_date': index}
+
+
+def sample_responses(count, malformed=0.02):
+    """Пачка ответов, похожая на настоящую: в основном корректные.
+
+    malformed — доля некорректных ответов, они распределены равномерно.
+    """
+    if not 0 <= malformed <= 1:
+        raise ValueError(MALFORMED_SHARE_ERROR)
+    statuses = list(homework.HOMEWORK_VERDICTS)
+    responses = []
+    bad = 0
+    for index in range(count):
+        if (index + 1) * malformed >= bad + 1:
+            bad += 1
+            responses.append(malformed_response(index))
+        elif index % 10 == 9:
+            responses.append({'homeworks': [], 'current_date': index})
+        else:
+            responses.append({'homeworks': [{
+                'id': index,
+                'homework_name': f'hw{index}.zip',
+                'status': statuses[index % len(statuses)],
+            }], 'current_date': index})
+    return responses
+
+
+def benchmark(count, repeat, malformed=0.02):
+    """Лучшее время на ответ в мкс: {'each': ..., 'results': ..., ...}."""
+    responses = sample_responses(count, malformed)
+    runs = {
+        'each': lambda: check_each(responses),
+        'results': lambda: check_results(responses),
+        'batch': lambda: batch_messages(validate_batch(responses)),
+    }
+    return {
+        name: min(timeit.repeat(run, number=1, repeat=repeat)) / count * 1e6
+        for name, run in runs.items()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--responses', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--malformed', type=float, default=0.02)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(message)s', level=logging.INFO)
+    logging.getLogger(homework.__name__).setLevel(logging.CRITICAL)
+    result = benchmark(args.responses, args.repeat, args.malformed)
+    for name, per_response in result.items():
+        logger.info(BENCHMARK_RESULT.format(
+            name=name, per_response=per_response,
+            responses=args.responses, repeat=args.repeat
+        ))
+    for name in ('results', 'batch'):
+        logger.info(BENCHMARK_SPEEDUP.format(
+            name=name, speedup=result['each'] / result[name]
+        ))
@@ -0,0 +1,158 @@
+"""Клиент Bot API Telegram с пулом keep-alive соединений.
+
+pyTelegramBotAPI отправляет запросы через свой модуль: сессии у него
+свои на каждый поток, а таймауты общие для всех ботов процесса.
+BotApiClient держит на токен бота одну Session с пулом соединений
+HTTP/1.1 keep-alive размером HOMEWORK_BOT_TELEGRAM_POOL и своими
+таймаутами (HOMEWORK_BOT_TELEGRAM_TIMEOUT — «connect,read» в секундах).
+Очередь уведомлений отправляет сообщения разных чатов одновременно,
+не больше одного запроса на соединение пула, так что соединение
+не простаивает, пока ждёт ответа на предыдущее сообщение.
+
+Клиент повторяет нужную боту часть интерфейса TeleBot (send_message,
+get_me) и подменяет его только при заданной HOMEWORK_BOT_TELEGRAM_POOL.
+"""
+from functools import lru_cache
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+POOL_ENV = 'HOMEWORK_BOT_TELEGRAM_POOL'
+TIMEOUT_ENV = 'HOMEWORK_BOT_TELEGRAM_TIMEOUT'
+API_URL_ENV = 'HOMEWORK_BOT_TELEGRAM_API'
+DEFAULT_API_URL = 'https://api.telegram.org'
+DEFAULT_POOL = 4
+DEFAULT_TIMEOUT = (3.05, 10.0)
+
+TIMEOUT_ERROR = ('Таймаут Telegram задаётся как «connect,read» '
+                 'в секундах: {value}')
+POOL_ERROR = 'Размер пула соединений Telegram меньше единицы: {size}'
+API_ERROR = 'Telegram не выполнил {method}: {code} {description}'
+
+
+class BotApiError(Exception):
+    """Ответ Bot API с ok: false или ошибкой HTTP."""
+
+    def __init__(self, method, code, description):
+        """Запоминаем метод, код ошибки и её описание от Telegram."""
+        super().__init__(API_ERROR.format(
+            method=method, code=code, description=description
+        ))
+        self.error_code = code
+        self.description = description
+
+
+def parse_timeout(value):
+    """Пара (connect, read) из строки «connect,read» или одного числа."""
+    try:
+        parts = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise ValueError(TIMEOUT_ERROR.format(value=value))
+    if len(parts) not in (1, 2) or min(parts) <= 0:
+        raise ValueError(TIMEOUT_ERROR.format(value=value))
+    return (parts[0], parts[-1])
+
+
+def pool_size():
+    """Размер пула из HOMEWORK_BOT_TELEGRAM_POOL или None без неё."""
+    size = os.getenv(POOL_ENV)
+    if not size:
+        return None
+    size = int(size)
+    if size < 1:
+        raise ValueError(POOL_ERROR.format(size=size))
+    return size
+
+
+def make_session(size):
+    """Session с пулом из size соединений keep-alive."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=size, pool_block=True
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class BotApiClient:
+    """Запросы к Bot API от имени одного бота через общий пул соединений.
+
+    pool_block не даёт открыть соединений больше pool_size: лишние
+    запросы ждут свободного соединения, а не открывают новое.
+    """
+
+    def __init__(self, token, pool_size=DEFAULT_POOL,
+                 timeout=DEFAULT_TIMEOUT, api_url=DEFAULT_API_URL,
+                 session=None):
+        """Session создаётся сразу, соединения — при первых запросах."""
+        self.token = token
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.base_url = f'{api_url.rstrip("/")}/bot{token}'
+        self.session = (
+            session if session is not None else make_session(pool_size)
+        )
+
+    def call(self, method, **params):
+        """Вызываем метод Bot API; вернём поле result ответа."""
+        response = self.session.post(
+            f'{self.base_url}/{method}', json=params, timeout=self.timeout
+        )
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if not data.get('ok'):
+            raise BotApiError(
+                method, data.get('error_code', response.status_code),
+                data.get('description', response.reason)
+            )
+        return data['result']
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        """Отправляем сообщение в чат chat_id."""
+        params = dict(chat_id=chat_id, text=text)
+        if parse_mode is not None:
+            params['parse_mode'] = parse_mode
+        return self.call('sendMessage', **params)
+
+    def get_me(self):
+        """Проверяем токен бота."""
+        return self.call('getMe')
+
+    def close(self):
+        """Закрываем соединения пула."""
+        self.session.close()
+
+
+@lru_cache(maxsize=None)
+def client_for(token, size, timeout, api_url):
+    """Один BotApiClient на токен бота в процессе."""
+    return BotApiClient(token, size, timeout, api_url)
+
+
+def bot_from_env(bot):
+    """Клиент с пулом для токена bot или сам bot.
+
+    BotApiClient подменяет bot, только если задана
+    HOMEWORK_BOT_TELEGRAM_POOL.
+    """
+    size = pool_size()
+    if size is None:
+        return bot
+    timeout = os.getenv(TIMEOUT_ENV)
+    return client_for(
+        bot.token, size,
+        parse_timeout(timeout) if timeout else DEFAULT_TIMEOUT,
+        os.getenv(API_URL_ENV, DEFAULT_API_URL)
+    )
+
+
+def send_workers():
+    """Сколько сообщений очередь отправляет одновременно."""
+    return pool_size() or 1
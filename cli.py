@@ -0,0 +1,300 @@
+"""Командная строка бота: run, once, bench и inspect-state.
+
+    python cli.py run [--threaded] [--workers 16] [--rate 5]
+    python cli.py once [--budget 60] [--workers 16] [--rate 5]
+    python cli.py bench [--responses 10000] [--tenants 1000] [--messages 500]
+    python cli.py inspect-state [--url http://127.0.0.1:8080]
+
+run — бесконечный цикл опроса, как `python homework.py` (с --threaded —
+всех студентов из настроек в пуле потоков). once — один цикл опроса
+всех студентов для cron и бессерверного запуска в пределах бюджета
+времени: курсоры берутся из базы состояния и сохраняются обратно,
+очередь уведомлений разбирается перед выходом, между опросами процесс
+не висит в памяти. bench —
+замеры скорости проверки ответов, опроса и отправки сообщений на
+локальных заменах API Практикума и Telegram.
+inspect-state — курсоры студентов из базы состояния и статистика
+работающего бота (попадания в кеши, задержки) из его /stats.
+"""
+import argparse
+from datetime import datetime, timezone
+import json
+import logging
+import os
+import sys
+import time
+import urllib.request
+
+import homework
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = ('%(funcName)s - %(lineno)s - %(asctime)s - %(name)s - '
+              '%(levelname)s - %(message)s')
+BENCH_TENANTS = 1000
+BENCH_CYCLES = 3
+BENCH_MESSAGES = 500
+BENCH_CHATS = 50
+BENCH_TOKEN = '1234:standin'
+STATS_TIMEOUT = 5
+STATS_HOST = '127.0.0.1'
+
+BENCH_VALIDATION = ('Проверка ответов, {name}: {per_response:.2f} мкс '
+                    'на ответ ({responses} ответов).')
+BENCH_POLLING = ('Опрос на локальной замене API: {rate:.0f} студентов/с '
+                 '({tenants} студентов × {cycles} цикла, {workers} потоков).')
+BENCH_SENDING = ('Отправка через {name}: {rate:.0f} сообщений/с, '
+                 'соединений: {connections} ({messages} сообщений '
+                 'в {chats} чатов).')
+STATS_UNAVAILABLE = 'Не удалось получить статистику бота с {url}: {error}'
+
+
+def run(args):
+    """Бесконечный цикл опроса."""
+    if args.threaded:
+        from threaded import run_threaded
+
+        run_threaded(args.workers, args.rate)
+    else:
+        homework.main()
+
+
+def once(args):
+    """Один цикл опроса всех студентов; 1 — не все опрошены без ошибок."""
+    from threaded import run_single_shot, SINGLE_SHOT_BUDGET, WORKERS
+
+    return 0 if run_single_shot(
+        args.budget or SINGLE_SHOT_BUDGET, args.workers or WORKERS, args.rate
+    ) else 1
+
+
+def poll_throughput(tenants=BENCH_TENANTS, cycles=BENCH_CYCLES,
+                    workers=None):
+    """Студентов в секунду у ThreadedPoller на StandInSession."""
+    from config import Tenant
+    from history import HistoryStore
+    from outbox import Outbox
+    from standin import CountingBot, StandInSession
+    from threaded import ThreadedPoller, WORKERS
+
+    session = StandInSession()
+    poller = ThreadedPoller(
+        CountingBot(), workers=workers or WORKERS, session=session,
+        outbox=Outbox(':memory:'), history=HistoryStore(':memory:')
+    )
+    tenants = [
+        Tenant(f'bench{index}', f'token{index}', str(index))
+        for index in range(tenants)
+    ]
+    started = time.perf_counter()
+    try:
+        for _ in range(cycles):
+            poller.run_once(tenants)
+            session.now += homework.RETRY_PERIOD
+    finally:
+        poller.close()
+    return len(tenants) * cycles / (time.perf_counter() - started)
+
+
+def send_rate(deliver, server, messages, chats, workers):
+    """Сообщений в секунду при разборе очереди функцией deliver."""
+    from outbox import Outbox
+
+    outbox = Outbox(':memory:')
+    for index in range(messages):
+        outbox.enqueue(str(index % chats), f'Сообщение №{index}')
+    started = time.perf_counter()
+    while outbox.drain(deliver, limit=messages, workers=workers):
+        pass
+    elapsed = time.perf_counter() - started
+    outbox.close()
+    return len(server.messages) / elapsed
+
+
+def send_throughput(messages=BENCH_MESSAGES, chats=BENCH_CHATS, pool=None):
+    """Отправка через TeleBot и через BotApiClient на StandInBotApi.
+
+    TeleBot отправляет сообщения по одному, как сейчас, а BotApiClient —
+    одновременно по pool соединениям. Вернём {имя: (сообщений/с,
+    открыто соединений)}.
+    """
+    from functools import partial
+
+    from telebot import apihelper, TeleBot
+
+    from botapi import BotApiClient, DEFAULT_POOL
+    from standin import StandInBotApi
+
+    pool = pool or DEFAULT_POOL
+    results = {}
+    server = StandInBotApi().start()
+    api_url = apihelper.API_URL
+    apihelper.API_URL = f'{server.url}/bot{{0}}/{{1}}'
+    try:
+        results['TeleBot'] = (send_rate(
+            partial(homework.send_chat_message, TeleBot(token=BENCH_TOKEN)),
+            server, messages, chats, workers=1
+        ), server.connections)
+    finally:
+        apihelper.API_URL = api_url
+        server.stop()
+    server = StandInBotApi().start()
+    client = BotApiClient(BENCH_TOKEN, pool, api_url=server.url)
+    try:
+        results['BotApiClient'] = (send_rate(
+            partial(homework.send_chat_message, client),
+            server, messages, chats, workers=pool
+        ), server.connections)
+    finally:
+        client.close()
+        server.stop()
+    return results
+
+
+def bench(args):
+    """Замеры скорости проверки ответов и опроса."""
+    import batch
+    from threaded import WORKERS
+
+    results = batch.benchmark(args.responses, args.repeat, args.malformed)
+    for name, per_response in results.items():
+        logger.info(BENCH_VALIDATION.format(
+            name=name, per_response=per_response, responses=args.responses
+        ))
+    workers = args.workers or WORKERS
+    logger.info(BENCH_POLLING.format(
+        rate=poll_throughput(args.tenants, args.cycles, workers),
+        tenants=args.tenants, cycles=args.cycles, workers=workers
+    ))
+    for name, (rate, connections) in send_throughput(
+        args.messages, args.chats, args.pool
+    ).items():
+        logger.info(BENCH_SENDING.format(
+            name=name, rate=rate, connections=connections,
+            messages=args.messages, chats=args.chats
+        ))
+
+
+def tenant_cursors(states):
+    """Курсоры и последние статусы студентов для вывода."""
+    return {
+        tenant: {
+            'timestamp': state.timestamp,
+            'from_date': datetime.fromtimestamp(
+                state.timestamp, timezone.utc
+            ).isoformat(),
+            'last_status': state.last_status,
+            'last_verdict': state.last_verdict,
+            'last_error': state.last_error,
+            'seen': len(state.seen),
+        }
+        for tenant, state in sorted(states.items())
+    }
+
+
+def hit_rates(stats):
+    """Добавляем hit_rate ко всем счётчикам попаданий в кеш."""
+    for value in stats.values():
+        if isinstance(value, dict) and {'hits', 'misses'} <= set(value):
+            total = value['hits'] + value['misses']
+            value['hit_rate'] = (
+                round(value['hits'] / total, 4) if total else None
+            )
+    return stats
+
+
+def bot_stats(url):
+    """Статистика работающего бота с его /stats или None.
+
+    Если задан HOMEWORK_BOT_STATS_TOKEN, он передаётся в заголовке
+    Authorization.
+    """
+    from health import STATS_PATH, STATS_TOKEN_ENV
+
+    request = urllib.request.Request(f'{url.rstrip("/")}{STATS_PATH}')
+    token = os.getenv(STATS_TOKEN_ENV)
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(
+            request, timeout=STATS_TIMEOUT
+        ) as response:
+            stats = json.load(response)
+    except (OSError, ValueError) as error:
+        logger.warning(STATS_UNAVAILABLE.format(url=url, error=error))
+        return None
+    stats.pop('status', None)
+    return hit_rates(stats)
+
+
+def inspect_state(args, stream=None):
+    """Печатаем курсоры студентов и статистику бота в формате JSON."""
+    from health import HEALTH_PORT_ENV
+    from state import StateStore
+
+    store = StateStore(args.state)
+    try:
+        report = {'tenants': tenant_cursors(store.load_tenants())}
+    finally:
+        store.close()
+    url = args.url
+    if url is None and os.getenv(HEALTH_PORT_ENV):
+        url = f'http://{STATS_HOST}:{os.getenv(HEALTH_PORT_ENV)}'
+    if url is not None:
+        report['stats'] = bot_stats(url)
+    stream = stream if stream is not None else sys.stdout
+    json.dump(report, stream, ensure_ascii=False, indent=2)
+    stream.write('\n')
+
+
+def build_parser():
+    """Разбор аргументов командной строки."""
+    parser = argparse.ArgumentParser(
+        prog='homework-bot', description=__doc__.splitlines()[0]
+    )
+    parser.add_argument('--verbose', action='store_true')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('run', help='бесконечный цикл опроса')
+    command.add_argument('--threaded', action='store_true')
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--rate', type=float, default=None)
+    command.set_defaults(handler=run)
+    command = commands.add_parser('once', help='один цикл опроса')
+    command.add_argument('--budget', type=float, default=None)
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--rate', type=float, default=None)
+    command.set_defaults(handler=once)
+    command = commands.add_parser('bench', help='замеры скорости')
+    command.add_argument('--responses', type=int, default=10000)
+    command.add_argument('--repeat', type=int, default=3)
+    command.add_argument('--malformed', type=float, default=0.02)
+    command.add_argument('--tenants', type=int, default=BENCH_TENANTS)
+    command.add_argument('--cycles', type=int, default=BENCH_CYCLES)
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--messages', type=int, default=BENCH_MESSAGES)
+    command.add_argument('--chats', type=int, default=BENCH_CHATS)
+    command.add_argument('--pool', type=int, default=None)
+    command.set_defaults(handler=bench)
+    command = commands.add_parser(
+        'inspect-state', help='курсоры студентов и статистика бота'
+    )
+    command.add_argument('--state', default=None)
+    command.add_argument('--url', default=None)
+    command.set_defaults(handler=inspect_state)
+    return parser
+
+
+def main(argv=None):
+    """Выполняем команду; возвращаем код выхода."""
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        format=(LOG_FORMAT if args.command in ('run', 'once')
+                else '%(message)s'),
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        stream=sys.stderr if args.command == 'inspect-state' else sys.stdout
+    )
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Настройки бота с перезагрузкой без перезапуска процесса."""
+import json
+import logging
+import os
+import signal
+import threading
+from typing import NamedTuple
+
+from scheduler import default_quiet_hours, QuietHours
+from templates import DEFAULT_LOCALE, LOCALES, MARKUPS, PLAIN
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH_ENV = 'HOMEWORK_BOT_CONFIG'
+DEFAULT_TENANT_NAME = 'default'
+SETTINGS_KEYS = ('retry_period', 'endpoint', 'verdicts',
+                 'practicum_token', 'chat_id', 'tenants')
+TENANT_REQUIRED_KEYS = ('name', 'practicum_token', 'chat_id')
+
+CONFIG_READ_ERROR = 'Не удалось прочитать файл настроек {path}: {err}'
+CONFIG_NOT_DICT = 'Файл настроек должен содержать объект JSON, а не {type}'
+UNKNOWN_KEYS = 'Неизвестные ключи в файле настроек: {keys}'
+RETRY_PERIOD_ERROR = 'retry_period должен быть целым числом больше 0: {value}'
+ENDPOINT_ERROR = 'endpoint должен быть адресом http(s): {value}'
+VERDICTS_ERROR = 'verdicts должен быть непустым словарём строк: {value}'
+TOKEN_ERROR = 'Параметр {key} должен быть непустой строкой.'
+TENANTS_ERROR = 'tenants должен быть непустым списком объектов: {value}'
+TENANT_KEY_ERROR = 'У получателя №{index} нет параметра {key}.'
+TENANT_DUPLICATE = 'Получатель {name} указан несколько раз.'
+TENANT_CHOICE_ERROR = ('У получателя {name} параметр {key} должен быть '
+                       'одним из: {choices}')
+RELOAD_REQUESTED = 'Получен сигнал SIGHUP, настройки будут перечитаны.'
+RELOAD_SUCCESS = 'Настройки перечитаны из {path}.'
+RELOAD_ERROR = 'Настройки не изменены: {err}'
+
+
+class ConfigError(ValueError):
+    """Исключение на случай некорректных настроек."""
+
+
+class Tenant(NamedTuple):
+    """Студент, статусы работ которого отслеживает бот."""
+
+    name: str
+    practicum_token: str
+    chat_id: str
+    locale: str = DEFAULT_LOCALE
+    markup: str = PLAIN
+    quiet_hours: str = ''
+
+
+class Settings(NamedTuple):
+    """Неизменяемый снимок настроек бота."""
+
+    retry_period: int
+    endpoint: str
+    verdicts: dict
+    practicum_token: str
+    chat_id: str
+    tenants: tuple
+
+
+def read_config_file(path):
+    """Читаем словарь настроек из файла JSON."""
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError) as err:
+        raise ConfigError(CONFIG_READ_ERROR.format(path=path, err=err))
+    if not isinstance(data, dict):
+        raise ConfigError(CONFIG_NOT_DICT.format(type=type(data)))
+    unknown = set(data) - set(SETTINGS_KEYS)
+    if unknown:
+        raise ConfigError(UNKNOWN_KEYS.format(keys=', '.join(sorted(unknown))))
+    return data
+
+
+def check_token(key, value):
+    """Проверяем, что токен или идентификатор чата задан."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        value = str(value)
+    if not isinstance(value, str) or not value:
+        raise ConfigError(TOKEN_ERROR.format(key=key))
+    return value
+
+
+def check_choice(name, key, value, choices):
+    """Проверяем, что параметр студента — одно из допустимых значений."""
+    if value not in choices:
+        raise ConfigError(TENANT_CHOICE_ERROR.format(
+            name=name, key=key, choices=', '.join(choices)
+        ))
+    return value
+
+
+def check_quiet_hours(value):
+    """Проверяем тихие часы студента (ЧЧ:ММ-ЧЧ:ММ или пусто)."""
+    try:
+        QuietHours.parse(value)
+    except ValueError as err:
+        raise ConfigError(err)
+    return value or ''
+
+
+def parse_tenants(raw_tenants):
+    """Проверяем список студентов и приводим его к кортежу Tenant."""
+    if not isinstance(raw_tenants, (list, tuple)) or not raw_tenants:
+        raise ConfigError(TENANTS_ERROR.format(value=raw_tenants))
+    tenants = []
+    names = set()
+    for index, raw in enumerate(raw_tenants):
+        if isinstance(raw, Tenant):
+            raw = raw._asdict()
+        if not isinstance(raw, dict):
+            raise ConfigError(TENANTS_ERROR.format(value=raw))
+        for key in TENANT_REQUIRED_KEYS:
+            if key not in raw:
+                raise ConfigError(
+                    TENANT_KEY_ERROR.format(index=index, key=key)
+                )
+        name, practicum_token, chat_id = (
+            check_token(key, raw[key]) for key in TENANT_REQUIRED_KEYS
+        )
+        tenant = Tenant(
+            name, practicum_token, chat_id,
+            locale=check_choice(
+                name, 'locale', raw.get('locale', DEFAULT_LOCALE), LOCALES
+            ),
+            markup=check_choice(
+                name, 'markup', raw.get('markup', PLAIN), MARKUPS
+            ),
+            quiet_hours=check_quiet_hours(
+                raw.get('quiet_hours', default_quiet_hours())
+            )
+        )
+        if tenant.name in names:
+            raise ConfigError(TENANT_DUPLICATE.format(name=tenant.name))
+        names.add(tenant.name)
+        tenants.append(tenant)
+    return tuple(tenants)
+
+
+def validate(data):
+    """Проверяем словарь настроек и собираем из него Settings."""
+    retry_period = data['retry_period']
+    if (
+        not isinstance(retry_period, int) or isinstance(retry_period, bool)
+        or retry_period <= 0
+    ):
+        raise ConfigError(RETRY_PERIOD_ERROR.format(value=retry_period))
+    endpoint = data['endpoint']
+    if not isinstance(endpoint, str) or not endpoint.startswith(
+            ('http://', 'https://')):
+        raise ConfigError(ENDPOINT_ERROR.format(value=endpoint))
+    verdicts = data['verdicts']
+    if not isinstance(verdicts, dict) or not verdicts or not all(
+        isinstance(key, str) and isinstance(text, str)
+        for key, text in verdicts.items()
+    ):
+        raise ConfigError(VERDICTS_ERROR.format(value=verdicts))
+    practicum_token = check_token('practicum_token', data['practicum_token'])
+    chat_id = check_token('chat_id', data['chat_id'])
+    raw_tenants = data.get('tenants')
+    if raw_tenants is None:
+        raw_tenants = [Tenant(DEFAULT_TENANT_NAME, practicum_token, chat_id)]
+    return Settings(
+        retry_period=retry_period,
+        endpoint=endpoint,
+        verdicts=dict(verdicts),
+        practicum_token=practicum_token,
+        chat_id=chat_id,
+        tenants=parse_tenants(raw_tenants)
+    )
+
+
+def load_settings(defaults, path=None):
+    """Собираем настройки: значения из окружения, поверх них — файл."""
+    data = dict(defaults._asdict())
+    data['tenants'] = None
+    if path:
+        data.update(read_config_file(path))
+    return validate(data)
+
+
+class ConfigWatcher:
+    """Следим за файлом настроек и сигналом SIGHUP.
+
+    Новые настройки подменяют старые целиком и только между итерациями
+    цикла опроса, поэтому итерация никогда не видит смесь двух версий.
+    """
+
+    def __init__(self, defaults, path=None):
+        """Читаем настройки и запоминаем время изменения файла."""
+        self.defaults = defaults
+        self.path = path if path is not None else os.getenv(CONFIG_PATH_ENV)
+        self._mtime = self._get_mtime()
+        self._reload_requested = threading.Event()
+        self.settings = load_settings(defaults, self.path)
+
+    def _get_mtime(self):
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _on_sighup(self, signum, frame):
+        logger.info(RELOAD_REQUESTED)
+        self._reload_requested.set()
+
+    def install_signal_handler(self):
+        """Перечитываем настройки по SIGHUP (только в главном потоке)."""
+        if (
+            hasattr(signal, 'SIGHUP')
+            and threading.current_thread() is threading.main_thread()
+        ):
+            signal.signal(signal.SIGHUP, self._on_sighup)
+
+    def request_reload(self):
+        """Просим перечитать настройки на следующей итерации."""
+        self._reload_requested.set()
+
+    def refresh(self):
+        """Перечитываем настройки, если они менялись.
+
+        Возвращает True, если применён новый снимок настроек. При ошибке
+        в файле продолжаем работать со старыми настройками.
+        """
+        mtime = self._get_mtime()
+        if not self._reload_requested.is_set() and mtime == self._mtime:
+            return False
+        self._reload_requested.clear()
+        self._mtime = mtime
+        try:
+            settings = load_settings(self.defaults, self.path)
+        except ConfigError as err:
+            logger.error(RELOAD_ERROR.format(err=err))
+            return False
+        if settings == self.settings:
+            return False
+        self.settings = settings
+        logger.info(RELOAD_SUCCESS.format(path=self.path))
+        return True
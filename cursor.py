@@ -0,0 +1,58 @@
+"""Курсор опроса по времени сервера с окном перекрытия.
+
+from_date следующего запроса берётся из current_date ответа сервера
+(а не из часов нашего хоста) минус небольшое перекрытие, и курсор
+сдвигается после каждого успешного запроса, а не только после отправки
+сообщения, — окно запроса остаётся коротким сколько бы бот ни работал.
+Домашки, попавшие в перекрытие повторно, отсекаются по паре
+(домашка, date_updated). Если сервер вернул время раньше курсора (часы
+сервера ушли назад или наши спешили), курсор переводится на время
+сервера, а не остаётся в будущем.
+"""
+from history import changed_at
+
+OVERLAP = 60
+
+
+def homework_key(homework):
+    """Ключ домашки: id, а без него — название."""
+    return str(homework.get('id', homework.get('homework_name')))
+
+
+def new_homeworks(state, homeworks):
+    """Домашки ответа, которых ещё не было в окне перекрытия."""
+    if not state.seen:
+        return homeworks
+    seen = set(state.seen)
+    return [
+        homework for homework in homeworks
+        if (homework_key(homework), homework.get('date_updated')) not in seen
+    ]
+
+
+def next_timestamp(timestamp, server_now, overlap=OVERLAP):
+    """from_date следующего запроса по времени сервера server_now."""
+    if not isinstance(server_now, int) or isinstance(server_now, bool):
+        return timestamp
+    if server_now < timestamp:
+        return server_now - overlap
+    return max(timestamp, server_now - overlap)
+
+
+def advance(state, response, overlap=OVERLAP):
+    """Состояние со сдвинутым курсором после успешного запроса.
+
+    В seen остаются только домашки, которые попадут в следующее окно.
+    """
+    timestamp = next_timestamp(
+        state.timestamp, response.get('current_date'), overlap
+    )
+    seen = dict(state.seen)
+    seen.update(
+        (homework_key(homework), homework.get('date_updated'))
+        for homework in response['homeworks']
+    )
+    return state._replace(timestamp=timestamp, seen=tuple(sorted(
+        (key, updated) for key, updated in seen.items()
+        if changed_at({'date_updated': updated}, timestamp - 1) >= timestamp
+    )))
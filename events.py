@@ -0,0 +1,388 @@
+"""Поток событий о сменах статусов для внешних потребителей.
+
+Каждая смена статуса работы, которую замечает опрос, публикуется как
+событие JSON — дашборды получают их сразу, не опрашивая API Практикума
+сами. Выходы перечисляются в переменной HOMEWORK_BOT_EVENTS через
+запятую:
+
+    file:/var/log/homework-events.ndjson — дописывать строки NDJSON;
+    unix:/run/homework-bot.sock — отдавать NDJSON каждому, кто
+        подключится к сокету;
+    sse — /events на сервере проверок (server-sent events).
+
+Публикация не блокирует опрос: у каждого потребителя своя очередь
+ограниченного размера, и если он не успевает читать, самые старые
+события из его очереди отбрасываются и засчитываются в dropped.
+Номера событий идут подряд, поэтому потребитель видит пропуск, а
+клиент SSE после переподключения с Last-Event-ID получает пропущенное
+из последних REPLAY событий.
+"""
+from collections import deque, OrderedDict
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+from history import changed_at
+
+logger = logging.getLogger(__name__)
+
+EVENTS_ENV = 'HOMEWORK_BOT_EVENTS'
+FILE = 'file'
+UNIX = 'unix'
+SSE = 'sse'
+STATUS_CHANGED = 'status_changed'
+QUEUE_SIZE = 1000
+REPLAY = 1000
+STATUSES = 10000
+BATCH_SIZE = 100
+KEEPALIVE = 15
+SINK_RETRY = 5
+
+UNKNOWN_OUTPUT = 'Неизвестный выход событий {output}, доступны: {names}'
+OUTPUT_PATH_MISSING = 'Для выхода событий {name} не указан путь: {output}'
+EVENTS_DROPPED = ('Потребитель {name} не успевает читать события, '
+                  'отброшено {count}.')
+SINK_ERROR = 'Сбой выхода событий {name}: {error}'
+
+
+def encode(event):
+    """Событие одной строкой NDJSON."""
+    return json.dumps(event, ensure_ascii=False) + '\n'
+
+
+class Subscription:
+    """Очередь событий одного потребителя ограниченного размера."""
+
+    def __init__(self, name, size=QUEUE_SIZE):
+        """Пустая очередь; name — для журнала."""
+        self.name = name
+        self.events = deque()
+        self.size = size
+        self.dropped = 0
+        self.lagging = False
+        self.closed = False
+        self._ready = threading.Condition()
+
+    def put(self, events):
+        """Добавляем события; при переполнении отбрасываем самые старые.
+
+        Предупреждение пишем раз, пока потребитель не догонит очередь.
+        """
+        with self._ready:
+            self.events.extend(events)
+            overflow = len(self.events) - self.size
+            for _ in range(max(0, overflow)):
+                self.events.popleft()
+            if overflow > 0:
+                self.dropped += overflow
+                if not self.lagging:
+                    logger.warning(EVENTS_DROPPED.format(
+                        name=self.name, count=self.dropped
+                    ))
+                self.lagging = True
+            self._ready.notify()
+
+    def get(self, timeout=None, limit=BATCH_SIZE):
+        """До limit событий; пустой список, если их не было timeout секунд.
+
+        После close() возвращает None, когда очередь опустеет.
+        """
+        with self._ready:
+            if not self.events and not self.closed:
+                self._ready.wait(timeout)
+            if not self.events:
+                self.lagging = False
+                return None if self.closed else []
+            return [
+                self.events.popleft()
+                for _ in range(min(limit, len(self.events)))
+            ]
+
+    def close(self):
+        """Потребитель дочитывает очередь и останавливается."""
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class EventStream:
+    """Публикация событий всем подписчикам.
+
+    Последние replay событий хранятся, чтобы отдать их подписчику,
+    который переподключился после пропуска. Прежние статусы помнятся
+    для statuses последних изменённых работ: у давно не менявшейся
+    работы previous_status может оказаться None.
+    """
+
+    def __init__(self, replay=REPLAY, queue_size=QUEUE_SIZE,
+                 statuses=STATUSES):
+        """Пока ни событий, ни подписчиков."""
+        self.queue_size = queue_size
+        self.recent = deque(maxlen=replay)
+        self.subscriptions = []
+        self.sinks = []
+        self.statuses = OrderedDict()
+        self.statuses_size = statuses
+        self.published = 0
+        self.sse = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, outputs=None):
+        """Поток с выходами из HOMEWORK_BOT_EVENTS или None без неё."""
+        if outputs is None:
+            outputs = os.getenv(EVENTS_ENV, '')
+        outputs = [item.strip() for item in outputs.split(',') if item.strip()]
+        if not outputs:
+            return None
+        stream = cls()
+        for output in outputs:
+            stream.add_output(output)
+        return stream
+
+    def add_output(self, output):
+        """Подключаем выход вида file:путь, unix:путь или sse."""
+        name, _, path = output.partition(':')
+        if name == SSE:
+            self.sse = True
+            return
+        if name not in SINKS:
+            raise ValueError(UNKNOWN_OUTPUT.format(
+                output=output, names=', '.join([*SINKS, SSE])
+            ))
+        if not path:
+            raise ValueError(OUTPUT_PATH_MISSING.format(
+                name=name, output=output
+            ))
+        self.sinks.append(SINKS[name](self, path).start())
+
+    def subscribe(self, name, last_id=None):
+        """Новая подписка; с last_id в неё сразу попадают события после него.
+
+        Без last_id подписка получает только новые события.
+        """
+        subscription = Subscription(name, self.queue_size)
+        with self._lock:
+            if last_id is not None:
+                subscription.put([
+                    event for event in self.recent if event['id'] > last_id
+                ])
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Отключаем подписку."""
+        with self._lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+        subscription.close()
+
+    def publish(self, **fields):
+        """Публикуем событие; номер id и время published_at ставятся здесь."""
+        with self._lock:
+            self.published += 1
+            event = dict(id=self.published, published_at=time.time(),
+                         **fields)
+            self.recent.append(event)
+            for subscription in self.subscriptions:
+                subscription.put([event])
+        return event
+
+    def status_changed(self, tenant, homework):
+        """Событие о новом статусе работы студента tenant."""
+        key = (tenant, str(homework.get('id', homework.get('homework_name'))))
+        with self._lock:
+            previous = self.statuses.pop(key, None)
+            self.statuses[key] = homework['status']
+            if len(self.statuses) > self.statuses_size:
+                self.statuses.popitem(last=False)
+        now = time.time()
+        return self.publish(
+            type=STATUS_CHANGED,
+            tenant=tenant,
+            homework=key[1],
+            homework_name=homework.get('homework_name'),
+            status=homework['status'],
+            previous_status=previous,
+            changed_at=changed_at(homework, now),
+        )
+
+    def recorder(self, tenant, record=None):
+        """Функция record(homework) для poll, публикующая события.
+
+        Если передана прежняя record (например, запись в журнал), она
+        вызывается перед публикацией.
+        """
+        def publishing(homework):
+            if record is not None:
+                record(homework)
+            self.status_changed(tenant, homework)
+        return publishing
+
+    def stats(self):
+        """Сколько опубликовано, подписчиков и отброшено событий."""
+        with self._lock:
+            return {
+                'published': self.published,
+                'subscribers': len(self.subscriptions),
+                'dropped': sum(
+                    subscription.dropped
+                    for subscription in self.subscriptions
+                ),
+            }
+
+    def close(self):
+        """Дописываем очереди выходов и закрываем их."""
+        for sink in self.sinks:
+            sink.close()
+        with self._lock:
+            subscriptions, self.subscriptions = self.subscriptions, []
+        for subscription in subscriptions:
+            subscription.close()
+
+
+class FileSink(threading.Thread):
+    """Дописываем события строками NDJSON в файл."""
+
+    def __init__(self, stream, path):
+        """Подписываемся на поток; файл открывается в run()."""
+        super().__init__(name='events-file', daemon=True)
+        self.stream = stream
+        self.path = path
+        self.subscription = stream.subscribe(f'file:{path}')
+        self._closing = threading.Event()
+
+    def start(self):
+        """Запускаем поток записи."""
+        super().start()
+        return self
+
+    def run(self):
+        """Открываем файл и пишем в него, пока подписка не закрыта.
+
+        Если файл не открывается, пишем ошибку в журнал и пробуем снова
+        через SINK_RETRY секунд; события тем временем ждут в очереди
+        подписки.
+        """
+        while True:
+            try:
+                file = open(self.path, 'a', encoding='utf-8')
+            except OSError as error:
+                logger.error(SINK_ERROR.format(name=self.name, error=error))
+                if self._closing.wait(SINK_RETRY):
+                    return
+                continue
+            with file:
+                self.write(file)
+            return
+
+    def write(self, file):
+        """Пишем пачками, пока подписка не закрыта."""
+        while True:
+            events = self.subscription.get()
+            if events is None:
+                return
+            try:
+                file.write(''.join(encode(event) for event in events))
+                file.flush()
+            except OSError as error:
+                logger.error(SINK_ERROR.format(name=self.name, error=error))
+
+    def close(self):
+        """Дописываем очередь и закрываем файл."""
+        self._closing.set()
+        self.stream.unsubscribe(self.subscription)
+        self.join()
+
+
+class UnixStreamHandler(socketserver.StreamRequestHandler):
+    """Отдаём события NDJSON подключившемуся к сокету клиенту."""
+
+    def handle(self):
+        """Пишем, пока клиент не отключится или поток не закроют."""
+        stream = self.server.stream
+        subscription = stream.subscribe(f'unix:{self.client_address}')
+        try:
+            while True:
+                events = subscription.get(timeout=KEEPALIVE)
+                if events is None:
+                    return
+                self.wfile.write(''.join(
+                    encode(event) for event in events
+                ).encode('utf-8'))
+        except OSError:
+            pass
+        finally:
+            stream.unsubscribe(subscription)
+
+
+class UnixSocketSink(socketserver.ThreadingUnixStreamServer):
+    """Сокет Unix, к которому подключаются потребители событий."""
+
+    daemon_threads = True
+
+    def __init__(self, stream, path):
+        """Занимаем путь сокета, удаляя оставшийся от прошлого запуска."""
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, UnixStreamHandler)
+        self.stream = stream
+        self.path = path
+        self._thread = None
+
+    def start(self):
+        """Принимаем подключения в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(0.1,), name='events-unix',
+            daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Перестаём принимать подключения и удаляем сокет."""
+        self.shutdown()
+        self._thread.join()
+        self.server_close()
+        os.unlink(self.path)
+
+
+SINKS = {
+    FILE: FileSink,
+    UNIX: UnixSocketSink,
+}
+
+
+def serve_sse(handler, stream):
+    """Отдаём события клиенту SSE через handler (BaseHTTPRequestHandler).
+
+    Пока событий нет, раз в KEEPALIVE секунд шлём комментарий, чтобы
+    прокси не закрывали соединение и отключение клиента замечалось.
+    """
+    last_id = handler.headers.get('Last-Event-ID')
+    subscription = stream.subscribe(
+        f'sse:{handler.client_address[0]}',
+        int(last_id) if last_id and last_id.isdigit() else None
+    )
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+    handler.send_header('Cache-Control', 'no-cache')
+    handler.end_headers()
+    try:
+        while True:
+            events = subscription.get(timeout=KEEPALIVE)
+            if events is None:
+                return
+            handler.wfile.write(''.join(
+                f'id: {event["id"]}\nevent: {event["type"]}\n'
+                f'data: {json.dumps(event, ensure_ascii=False)}\n\n'
+                for event in events
+            ).encode('utf-8') if events else b': keep-alive\n\n')
+            handler.wfile.flush()
+    except OSError:
+        pass
+    finally:
+        stream.unsubscribe(subscription)
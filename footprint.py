@@ -0,0 +1,123 @@
+"""Режим малого расхода памяти для маленьких машин (dyno на 512 МБ).
+
+Включается переменной HOMEWORK_BOT_MEMORY_MB — бюджетом RSS процесса
+в мегабайтах. В этом режиме ответы API разбираются потоком, студенты
+опрашиваются окнами ограниченного размера, а после каждого окна
+MemoryGuard сверяет RSS с бюджетом: при приближении к нему
+выбрасывает устаревшие записи кешей, собирает мусор, возвращает
+свободную память системе и сужает окно опроса, пока память
+не освободится.
+"""
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUDGET_ENV = 'HOMEWORK_BOT_MEMORY_MB'
+MEGABYTE = 1024 * 1024
+SOFT_LIMIT = 0.8
+MIN_WINDOW = 1
+STATM_PATH = '/proc/self/statm'
+
+MEMORY_PRESSURE = ('Память {rss:.0f} МБ из {budget:.0f} МБ: очищаем кеши, '
+                   'окно опроса {window}.')
+MEMORY_RELIEVED = 'После очистки занято {rss:.0f} МБ.'
+MEMORY_BUDGET_ERROR = 'Бюджет памяти должен быть положительным: {budget}'
+
+
+def rss():
+    """Текущий RSS процесса в байтах или None, если узнать его нельзя."""
+    try:
+        with open(STATM_PATH, encoding='ascii') as file:
+            pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def trim_heap():
+    """Возвращаем системе свободную память кучи (только glibc)."""
+    try:
+        import ctypes
+
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def tune_gc():
+    """Замораживаем объекты, созданные при запуске.
+
+    Модули, настройки и шаблоны живут всё время работы бота; после
+    gc.freeze() сборщик не обходит их при каждой полной сборке.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+class MemoryGuard:
+    """Следим за RSS и отступаем, когда он приближается к бюджету.
+
+    window — сколько студентов опрашивать одновременно: при нехватке
+    памяти оно уменьшается вдвое, а когда память есть — вдвое растёт до
+    max_window. reliefs — функции без аргументов, освобождающие память
+    (например, очистка кешей).
+    """
+
+    def __init__(self, budget, max_window, soft_limit=SOFT_LIMIT,
+                 reliefs=(), measure=rss):
+        """Бюджет budget задаётся в байтах."""
+        if budget <= 0:
+            raise ValueError(MEMORY_BUDGET_ERROR.format(budget=budget))
+        self.budget = budget
+        self.soft_limit = soft_limit
+        self.max_window = max_window
+        self.window = max_window
+        self.reliefs = list(reliefs)
+        self.measure = measure
+        self.peak = 0
+
+    @classmethod
+    def from_env(cls, max_window, reliefs=()):
+        """Страж памяти по HOMEWORK_BOT_MEMORY_MB или None без неё."""
+        budget = os.getenv(MEMORY_BUDGET_ENV)
+        if not budget:
+            return None
+        return cls(float(budget) * MEGABYTE, max_window, reliefs=reliefs)
+
+    def add_relief(self, relief):
+        """Добавляем функцию, освобождающую память."""
+        self.reliefs.append(relief)
+
+    def relieve(self):
+        """Очищаем кеши, собираем мусор и отдаём память системе."""
+        for relief in self.reliefs:
+            relief()
+        gc.collect()
+        trim_heap()
+
+    def check(self):
+        """Сверяем RSS с бюджетом; True — памяти мало.
+
+        Заодно собираем молодые поколения мусора, чтобы временные
+        объекты цикла не копились до полной сборки.
+        """
+        gc.collect(1)
+        used = self.measure()
+        if used is None:
+            return False
+        self.peak = max(self.peak, used)
+        if used < self.budget * self.soft_limit:
+            self.window = min(self.max_window, self.window * 2)
+            return False
+        self.window = max(MIN_WINDOW, self.window // 2)
+        logger.warning(MEMORY_PRESSURE.format(
+            rss=used / MEGABYTE, budget=self.budget / MEGABYTE,
+            window=self.window
+        ))
+        self.relieve()
+        used = self.measure()
+        if used is not None:
+            logger.info(MEMORY_RELIEVED.format(rss=used / MEGABYTE))
+        return True
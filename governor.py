@@ -0,0 +1,147 @@
+"""Общий регулятор запросов к API Практикума.
+
+Ограничивает число одновременных запросов к одному хосту и общее число
+запросов в секунду, а свободные места раздаёт по приоритету: сначала
+студентам, чьи работы сейчас на проверке.
+"""
+from collections import defaultdict, deque
+from contextlib import contextmanager
+import heapq
+import itertools
+import math
+import threading
+import time
+from urllib.parse import urlsplit
+
+PRIORITY_IN_REVIEW = 0
+PRIORITY_DEFAULT = 1
+MAX_PER_HOST = 4
+RATE = 5.0
+WAIT_SAMPLES = 1000
+
+MAX_PER_HOST_ERROR = 'max_per_host должен быть больше 0: {value}'
+RATE_ERROR = 'rate должен быть больше 0 или None: {value}'
+
+
+def priority_for_status(status):
+    """Приоритет запроса по последнему известному статусу работы."""
+    if status == 'reviewing':
+        return PRIORITY_IN_REVIEW
+    return PRIORITY_DEFAULT
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по отсортированной выборке; для пустой — 0."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(len(sorted_values) * fraction) - 1)
+    return sorted_values[index]
+
+
+class RequestGovernor:
+    """Лимит одновременных запросов на хост и бюджет запросов в секунду.
+
+    Бюджет — «ведро с жетонами»: rate жетонов в секунду, не больше burst
+    в запасе. Внутри хоста места выдаются по возрастанию priority, при
+    равном приоритете — в порядке очереди.
+    """
+
+    def __init__(self, max_per_host=MAX_PER_HOST, rate=RATE, burst=None):
+        """Задаём лимиты; rate=None отключает бюджет в секунду."""
+        if max_per_host <= 0:
+            raise ValueError(MAX_PER_HOST_ERROR.format(value=max_per_host))
+        if rate is not None and rate <= 0:
+            raise ValueError(RATE_ERROR.format(value=rate))
+        self.max_per_host = max_per_host
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate or 1.0)
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._condition = threading.Condition()
+        self._counter = itertools.count()
+        self._waiters = defaultdict(list)
+        self._active = defaultdict(int)
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _take_token(self):
+        """Берём жетон. Возвращаем 0 или сколько ждать следующего."""
+        if self.rate is None:
+            return 0
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._refilled_at) * self.rate
+        )
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def _record_wait(self, waited):
+        self.requests += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._waits.append(waited)
+
+    def acquire(self, url, priority=None):
+        """Ждём своей очереди на запрос к хосту из url; вернём хост."""
+        if priority is None:
+            priority = PRIORITY_DEFAULT
+        host = urlsplit(url).netloc
+        started = time.monotonic()
+        with self._condition:
+            waiters = self._waiters[host]
+            entry = (priority, next(self._counter))
+            heapq.heappush(waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    if (
+                        waiters[0] == entry
+                        and self._active[host] < self.max_per_host
+                    ):
+                        timeout = self._take_token()
+                        if not timeout:
+                            break
+                    self._condition.wait(timeout)
+            except BaseException:
+                waiters.remove(entry)
+                heapq.heapify(waiters)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(waiters)
+            self._active[host] += 1
+            self._record_wait(time.monotonic() - started)
+            self._condition.notify_all()
+        return host
+
+    def release(self, host):
+        """Освобождаем место хоста после ответа."""
+        with self._condition:
+            self._active[host] -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, url, priority=None):
+        """Контекст одного запроса: занимаем место и отдаём после."""
+        host = self.acquire(url, priority)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    def stats(self):
+        """Метрики очереди: число запросов и время ожидания места."""
+        with self._condition:
+            waits = sorted(self._waits)
+            return {
+                'requests': self.requests,
+                'active': sum(self._active.values()),
+                'queued': sum(map(len, self._waiters.values())),
+                'wait_total': self.wait_total,
+                'wait_max': self.wait_max,
+                'wait_p95': percentile(waits, 0.95),
+            }
@@ -0,0 +1,266 @@
+"""HTTP-проверки живости и готовности бота для оркестратора.
+
+/healthz отвечает 503, если цикл опроса давно не отмечался (например,
+завис запрос без таймаута), — тогда оркестратор перезапустит процесс.
+/readyz проверяет токены и доступность Telegram. Оба ответа
+содержат размеры очередей. /stats отдаёт статистику работающего бота
+(попадания в кеши, задержки запросов) для `cli.py inspect-state`, а
+/events — поток событий о сменах статусов (см. events.py), если он
+включён. Сервер запускается, только если задан порт HOMEWORK_BOT_HEALTH_PORT.
+
+/healthz и /readyz открыты всем, кто достучится до порта. /stats и
+/events отдаются только с того же хоста, а если задан
+HOMEWORK_BOT_STATS_TOKEN — с любого адреса, но лишь с заголовком
+`Authorization: Bearer <токен>`.
+"""
+import hmac
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PORT_ENV = 'HOMEWORK_BOT_HEALTH_PORT'
+HEALTH_HOST_ENV = 'HOMEWORK_BOT_HEALTH_HOST'
+STATS_TOKEN_ENV = 'HOMEWORK_BOT_STATS_TOKEN'
+DEFAULT_HEALTH_HOST = '0.0.0.0'
+HEARTBEAT_TOLERANCE = 2
+HEARTBEAT_GRACE = 60
+TELEGRAM_PROBE_TTL = 60
+POLL_INTERVAL = 0.1
+EVENTS_PATH = '/events'
+STATS_PATH = '/stats'
+PRIVATE_PATHS = (STATS_PATH, EVENTS_PATH)
+
+HEALTH_STARTED = 'Проверки живости доступны на {host}:{port}.'
+HEALTH_REQUEST = 'Запрос проверки: {message}'
+CHECK_ERROR = 'Проверка {name} завершилась ошибкой: {error}'
+ACCESS_DENIED = 'Отказано в доступе к {path} для {client}.'
+
+
+class Heartbeat:
+    """Отметка о последней завершённой итерации цикла опроса."""
+
+    def __init__(self):
+        """Считаем, что цикл жив с момента создания."""
+        self.last = time.monotonic()
+
+    def beat(self):
+        """Отмечаем, что итерация завершилась."""
+        self.last = time.monotonic()
+
+    def age(self):
+        """Сколько секунд прошло с последней отметки."""
+        return time.monotonic() - self.last
+
+
+class TelegramProbe:
+    """Доступность Telegram по getMe, не чаще раза в ttl секунд."""
+
+    def __init__(self, bot, ttl=TELEGRAM_PROBE_TTL):
+        """Запоминаем бота; первая проверка — при первом запросе."""
+        self.bot = bot
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._result = False
+
+    def __call__(self):
+        """True, если последний getMe прошёл успешно."""
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.ttl:
+                self._checked_at = now
+                try:
+                    self.bot.get_me()
+                    self._result = True
+                except Exception as error:
+                    logger.warning(CHECK_ERROR.format(
+                        name='telegram', error=error
+                    ))
+                    self._result = False
+            return self._result
+
+
+def tokens_ready(check_tokens):
+    """True, если check_tokens не нашла отсутствующих токенов."""
+    try:
+        check_tokens()
+    except ValueError:
+        return False
+    return True
+
+
+def safe_call(name, function, default):
+    """Результат function(); при исключении — default."""
+    try:
+        return function()
+    except Exception as error:
+        logger.warning(CHECK_ERROR.format(name=name, error=error))
+        return default
+
+
+class HealthServer(ThreadingHTTPServer):
+    """HTTP-сервер проверок в отдельном фоновом потоке.
+
+    retry_period — функция, возвращающая текущий период опроса;
+    checks, backlogs и stats — словари {имя: функция} для готовности,
+    размеров очередей и статистики; events — events.EventStream для /events.
+    token — токен доступа к /stats и /events с других хостов.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, heartbeat, retry_period, checks=None,
+                 backlogs=None, stats=None, events=None, token=None):
+        """Открываем сокет; обслуживание начинается в start()."""
+        super().__init__(address, HealthHandler)
+        self.token = token
+        self.heartbeat = heartbeat
+        self.retry_period = retry_period
+        self.checks = checks or {}
+        self.backlogs = backlogs or {}
+        self.stats = stats or {}
+        self.events = events
+        self._thread = None
+
+    def max_age(self):
+        """Допустимый возраст отметки: две итерации с запасом."""
+        return self.retry_period() * HEARTBEAT_TOLERANCE + HEARTBEAT_GRACE
+
+    def backlog(self):
+        """Словарь {очередь: размер}; None, если размер не получить."""
+        return {
+            name: safe_call(name, size, None)
+            for name, size in self.backlogs.items()
+        }
+
+    def health(self):
+        """Живость: давно ли завершалась итерация цикла опроса."""
+        age = self.heartbeat.age()
+        max_age = self.max_age()
+        return age <= max_age, {
+            'heartbeat_age': round(age, 3),
+            'max_age': max_age,
+            'backlog': self.backlog(),
+        }
+
+    def readiness(self):
+        """Готовность: все проверки из checks прошли."""
+        checks = {
+            name: bool(safe_call(name, check, False))
+            for name, check in self.checks.items()
+        }
+        return all(checks.values()), {
+            'checks': checks,
+            'backlog': self.backlog(),
+        }
+
+    def statistics(self):
+        """Статистика бота: {имя: результат функции из stats}."""
+        return True, {
+            name: safe_call(name, stats, None)
+            for name, stats in self.stats.items()
+        }
+
+    def start(self):
+        """Обслуживаем запросы в фоновом потоке."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, args=(POLL_INTERVAL,),
+            name='health', daemon=True
+        )
+        self._thread.start()
+        host, port = self.server_address[:2]
+        logger.info(HEALTH_STARTED.format(host=host, port=port))
+        return self
+
+    def stop(self):
+        """Останавливаем сервер и закрываем сокет."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+
+
+class HealthHandler(BaseHTTPRequestHandler):
+    """Ответы на /healthz, /readyz и /stats в формате JSON и /events."""
+
+    routes = {
+        '/healthz': HealthServer.health,
+        '/readyz': HealthServer.readiness,
+        STATS_PATH: HealthServer.statistics,
+    }
+
+    def authorized(self):
+        """Можно ли клиенту читать /stats и /events.
+
+        С токеном сервера нужен заголовок Authorization с ним, без
+        токена пускаем только клиентов с того же хоста.
+        """
+        token = self.server.token
+        if token:
+            return hmac.compare_digest(
+                self.headers.get('Authorization', '').encode('utf-8'),
+                f'Bearer {token}'.encode('utf-8')
+            )
+        return ipaddress.ip_address(self.client_address[0]).is_loopback
+
+    def do_GET(self):
+        """Отвечаем 200, если проверка прошла, иначе 503."""
+        path = self.path.split('?', 1)[0]
+        if path in PRIVATE_PATHS and not self.authorized():
+            logger.warning(ACCESS_DENIED.format(
+                path=path, client=self.client_address[0]
+            ))
+            self.send_error(
+                HTTPStatus.UNAUTHORIZED if self.server.token
+                else HTTPStatus.FORBIDDEN
+            )
+            return
+        events = self.server.events
+        if path == EVENTS_PATH and events is not None and events.sse:
+            from events import serve_sse
+
+            serve_sse(self, events)
+            return
+        route = self.routes.get(path)
+        if route is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        ok, body = route(self.server)
+        body['status'] = 'ok' if ok else 'fail'
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(
+            HTTPStatus.OK if ok else HTTPStatus.SERVICE_UNAVAILABLE
+        )
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        """Пишем запросы в журнал бота, а не в stderr."""
+        logger.debug(HEALTH_REQUEST.format(message=format % args))
+
+
+def start_health_server(heartbeat, retry_period, checks=None, backlogs=None,
+                        port=None, host=None, stats=None, events=None,
+                        token=None):
+    """Запускаем сервер проверок, если задан порт; иначе вернём None."""
+    if port is None:
+        port = os.getenv(HEALTH_PORT_ENV)
+    if port is None or port == '':
+        return None
+    if host is None:
+        host = os.getenv(HEALTH_HOST_ENV, DEFAULT_HEALTH_HOST)
+    if token is None:
+        token = os.getenv(STATS_TOKEN_ENV)
+    return HealthServer(
+        (host, int(port)), heartbeat, retry_period, checks, backlogs, stats,
+        events, token
+    ).start()
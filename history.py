@@ -0,0 +1,175 @@
+"""Журнал смен статусов домашек и статистика по нему.
+
+Журнал только дополняется: каждая увиденная смена статуса записывается
+один раз (повтор того же перехода игнорируется). Записи копятся в памяти
+и сохраняются пачкой одной транзакцией — обычно раз за цикл опроса.
+"""
+from datetime import datetime, timezone
+import os
+import sqlite3
+import statistics
+import threading
+import time
+
+from governor import percentile
+
+HISTORY_PATH_ENV = 'HOMEWORK_BOT_HISTORY'
+DEFAULT_HISTORY_PATH = 'homework_history.sqlite3'
+BATCH_SIZE = 500
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+REVIEWING = 'reviewing'
+VERDICTS = ('approved', 'rejected')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tenant TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    homework_name TEXT,
+    status TEXT NOT NULL,
+    changed_at REAL NOT NULL,
+    seen_at REAL NOT NULL,
+    UNIQUE (tenant, homework_id, status, changed_at)
+);
+CREATE INDEX IF NOT EXISTS transitions_homework
+    ON transitions (tenant, homework_id, changed_at);
+CREATE INDEX IF NOT EXISTS transitions_changed_at
+    ON transitions (changed_at);
+'''
+INSERT = ('INSERT OR IGNORE INTO transitions '
+          '(tenant, homework_id, homework_name, status, changed_at, seen_at) '
+          'VALUES (?, ?, ?, ?, ?, ?)')
+SELECT_HOMEWORK = ('SELECT status, changed_at FROM transitions '
+                   'WHERE tenant = ? AND homework_id = ? '
+                   'ORDER BY changed_at, id')
+SELECT_REVIEWS = '''
+SELECT status, changed_at, next_status, next_changed_at FROM (
+    SELECT tenant, status, changed_at,
+        LEAD(status) OVER homework AS next_status,
+        LEAD(changed_at) OVER homework AS next_changed_at
+    FROM transitions
+    WHERE (:tenant IS NULL OR tenant = :tenant) AND changed_at >= :since
+    WINDOW homework AS (
+        PARTITION BY tenant, homework_id ORDER BY changed_at, id
+    )
+)
+WHERE status = 'reviewing'
+'''
+
+
+def get_history_path():
+    """Путь к журналу из окружения или путь по умолчанию."""
+    return os.getenv(HISTORY_PATH_ENV, DEFAULT_HISTORY_PATH)
+
+
+def changed_at(homework, default):
+    """Время смены статуса из поля date_updated, иначе default."""
+    try:
+        return datetime.strptime(
+            homework['date_updated'], DATE_FORMAT
+        ).replace(tzinfo=timezone.utc).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+class HistoryStore:
+    """Журнал переходов в SQLite с индексами по студенту, работе и времени."""
+
+    def __init__(self, path=None, batch_size=BATCH_SIZE):
+        """Открываем журнал и создаём таблицу, если её нет."""
+        self.path = path if path is not None else get_history_path()
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._buffer = []
+        self.connection = sqlite3.connect(
+            self.path, check_same_thread=False
+        )
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """Сохраняем накопленное и закрываем журнал."""
+        self.flush()
+        with self._lock:
+            self.connection.close()
+
+    def record(self, tenant, homework):
+        """Запоминаем увиденный статус работы студента tenant."""
+        now = time.time()
+        row = (
+            tenant,
+            str(homework.get('id', homework.get('homework_name'))),
+            homework.get('homework_name'),
+            homework['status'],
+            changed_at(homework, now),
+            now
+        )
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        """Число переходов, ещё не записанных в базу."""
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Записываем накопленные переходы одной транзакцией."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            if rows:
+                with self.connection:
+                    self.connection.executemany(INSERT, rows)
+        return len(rows)
+
+    def transitions(self, tenant, homework_id):
+        """Список (статус, время) переходов работы по времени."""
+        self.flush()
+        with self._lock:
+            return self.connection.execute(
+                SELECT_HOMEWORK, (tenant, str(homework_id))
+            ).fetchall()
+
+    def time_in_review(self, tenant, homework_id, now=None):
+        """Сколько секунд работа суммарно провела на проверке.
+
+        Если работа проверяется прямо сейчас, период считается до now.
+        """
+        now = time.time() if now is None else now
+        total = 0.0
+        review_started = None
+        for status, moment in self.transitions(tenant, homework_id):
+            if review_started is not None:
+                total += moment - review_started
+                review_started = None
+            if status == REVIEWING:
+                review_started = moment
+        if review_started is not None:
+            total += now - review_started
+        return total
+
+    def reviewer_turnaround(self, tenant=None, since=0):
+        """Статистика времени от взятия на проверку до вердикта.
+
+        Возвращает словарь count, mean, median, p95 в секундах; tenant=None
+        — по всем студентам.
+        """
+        self.flush()
+        with self._lock:
+            rows = self.connection.execute(
+                SELECT_REVIEWS, {'tenant': tenant, 'since': since}
+            ).fetchall()
+        durations = sorted(
+            next_changed_at - moment
+            for _, moment, next_status, next_changed_at in rows
+            if next_status in VERDICTS
+        )
+        if not durations:
+            return {'count': 0, 'mean': 0.0, 'median': 0.0, 'p95': 0.0}
+        return {
+            'count': len(durations),
+            'mean': statistics.fmean(durations),
+            'median': statistics.median(durations),
+            'p95': percentile(durations, 0.95),
+        }
@@ -1,13 +1,17 @@
 """Программа для проверки статуса домашней работы с помощью бота Telegram."""
+from contextlib import nullcontext
+from functools import partial
 from http import HTTPStatus
 import logging
 import os
 import sys
 import time
+from typing import Any, NamedTuple, Optional
 
 from dotenv import load_dotenv
-import requests
-from telebot import TeleBot
+
+# requests и telebot импортируются внутри функций при первом использовании:
+# вместе они занимают большую часть времени импорта модуля.
 
 
 class ServerAnswerException(Exception):
@@ -53,6 +57,7 @@ STATUS_CHANGE_MESSAGE = 'Изменился статус проверки раб
 NO_NEW_STATUS = 'Домашка ещё не взята на проверку.'
 STATUS_CHANGED = 'Статус работы изменился.'
 ERROR_MESSAGE = 'Сбой в работе программы: {error}'
+ITERATION_TRACE = 'poll'
 
 
 def check_tokens():
@@ -66,10 +71,42 @@ def check_tokens():
         raise ValueError(GLOBAL_TOKENS_ERROR)
 
 
-def send_message(bot, message):
-    """Отправляем сообщение."""
+def current_settings():
+    """Собираем снимок текущих настроек из констант модуля."""
+    from config import Settings
+
+    return Settings(
+        retry_period=RETRY_PERIOD,
+        endpoint=ENDPOINT,
+        verdicts=HOMEWORK_VERDICTS,
+        practicum_token=PRACTICUM_TOKEN,
+        chat_id=TELEGRAM_CHAT_ID,
+        tenants=()
+    )
+
+
+def apply_settings(settings):
+    """Подменяем настройки работающего бота одним обновлением."""
+    from templates import clear_cache
+
+    globals().update(
+        RETRY_PERIOD=settings.retry_period,
+        ENDPOINT=settings.endpoint,
+        HOMEWORK_VERDICTS=settings.verdicts,
+        PRACTICUM_TOKEN=settings.practicum_token,
+        TELEGRAM_CHAT_ID=settings.chat_id,
+        HEADERS={'Authorization': f'OAuth {settings.practicum_token}'}
+    )
+    clear_cache()
+
+
+def send_chat_message(bot, chat_id, message, parse_mode=None):
+    """Отправляем сообщение в чат chat_id."""
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        if parse_mode is None:
+            bot.send_message(chat_id, message)
+        else:
+            bot.send_message(chat_id, message, parse_mode=parse_mode)
         logger.debug(SEND_MESSAGE_SUCCESS.format(message=message))
         return True
     except Exception as err:
@@ -77,20 +114,75 @@ def send_message(bot, message):
     return False
 
 
-def get_api_answer(timestamp):
-    """Делаем запрос к API."""
+def send_message(bot, message):
+    """Отправляем сообщение."""
+    return send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def deliver_message(bot, chat_id, message):
+    """Доставляем сообщение из очереди; в основной чат — send_message."""
+    if chat_id == TELEGRAM_CHAT_ID:
+        return send_message(bot, message)
+    return send_chat_message(bot, chat_id, message)
+
+
+def tenant_headers(tenant):
+    """Заголовок авторизации API от имени студента."""
+    return {'Authorization': f'OAuth {tenant.practicum_token}'}
+
+
+def read_streamed(response):
+    """Разбираем ответ API потоком, не держа в памяти всё тело."""
+    from backfill import CHUNK_SIZE, iter_json_array, STREAMED
+
+    json_response = {}
+    with response:
+        homeworks = list(iter_json_array(
+            response.iter_content(CHUNK_SIZE), 'homeworks', json_response,
+            streamed=STREAMED
+        ))
+    if json_response.get('homeworks') is STREAMED:
+        json_response['homeworks'] = homeworks
+    return json_response
+
+
+def fetch_homeworks(timestamp, headers, http=None, governor=None,
+                    priority=None, stream=False, latency=None):
+    """Делаем запрос к API от имени студента из заголовка headers.
+
+    http — модуль requests или его Session, governor — общий
+    RequestGovernor, если запросы нужно ограничивать. С stream ответ
+    разбирается потоком (режим малого расхода памяти, см. footprint.py).
+    latency — AdaptiveFetcher (latency.py): таймауты по наблюдаемой
+    задержке и дублирование медленных запросов.
+    """
+    import requests
+
+    if http is None:
+        http = requests
     request_params = dict(
         url=ENDPOINT,
-        headers=HEADERS,
+        headers=headers,
         params={'from_date': timestamp}
     )
+    slot = (
+        partial(governor.slot, ENDPOINT, priority) if governor is not None
+        else nullcontext
+    )
+    options = dict(stream=True) if stream else {}
     try:
-        response = requests.get(**request_params)
+        if latency is not None:
+            response = latency.get(
+                http, slot=slot, **request_params, **options
+            )
+        else:
+            with slot():
+                response = http.get(**request_params, **options)
     except requests.RequestException as err:
         raise ConnectionError(
             CONNECTION_ERROR.format(**request_params, err=err)
         )
-    json_response = response.json()
+    json_response = read_streamed(response) if stream else response.json()
     for key in ('code', 'error'):
         if key in json_response:
             raise ServerAnswerException(
@@ -108,60 +200,211 @@ def get_api_answer(timestamp):
     return json_response
 
 
-def check_response(response):
-    """Проверяем данные в ответе API."""
+def get_api_answer(timestamp):
+    """Делаем запрос к API."""
+    from latency import default_fetcher
+
+    return fetch_homeworks(timestamp, HEADERS, latency=default_fetcher())
+
+
+def get_streamed_answer(timestamp):
+    """Делаем запрос к API и разбираем ответ потоком."""
+    from latency import default_fetcher
+
+    return fetch_homeworks(
+        timestamp, HEADERS, stream=True, latency=default_fetcher()
+    )
+
+
+class Validation(NamedTuple):
+    """Результат проверки без исключений.
+
+    ok — проверка пройдена, value — проверенное значение (список домашек
+    или статус), code — код ошибки из ERROR_TYPES, message — её текст.
+    """
+
+    ok: bool
+    value: Any = None
+    code: Optional[str] = None
+    message: Optional[str] = None
+
+
+RESPONSE_TYPE = 'response_type'
+NO_HOMEWORKS_KEY = 'no_homeworks_key'
+HOMEWORKS_TYPE = 'homeworks_type'
+NO_HOMEWORK_NAME = 'no_homework_name'
+NO_HOMEWORK_STATUS = 'no_homework_status'
+UNKNOWN_STATUS = 'unknown_status'
+ERROR_TYPES = {
+    RESPONSE_TYPE: TypeError,
+    NO_HOMEWORKS_KEY: KeyError,
+    HOMEWORKS_TYPE: TypeError,
+    NO_HOMEWORK_NAME: KeyError,
+    NO_HOMEWORK_STATUS: KeyError,
+    UNKNOWN_STATUS: ValueError,
+}
+
+
+def invalid(code, message):
+    """Неудачный результат проверки с кодом ошибки."""
+    return Validation(False, code=code, message=message)
+
+
+def raise_invalid(result):
+    """Выбрасываем исключение, соответствующее коду ошибки."""
+    raise ERROR_TYPES[result.code](result.message)
+
+
+def validate_response(response):
+    """Проверяем ответ API; value — список домашек."""
     if not isinstance(response, dict):
-        raise TypeError(DATA_TYPE_ERROR.format(type=type(response)))
+        return invalid(
+            RESPONSE_TYPE, DATA_TYPE_ERROR.format(type=type(response))
+        )
+    homeworks_data = response.get('homeworks')
+    if isinstance(homeworks_data, list):
+        return Validation(True, homeworks_data)
     if 'homeworks' not in response:
-        raise KeyError(NO_HOMEWORK_KEY_ERROR)
-    homeworks_data = response['homeworks']
-    if not isinstance(homeworks_data, list):
-        raise TypeError(KEY_DATA_TYPE_ERROR.format(type=type(homeworks_data)))
+        return invalid(NO_HOMEWORKS_KEY, NO_HOMEWORK_KEY_ERROR)
+    return invalid(
+        HOMEWORKS_TYPE, KEY_DATA_TYPE_ERROR.format(type=type(homeworks_data))
+    )
 
 
-def parse_status(homework):
-    """Проверяем статус работы."""
-    if 'homework_name' not in homework:
-        raise KeyError(HOMEWORK_NAME_ERROR)
+def validate_homework(homework):
+    """Проверяем домашку из ответа API; value — её статус."""
+    if not isinstance(homework, dict) or 'homework_name' not in homework:
+        return invalid(NO_HOMEWORK_NAME, HOMEWORK_NAME_ERROR)
+    status = homework.get('status')
+    if status in HOMEWORK_VERDICTS:
+        return Validation(True, status)
     if 'status' not in homework:
-        raise KeyError(HOMEWORK_STATUS_ERROR)
-    status = homework['status']
-    if status not in HOMEWORK_VERDICTS:
-        raise ValueError(UNEXPECTED_HOMEWORK_STATUS.format(status=status))
+        return invalid(NO_HOMEWORK_STATUS, HOMEWORK_STATUS_ERROR)
+    return invalid(
+        UNKNOWN_STATUS, UNEXPECTED_HOMEWORK_STATUS.format(status=status)
+    )
+
+
+def check_response(response):
+    """Проверяем данные в ответе API."""
+    result = validate_response(response)
+    if not result.ok:
+        raise_invalid(result)
+
+
+def check_homework(homework):
+    """Проверяем домашку из ответа API и возвращаем её статус."""
+    result = validate_homework(homework)
+    if not result.ok:
+        raise_invalid(result)
+    return result.value
+
+
+def status_message(homework, status):
+    """Сообщение о статусе уже проверенной домашки."""
     return STATUS_CHANGE_MESSAGE.format(
         name=homework['homework_name'],
         status=HOMEWORK_VERDICTS.get(status)
     )
 
 
+def parse_status(homework):
+    """Проверяем статус работы."""
+    return status_message(homework, check_homework(homework))
+
+
+def transition_key(homework):
+    """Ключ идемпотентности смены статуса работы."""
+    return ':'.join(str(homework.get(field, '')) for field in (
+        'id', 'homework_name', 'status', 'date_updated'
+    ))
+
+
+def poll(state, spans, fetch, send, record=None, render=None,
+         validate=validate_response, render_error=None):
+    """Один цикл опроса студента: запрос, проверка, отправка вердикта.
+
+    fetch(timestamp) возвращает ответ API, send(message, key=None,
+    status=None) — True, если сообщение принято (например, поставлено
+    в очередь с ключом идемпотентности key и приоритетом по статусу
+    работы status), record(homework) — запись смены статуса в журнал,
+    render(homework, status) — текст сообщения об уже проверенной
+    домашке (по умолчанию status_message). validate(response) возвращает
+    Validation: некорректный ответ или домашка обрабатываются без
+    исключений — через report_error с render_error.
+    Курсор сдвигается после каждого успешного запроса (см. cursor.py),
+    кроме случая, когда новое сообщение не удалось отправить. Возвращает
+    новое состояние.
+    """
+    from cursor import advance, new_homeworks
+
+    if render is None:
+        render = status_message
+    with spans.span('get_api_answer'):
+        response = fetch(state.timestamp)
+    with spans.span('check_response'):
+        result = validate(response)
+    if not result.ok:
+        return report_error(state, result.message, send, render_error)
+    homeworks = new_homeworks(state, result.value)
+    if len(homeworks) == 0:
+        logger.debug(NO_NEW_STATUS)
+        return advance(state, response)
+    homework = homeworks[0]
+    with spans.span('parse_status'):
+        result = validate_homework(homework)
+        if result.ok:
+            current_verdict = render(homework, result.value)
+    if not result.ok:
+        return report_error(state, result.message, send, render_error)
+    if current_verdict != state.last_verdict:
+        if record is not None:
+            record(homework)
+        with spans.span('send_message'):
+            sent = send(
+                current_verdict, transition_key(homework),
+                status=homework['status']
+            )
+        if not sent:
+            return state._replace(last_error=None)
+        state = state._replace(
+            last_verdict=current_verdict,
+            last_status=homework['status']
+        )
+        logger.debug(STATUS_CHANGED)
+    return advance(state, response)._replace(last_error=None)
+
+
+def report_error(state, error, send, render=None):
+    """Логируем сбой и сообщаем о нём, если это новая ошибка."""
+    message = ERROR_MESSAGE.format(error=error)
+    logger.error(message)
+    if render is not None:
+        message = render(error)
+    if message != state.last_error and send(message):
+        return state._replace(last_error=message)
+    return state
+
+
 def main():
     """Основная логика работы бота."""
     check_tokens()
+    from telebot import TeleBot
+
+    from polling import PollLoop
+
     bot = TeleBot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    last_verdict = None
-    last_error = None
-    while True:
-        try:
-            response = get_api_answer(timestamp)
-            check_response(response)
-            if len(response['homeworks']) == 0:
-                logger.debug(NO_NEW_STATUS)
-                continue
-            current_verdict = parse_status(response['homeworks'][0])
-            if current_verdict != last_verdict and send_message(
-                    bot, current_verdict):
-                last_verdict = current_verdict
-                timestamp = response.get('current_date', timestamp)
-                logger.debug(STATUS_CHANGED)
-            last_error = None
-        except Exception as error:
-            message = ERROR_MESSAGE.format(error=error)
-            logger.error(message)
-            if message != last_error and send_message(bot, message):
-                last_error = message
-        finally:
-            time.sleep(RETRY_PERIOD)
+    loop = PollLoop(bot)
+    try:
+        while True:
+            try:
+                loop.iterate()
+            except Exception as error:
+                logger.error(ERROR_MESSAGE.format(error=error))
+            finally:
+                time.sleep(RETRY_PERIOD)
+    finally:
+        loop.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,293 @@
+"""Таймауты запросов по наблюдаемой задержке и дублирующие запросы.
+
+Для каждого хоста запоминаются длительности последних запросов.
+Таймауты соединения и чтения выводятся из перцентилей этой выборки,
+а не задаются вручную: зависший запрос обрывается, а не держит цикл
+опроса. Если запрос идёт дольше p95, отправляется второй такой же
+(hedged request) и берётся ответ, пришедший первым; доля таких
+запросов ограничена бюджетом, чтобы не удваивать нагрузку на API.
+"""
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import lru_cache
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from governor import percentile
+
+logger = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 500
+REFRESH = 16
+MIN_SAMPLES = 20
+DEFAULT_TIMEOUT = (3.05, 30.0)
+CONNECT_LIMITS = (0.5, 5.0)
+READ_LIMITS = (1.0, 30.0)
+CONNECT_FACTOR = 2
+READ_FACTOR = 4
+HEDGE_QUANTILE = 0.95
+HEDGE_LIMITS = (0.05, 10.0)
+HEDGE_BUDGET = 0.1
+HEDGE_WORKERS = 4
+DEADLINE_FLOOR = 0.1
+
+HEDGE_SENT = 'Запрос к {host} идёт дольше {after:.3f} с, отправляем второй.'
+
+
+def clamp(value, limits):
+    """Значение в пределах limits = (минимум, максимум)."""
+    low, high = limits
+    return min(high, max(low, value))
+
+
+def time_left(deadline):
+    """Секунд до момента deadline по time.monotonic() или None без него."""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def close_response(future):
+    """Закрываем ненужный ответ, чтобы соединение вернулось в пул."""
+    if future.exception() is None:
+        close = getattr(future.result(), 'close', None)
+        if close is not None:
+            close()
+
+
+class LatencyTracker:
+    """Скользящая выборка длительностей запросов по хостам.
+
+    Отсортированная выборка пересчитывается не чаще раза в refresh
+    замеров, чтобы не сортировать её на каждый запрос.
+    """
+
+    def __init__(self, samples=LATENCY_SAMPLES, refresh=REFRESH):
+        """Храним не больше samples последних замеров на хост."""
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=samples))
+        self._fresh = {}
+        self._sorted = {}
+
+    def observe(self, host, seconds):
+        """Запоминаем длительность запроса."""
+        with self._lock:
+            self._latencies[host].append(seconds)
+            self._fresh[host] = self._fresh.get(host, 0) + 1
+
+    def sorted(self, host):
+        """Отсортированная выборка хоста."""
+        with self._lock:
+            latencies = self._sorted.get(host)
+            fresh = self._fresh.get(host, 0)
+            if latencies is None or fresh >= self.refresh or (
+                    fresh and len(latencies) < MIN_SAMPLES):
+                latencies = sorted(self._latencies.get(host, ()))
+                self._sorted[host] = latencies
+                self._fresh[host] = 0
+            return latencies
+
+    def hosts(self):
+        """Хосты, для которых есть замеры."""
+        with self._lock:
+            return list(self._latencies)
+
+
+class AdaptiveFetcher:
+    """GET с таймаутами по перцентилям и дублированием медленных запросов.
+
+    Пока замеров меньше MIN_SAMPLES, действует DEFAULT_TIMEOUT и
+    запросы не дублируются. После этого каждый запрос идёт через пул
+    из workers потоков (основной и, возможно, дублирующий), поэтому
+    workers должно быть не меньше удвоенного числа потоков, которые
+    вызывают get одновременно, иначе пул ограничит число запросов.
+    С deadline (момент по time.monotonic()) таймауты не выходят за него:
+    так разовый запуск укладывается в свой бюджет времени.
+    """
+
+    def __init__(self, tracker=None, hedge=True, budget=HEDGE_BUDGET,
+                 workers=HEDGE_WORKERS, deadline=None):
+        """Доля дублирующих запросов ограничена budget."""
+        self.tracker = tracker if tracker is not None else LatencyTracker()
+        self.deadline = deadline
+        self.hedge = hedge
+        self.budget = budget
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def timeout(self, url):
+        """Пара (connect, read) для requests по выборке хоста url."""
+        timeout = self.timeout_for(self.tracker.sorted(urlsplit(url).netloc))
+        left = time_left(self.deadline)
+        if left is None:
+            return timeout
+        left = max(DEADLINE_FLOOR, left)
+        return tuple(min(part, left) for part in timeout)
+
+    @staticmethod
+    def timeout_for(latencies):
+        """Таймауты по отсортированной выборке latencies."""
+        if len(latencies) < MIN_SAMPLES:
+            return DEFAULT_TIMEOUT
+        return (
+            clamp(CONNECT_FACTOR * percentile(latencies, 0.95),
+                  CONNECT_LIMITS),
+            clamp(READ_FACTOR * percentile(latencies, 0.99), READ_LIMITS),
+        )
+
+    def hedge_after(self, url):
+        """Через сколько секунд дублировать запрос или None."""
+        if not self.hedge:
+            return None
+        latencies = self.tracker.sorted(urlsplit(url).netloc)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return clamp(percentile(latencies, HEDGE_QUANTILE), HEDGE_LIMITS)
+
+    def take_hedge(self):
+        """Разрешаем дублирующий запрос, если бюджет не исчерпан."""
+        with self._lock:
+            if self.hedges >= self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def executor(self):
+        """Пул для запросов, которые могут понадобиться дублировать."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='hedge'
+                )
+            return self._executor
+
+    def timed_get(self, http, host, **request_params):
+        """Один запрос; его длительность попадает в выборку.
+
+        Упавший запрос (таймаут или сбой) засчитывается как длившийся
+        не меньше своего таймаута чтения: иначе после быстрого периода
+        таймауты сжимаются, и когда API замедлится, все запросы будут
+        обрываться по таймауту, а выборка так и не узнает о замедлении.
+        """
+        started = time.monotonic()
+        try:
+            response = http.get(**request_params)
+        except Exception:
+            self.tracker.observe(host, max(
+                time.monotonic() - started, *request_params['timeout']
+            ))
+            raise
+        self.tracker.observe(host, time.monotonic() - started)
+        return response
+
+    def get(self, http, url, slot=nullcontext, **request_params):
+        """Запрос к url через http (модуль requests или Session).
+
+        slot() — контекст, который занимает каждая попытка отдельно
+        (например, место в RequestGovernor): дублирующий запрос тоже
+        ждёт своего места и укладывается в лимиты. Время до
+        дублирования отсчитывается с начала самого запроса, а не
+        с постановки в пул или ожидания места, чтобы очереди не
+        вызывали лишних дублей.
+        """
+        host = urlsplit(url).netloc
+        request_params.update(url=url, timeout=self.timeout(url))
+        with self._lock:
+            self.requests += 1
+        after = self.hedge_after(url)
+        if after is None:
+            with slot():
+                return self.timed_get(http, host, **request_params)
+        executor = self.executor()
+        started = threading.Event()
+        primary = executor.submit(
+            self.started_get, started, slot, http, host, **request_params
+        )
+        started.wait()
+        done, _ = wait([primary], timeout=after)
+        if done or not self.take_hedge():
+            return primary.result()
+        logger.debug(HEDGE_SENT.format(host=host, after=after))
+        hedged = executor.submit(
+            self.hedged_get, primary, slot, http, host, **request_params
+        )
+        return self.first_result(primary, hedged)
+
+    def started_get(self, started, slot, http, host, **request_params):
+        """timed_get в slot(), отмечающий в started, что запрос начался."""
+        try:
+            with slot():
+                started.set()
+                return self.timed_get(http, host, **request_params)
+        finally:
+            started.set()
+
+    def hedged_get(self, primary, slot, http, host, **request_params):
+        """Дублирующий timed_get в своём slot().
+
+        Если, пока ждали места, основной запрос уже ответил, второй
+        не отправляем и возвращаем None.
+        """
+        with slot():
+            if primary.done() and primary.exception() is None:
+                return None
+            return self.timed_get(http, host, **request_params)
+
+    def first_result(self, primary, hedged):
+        """Первый успешный ответ; если оба запроса упали — ошибка первого.
+
+        Дубль, который не отправлялся (вернул None), ответом не считается.
+        """
+        pending = {primary, hedged}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and (
+                        future is primary or future.result() is not None):
+                    if future is hedged:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    loser = primary if future is hedged else hedged
+                    loser.add_done_callback(close_response)
+                    return future.result()
+        return primary.result()
+
+    def stats(self):
+        """Перцентили и таймауты по хостам и счётчики дублирования."""
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hosts': {
+                host: {
+                    'samples': len(latencies),
+                    'p50': percentile(latencies, 0.5),
+                    'p95': percentile(latencies, 0.95),
+                    'p99': percentile(latencies, 0.99),
+                    'timeout': self.timeout_for(latencies),
+                }
+                for host in self.tracker.hosts()
+                for latencies in (self.tracker.sorted(host),)
+            },
+        }
+
+    def close(self):
+        """Останавливаем пул дублирующих запросов."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+@lru_cache(maxsize=None)
+def default_fetcher():
+    """Общий AdaptiveFetcher процесса."""
+    return AdaptiveFetcher()
@@ -0,0 +1,307 @@
+"""Надёжная очередь исходящих сообщений Telegram.
+
+Опрос только ставит сообщение в очередь (SQLite) и сразу идёт дальше,
+а доставкой с повторами занимается отдельный отправитель. Каждое
+сообщение о смене статуса имеет ключ идемпотентности: повторная постановка
+того же перехода (например, после перезапуска) ничего не добавляет.
+
+Telegram не принимает ключей идемпотентности, поэтому если процесс упадёт
+между отправкой и отметкой о ней, сообщение уйдёт ещё раз: очередь
+гарантирует однократную постановку, а доставку — хотя бы один раз.
+
+Сообщения отправляются по приоритету (меньше — раньше), а отложенные
+на тихие часы сообщения одного чата уходят одной сводкой. Сообщения
+разных чатов можно отправлять одновременно (workers), сообщения одного
+чата всегда уходят по порядку.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PATH_ENV = 'HOMEWORK_BOT_OUTBOX'
+DEFAULT_OUTBOX_PATH = 'homework_outbox.sqlite3'
+BATCH_SIZE = 50
+BACKOFF = 5
+MAX_BACKOFF = 600
+SENDER_INTERVAL = 1
+KEEP_SENT = 24 * 60 * 60
+PURGE_INTERVAL = 60 * 60
+DEFAULT_PRIORITY = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    sent_at REAL,
+    priority INTEGER NOT NULL DEFAULT 1,
+    digest INTEGER NOT NULL DEFAULT 0,
+    trace TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due
+    ON outbox (next_attempt_at) WHERE sent_at IS NULL;
+'''
+MIGRATIONS = {
+    'priority': 'ALTER TABLE outbox ADD COLUMN '
+                'priority INTEGER NOT NULL DEFAULT 1',
+    'digest': 'ALTER TABLE outbox ADD COLUMN '
+              'digest INTEGER NOT NULL DEFAULT 0',
+    'trace': 'ALTER TABLE outbox ADD COLUMN trace TEXT',
+}
+ENQUEUE = ('INSERT OR IGNORE INTO outbox '
+           '(key, chat_id, text, created_at, next_attempt_at, priority, '
+           'digest, trace) VALUES (?, ?, ?, ?, ?, ?, ?, ?)')
+SELECT_DUE = ('SELECT id, chat_id, text, attempts, digest, trace FROM outbox '
+              'WHERE sent_at IS NULL AND next_attempt_at <= ? '
+              'ORDER BY priority, id LIMIT ?')
+MARK_SENT = 'UPDATE outbox SET sent_at = ? WHERE id = ?'
+MARK_FAILED = ('UPDATE outbox SET attempts = attempts + 1, '
+               'next_attempt_at = ? WHERE id = ?')
+COUNT_PENDING = 'SELECT COUNT(*) FROM outbox WHERE sent_at IS NULL'
+PURGE_SENT = 'DELETE FROM outbox WHERE sent_at IS NOT NULL AND sent_at < ?'
+
+DUPLICATE_MESSAGE = 'Сообщение с ключом {key} уже есть в очереди.'
+DELIVERY_FAILED = ('Сообщение №{id} не доставлено (попытка {attempt}), '
+                   'повтор через {delay} с.')
+SENDER_ERROR = 'Сбой отправителя очереди: {error}'
+DIGEST_HEADER = 'Пока действовали тихие часы:'
+
+
+def get_outbox_path():
+    """Путь к файлу очереди из окружения или путь по умолчанию."""
+    return os.getenv(OUTBOX_PATH_ENV, DEFAULT_OUTBOX_PATH)
+
+
+def group_digests(rows):
+    """Склеиваем сообщения для сводки в одно сообщение на чат.
+
+    Возвращает (номера, чат, текст, попытки, трассы) в порядке строк
+    rows; сводка чата стоит на месте первого её сообщения.
+    """
+    messages = []
+    digests = {}
+    for message_id, chat_id, text, attempts, digest, trace in rows:
+        if not digest:
+            messages.append(
+                ([message_id], chat_id, [text], attempts, [trace])
+            )
+        elif chat_id in digests:
+            ids, _, texts, _, traces = digests[chat_id]
+            ids.append(message_id)
+            texts.append(text)
+            traces.append(trace)
+        else:
+            digests[chat_id] = (
+                [message_id], chat_id, [text], attempts, [trace]
+            )
+            messages.append(digests[chat_id])
+    for message_ids, chat_id, texts, attempts, traces in messages:
+        text = texts[0] if len(texts) == 1 else '\n\n'.join(
+            [DIGEST_HEADER, *texts]
+        )
+        yield message_ids, chat_id, text, attempts, traces
+
+
+def untraced(deliver, chat_id, text, traces=()):
+    """deliver(chat_id, text) без трассировки."""
+    return deliver(chat_id, text)
+
+
+class Outbox:
+    """Очередь сообщений в SQLite, общая для всех потоков процесса."""
+
+    def __init__(self, path=None, backoff=BACKOFF, max_backoff=MAX_BACKOFF):
+        """Открываем базу очереди и создаём таблицу, если её нет."""
+        self.path = path if path is not None else get_outbox_path()
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.connection = sqlite3.connect(
+            self.path, check_same_thread=False
+        )
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        """Добавляем столбцы, которых нет в очереди старой версии."""
+        columns = {
+            row[1] for row in self.connection.execute(
+                'PRAGMA table_info(outbox)'
+            )
+        }
+        with self.connection:
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.connection.execute(statement)
+
+    def close(self):
+        """Закрываем соединение с базой."""
+        with self._lock:
+            self.connection.close()
+
+    def enqueue(self, chat_id, text, key=None, priority=DEFAULT_PRIORITY,
+                deliver_at=None, digest=False, trace=None):
+        """Ставим сообщение в очередь.
+
+        С одним и тем же key сообщение ставится только раз. deliver_at —
+        не раньше какого времени отправлять, digest — собрать в сводку
+        с другими такими же сообщениями чата, trace — контекст трассы
+        опроса (tracing.Tracer.context). Всегда возвращает True:
+        сообщение либо добавлено, либо уже в очереди.
+        """
+        stored_key = f'{chat_id}:{key}' if key is not None else None
+        now = time.time()
+        with self._lock, self.connection:
+            cursor = self.connection.execute(ENQUEUE, (
+                stored_key, str(chat_id), text, now,
+                now if deliver_at is None else deliver_at,
+                priority, int(digest), trace
+            ))
+        if cursor.rowcount == 0:
+            logger.debug(DUPLICATE_MESSAGE.format(key=stored_key))
+        self._wakeup.set()
+        return True
+
+    def due(self, limit=BATCH_SIZE):
+        """Сообщения, которые пора (пере)отправить, по приоритету."""
+        with self._lock:
+            return self.connection.execute(
+                SELECT_DUE, (time.time(), limit)
+            ).fetchall()
+
+    def mark_sent(self, message_ids):
+        """Отмечаем сообщения доставленными."""
+        now = time.time()
+        with self._lock, self.connection:
+            self.connection.executemany(MARK_SENT, (
+                (now, message_id) for message_id in message_ids
+            ))
+
+    def mark_failed(self, message_ids, attempts):
+        """Откладываем повтор с экспоненциально растущей паузой."""
+        delay = min(self.backoff * 2 ** attempts, self.max_backoff)
+        retry_at = time.time() + delay
+        with self._lock, self.connection:
+            self.connection.executemany(MARK_FAILED, (
+                (retry_at, message_id) for message_id in message_ids
+            ))
+        return delay
+
+    def pending(self):
+        """Число ещё не доставленных сообщений."""
+        with self._lock:
+            return self.connection.execute(COUNT_PENDING).fetchone()[0]
+
+    def purge(self, keep=KEEP_SENT):
+        """Удаляем доставленные сообщения старше keep секунд.
+
+        Ключи недавних сообщений остаются, чтобы отсекать дубликаты.
+        """
+        with self._lock, self.connection:
+            self.connection.execute(PURGE_SENT, (time.time() - keep,))
+
+    def drain(self, deliver, limit=BATCH_SIZE, workers=1, tracer=None):
+        """Отправляем подошедшие сообщения функцией deliver(chat_id, text).
+
+        deliver возвращает True при успешной доставке. С workers > 1
+        сообщения разных чатов отправляются одновременно, не больше
+        workers сразу. С tracer (tracing.Tracer) доставка сообщения
+        попадает спаном в трассу опроса, который его поставил.
+        Возвращает число доставленных сообщений.
+        """
+        if tracer is not None:
+            deliver = partial(tracer.delivered, deliver)
+        else:
+            deliver = partial(untraced, deliver)
+        messages = list(group_digests(self.due(limit)))
+        if workers == 1 or len(messages) < 2:
+            return self.deliver_all(deliver, messages)
+        chats = defaultdict(list)
+        for message in messages:
+            chats[message[1]].append(message)
+        with ThreadPoolExecutor(
+            max_workers=min(workers, len(chats)),
+            thread_name_prefix='outbox'
+        ) as executor:
+            return sum(executor.map(
+                partial(self.deliver_all, deliver), chats.values()
+            ))
+
+    def deliver_all(self, deliver, messages):
+        """Отправляем сообщения по порядку; вернём число доставленных.
+
+        deliver(chat_id, text, traces) получает и контексты трасс.
+        """
+        sent = 0
+        for message_ids, chat_id, text, attempts, traces in messages:
+            if deliver(chat_id, text, traces):
+                self.mark_sent(message_ids)
+                sent += len(message_ids)
+                continue
+            delay = self.mark_failed(message_ids, attempts)
+            logger.warning(DELIVERY_FAILED.format(
+                id=message_ids[0], attempt=attempts + 1, delay=delay
+            ))
+        return sent
+
+    def wait(self, timeout):
+        """Ждём новых сообщений не дольше timeout секунд."""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+    def wake(self):
+        """Будим отправителя, не дожидаясь нового сообщения."""
+        self._wakeup.set()
+
+
+class OutboxSender(threading.Thread):
+    """Фоновый поток, который непрерывно разбирает очередь."""
+
+    def __init__(self, outbox, deliver, interval=SENDER_INTERVAL,
+                 workers=1, tracer=None):
+        """Запоминаем очередь и функцию доставки deliver(chat_id, text).
+
+        workers — сколько сообщений разных чатов отправлять одновременно,
+        tracer — куда писать спаны доставки (см. Outbox.drain).
+        """
+        super().__init__(name='outbox-sender', daemon=True)
+        self.outbox = outbox
+        self.deliver = deliver
+        self.interval = interval
+        self.workers = workers
+        self.tracer = tracer
+        self._stopped = threading.Event()
+        self._purged_at = time.monotonic()
+
+    def run(self):
+        """Разбираем очередь, пока поток не остановят."""
+        while not self._stopped.is_set():
+            try:
+                if self.outbox.drain(
+                    self.deliver, workers=self.workers, tracer=self.tracer
+                ) == BATCH_SIZE:
+                    continue
+                if time.monotonic() - self._purged_at >= PURGE_INTERVAL:
+                    self.outbox.purge()
+                    self._purged_at = time.monotonic()
+            except Exception as error:
+                logger.exception(SENDER_ERROR.format(error=error))
+            self.outbox.wait(self.interval)
+
+    def stop(self):
+        """Останавливаем поток после текущей пачки."""
+        self._stopped.set()
+        self.outbox.wake()
+        self.join()
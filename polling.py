@@ -0,0 +1,170 @@
+"""Цикл опроса основного студента для main().
+
+PollLoop собирает всё, что нужно итерации: очередь и планировщик
+уведомлений, журнал смен статусов, замеры и трассировку, запись ответов
+и страж памяти. main() повторяет iterate() раз в RETRY_PERIOD, а очередь
+сообщений разбирает OutboxSender по своему расписанию: повторы идут
+по нарастающим паузам очереди, а не раз в период опроса, и опрос
+не ждёт Telegram.
+"""
+from functools import partial
+import logging
+import time
+
+import homework
+from botapi import bot_from_env, send_workers
+from config import ConfigWatcher, DEFAULT_TENANT_NAME
+from events import EventStream
+from footprint import MemoryGuard, tune_gc
+from health import Heartbeat, start_health_server, TelegramProbe, tokens_ready
+from history import HistoryStore
+from latency import default_fetcher
+from outbox import Outbox, OutboxSender
+from profiling import IterationSpans, Profiler
+from replay import recorder_from_env
+from scheduler import (
+    default_quiet_hours, NotificationScheduler, QuietHours, rate_limited
+)
+from state import TenantState
+import templates
+from tracing import Tracer
+from transports import deliver_from_env
+
+logger = logging.getLogger(__name__)
+
+STEP_FAILED = 'Шаг итерации {step} завершился ошибкой: {error}'
+
+
+def guarded(step, function, *args):
+    """Вызываем function(*args); ошибку пишем в журнал и не выпускаем.
+
+    Сбой одного служебного шага итерации (запись журнала, проверка
+    памяти) не должен останавливать опрос.
+    """
+    try:
+        return function(*args)
+    except Exception as error:
+        logger.error(STEP_FAILED.format(step=step, error=error))
+        return None
+
+
+class PollLoop:
+    """Итерации опроса студента DEFAULT_TENANT_NAME в чат TELEGRAM_CHAT_ID."""
+
+    def __init__(self, bot):
+        """Готовим всё для итераций; курсор ставится на текущее время.
+
+        Если задан порт сервера проверок, запускаем и его.
+        """
+        bot = bot_from_env(bot)
+        self.bot = bot
+        self.watcher = ConfigWatcher(homework.current_settings())
+        self.watcher.install_signal_handler()
+        homework.apply_settings(self.watcher.settings)
+        self.profiler = Profiler()
+        self.profiler.install_signal_handler()
+        self.spans = Tracer.from_env(IterationSpans())
+        self.outbox = Outbox()
+        self.scheduler = NotificationScheduler(self.outbox, {
+            homework.TELEGRAM_CHAT_ID: QuietHours.parse(default_quiet_hours())
+        }, tracer=self.spans)
+        self.send = self.scheduler.sender(homework.TELEGRAM_CHAT_ID)
+        self.deliver = rate_limited(
+            deliver_from_env(partial(homework.deliver_message, bot))
+        )
+        self.history = HistoryStore()
+        self.record = partial(self.history.record, DEFAULT_TENANT_NAME)
+        self.events = EventStream.from_env()
+        if self.events is not None:
+            self.record = self.events.recorder(
+                DEFAULT_TENANT_NAME, self.record
+            )
+        self.heartbeat = Heartbeat()
+        stats = {
+            'templates': templates.cache_stats,
+            'latency': default_fetcher().stats,
+            'spans': self.spans.stats,
+        }
+        if self.events is not None:
+            stats['events'] = self.events.stats
+        start_health_server(
+            self.heartbeat,
+            retry_period=lambda: homework.RETRY_PERIOD,
+            checks={
+                'tokens': partial(tokens_ready, homework.check_tokens),
+                'telegram': TelegramProbe(bot),
+            },
+            backlogs={
+                'outbox': self.outbox.pending,
+                'history': self.history.pending,
+            },
+            stats=stats,
+            events=self.events
+        )
+        self.memory = MemoryGuard.from_env(max_window=1)
+        self.fetch = (
+            homework.get_streamed_answer if self.memory is not None
+            else homework.get_api_answer
+        )
+        recorder = recorder_from_env()
+        if recorder is not None:
+            self.fetch = recorder.wrap(self.fetch, DEFAULT_TENANT_NAME)
+        self.state = TenantState(timestamp=int(time.time()))
+        if self.memory is not None:
+            tune_gc()
+        self.sender = OutboxSender(
+            self.outbox, self.deliver, workers=send_workers(),
+            tracer=self.spans
+        )
+        self.sender.start()
+
+    def refresh_settings(self):
+        """Перечитываем настройки, если файл изменился."""
+        if self.watcher.refresh():
+            homework.apply_settings(self.watcher.settings)
+
+    def iterate(self):
+        """Одна итерация: опрос и запись журнала.
+
+        Ошибки служебных шагов пишутся в журнал (см. guarded) и не
+        прерывают ни итерацию, ни цикл опроса.
+        """
+        guarded('refresh_settings', self.refresh_settings)
+        guarded('profiler', self.profiler.start)
+        self.spans.begin(homework.ITERATION_TRACE, tenant=DEFAULT_TENANT_NAME)
+        try:
+            self.state = homework.poll(
+                self.state, self.spans, self.fetch, self.send, self.record,
+                validate=homework.validate_response,
+                render_error=templates.render_error
+            )
+        except Exception as error:
+            self.spans.fail(error)
+            self.state = homework.report_error(
+                self.state, error, self.send, templates.render_error
+            )
+        finally:
+            guarded('history', self.history.flush)
+            guarded('profiler', self.profiler.stop)
+            guarded('spans', self.spans.finish)
+            if self.memory is not None:
+                guarded('memory', self.memory.check)
+            self.heartbeat.beat()
+        return self.state
+
+    def close(self):
+        """Останавливаем отправителя, дописываем трассы и события.
+
+        Сообщения, которые уже пора отправить, доставляем перед
+        закрытием баз, чтобы остановка не задерживала уведомления.
+        """
+        self.sender.stop()
+        guarded(
+            'drain_outbox', partial(self.outbox.drain, tracer=self.spans),
+            self.deliver
+        )
+        self.spans.close()
+        if self.events is not None:
+            self.events.close()
+        self.history.close()
+        self.outbox.close()
@@ -0,0 +1,197 @@
+"""Замеры времени этапов опроса и профилирование работающего бота.
+
+Профилирование включается переменной окружения HOMEWORK_BOT_PROFILE
+(число секунд) при запуске или сигналом SIGUSR1 на лету. Профилируются
+только итерации цикла опроса, без сна между ними; по истечении времени
+статистика сохраняется в файл HOMEWORK_BOT_PROFILE_PATH.
+"""
+from collections import Counter, defaultdict
+import cProfile
+from contextlib import contextmanager
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = 'HOMEWORK_BOT_PROFILE'
+PROFILER_ENV = 'HOMEWORK_BOT_PROFILER'
+PROFILE_PATH_ENV = 'HOMEWORK_BOT_PROFILE_PATH'
+PROFILE_SECONDS = 60
+PROFILERS = ('cprofile', 'sampling')
+DEFAULT_PROFILE_PATHS = {
+    'cprofile': 'homework_profile.prof',
+    'sampling': 'homework_profile.folded',
+}
+SAMPLE_INTERVAL = 0.005
+
+SPANS_SUMMARY = 'Время этапов итерации: {spans}'
+PROFILER_ERROR = 'Неизвестный профилировщик {mode}, доступны: {modes}'
+PROFILE_STARTED = 'Профилирование ({mode}) включено на {seconds} с.'
+PROFILE_SAVED = 'Профиль сохранён в {path}.'
+
+
+class IterationSpans:
+    """Длительность этапов текущей итерации и накопленная статистика.
+
+    Замеры можно вести из нескольких потоков одновременно.
+    """
+
+    def __init__(self):
+        """Начинаем с пустой статистики."""
+        self._lock = threading.Lock()
+        self.current = {}
+        self.totals = defaultdict(lambda: [0, 0.0, 0.0])
+
+    @contextmanager
+    def span(self, name):
+        """Замеряем время выполнения блока под именем name."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.current[name] = self.current.get(name, 0.0) + elapsed
+                total = self.totals[name]
+                total[0] += 1
+                total[1] += elapsed
+                total[2] = max(total[2], elapsed)
+
+    def finish(self):
+        """Логируем этапы закончившейся итерации и начинаем новую."""
+        with self._lock:
+            current, self.current = self.current, {}
+        if current:
+            logger.debug(SPANS_SUMMARY.format(spans='; '.join(
+                f'{name}={elapsed:.3f} с'
+                for name, elapsed in current.items()
+            )))
+
+    def stats(self):
+        """Словарь {этап: (число замеров, сумма, максимум)}."""
+        with self._lock:
+            return {
+                name: tuple(total) for name, total in self.totals.items()
+            }
+
+
+class SamplingProfiler:
+    """Раз в interval секунд запоминаем стек потока thread_id.
+
+    Результат — «свёрнутые» стеки (формат flamegraph.pl): строка стека
+    через ';' и число попаданий.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        """Запускаем фоновый поток, который ждёт включения замеров."""
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._running = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._running.wait()
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_filename}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def enable(self):
+        """Включаем замеры."""
+        self._running.set()
+
+    def disable(self):
+        """Приостанавливаем замеры."""
+        self._running.clear()
+
+    def dump_stats(self, path):
+        """Сохраняем стеки и останавливаем фоновый поток."""
+        self._closed = True
+        self._running.set()
+        self._thread.join()
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.samples.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+class Profiler:
+    """Профилируем итерации цикла опроса в течение заданного времени."""
+
+    def __init__(self, mode=None, path=None):
+        """Читаем настройки из окружения; при HOMEWORK_BOT_PROFILE — старт."""
+        self.mode = mode or os.getenv(PROFILER_ENV, PROFILERS[0])
+        if self.mode not in PROFILERS:
+            raise ValueError(PROFILER_ERROR.format(
+                mode=self.mode, modes=', '.join(PROFILERS)
+            ))
+        self.path = path or os.getenv(
+            PROFILE_PATH_ENV, DEFAULT_PROFILE_PATHS[self.mode]
+        )
+        self._pending = None
+        self._profile = None
+        self._until = None
+        seconds = os.getenv(PROFILE_ENV)
+        if seconds:
+            self.request(float(seconds))
+
+    @property
+    def active(self):
+        """Идёт ли сейчас профилирование."""
+        return self._profile is not None
+
+    def request(self, seconds=PROFILE_SECONDS):
+        """Включаем профилирование со следующей итерации."""
+        self._pending = seconds
+
+    def _on_signal(self, signum, frame):
+        self.request()
+
+    def install_signal_handler(self):
+        """Включаем профилирование по SIGUSR1 (только в главном потоке)."""
+        if (
+            hasattr(signal, 'SIGUSR1')
+            and threading.current_thread() is threading.main_thread()
+        ):
+            signal.signal(signal.SIGUSR1, self._on_signal)
+
+    def start(self):
+        """Начало итерации: включаем замеры, если профилирование идёт."""
+        if self._pending is not None and not self.active:
+            seconds, self._pending = self._pending, None
+            self._until = time.monotonic() + seconds
+            self._profile = (
+                cProfile.Profile() if self.mode == 'cprofile'
+                else SamplingProfiler(threading.get_ident())
+            )
+            logger.info(
+                PROFILE_STARTED.format(mode=self.mode, seconds=seconds)
+            )
+        if self.active:
+            self._profile.enable()
+
+    def stop(self):
+        """Конец итерации: выключаем замеры, по истечении — сохраняем."""
+        if not self.active:
+            return
+        self._profile.disable()
+        if time.monotonic() >= self._until:
+            self.dump()
+
+    def dump(self):
+        """Сохраняем собранный профиль в файл и выключаем профилирование."""
+        profile, self._profile = self._profile, None
+        profile.dump_stats(self.path)
+        logger.info(PROFILE_SAVED.format(path=self.path))
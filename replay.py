@@ -0,0 +1,235 @@
+"""Запись ответов API и их воспроизведение без сети.
+
+Если задана переменная HOMEWORK_BOT_RECORD, бот дописывает каждый ответ
+API (или ошибку запроса) в сжатый файл NDJSON. Имена студентов
+заменяются хешами с солью, своей для каждой записи, логин в имени
+работы и комментарии ревьюеров — заглушкой, а из текста ошибок
+вырезаются токены (он содержит заголовки запроса). Запись можно
+прогнать через check_response, parse_status и сравнение с прошлым
+вердиктом на полной скорости:
+
+    python replay.py homework_recording.ndjson.gz --repeat 100
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+
+import homework
+from profiling import IterationSpans
+from state import TenantState
+
+logger = logging.getLogger(__name__)
+
+RECORD_PATH_ENV = 'HOMEWORK_BOT_RECORD'
+HIDDEN = '…'
+HIDDEN_FIELDS = ('reviewer_comment',)
+LOGIN_SEPARATOR = '__'
+SALT_BYTES = 16
+FLUSH_PERIOD = 1.0
+SECRET_PATTERN = re.compile(
+    r'(OAuth\s+|Bearer\s+|bot(?=\d+:))[^\s\'",}/]+'
+)
+
+RECORDING_TRUNCATED = 'Запись {path} оборвана, читаем до обрыва.'
+REPLAY_SUMMARY = ('Воспроизведено ответов: {responses} за {elapsed:.3f} с '
+                  '({rate:.0f} в секунду), сообщений: {messages}, '
+                  'ошибок: {errors}.')
+SPAN_SUMMARY = '{name}: {count} раз, {total:.3f} с, макс. {longest:.6f} с'
+
+
+class RecordedError(Exception):
+    """Ошибка запроса, сохранённая в записи."""
+
+
+def hide_tenant(name, salt):
+    """Обезличенное имя студента: одно и то же для одного имени и соли."""
+    return hashlib.sha256(salt + str(name).encode('utf-8')).hexdigest()
+
+
+def hide_login(homework_name):
+    """Имя работы <login>__<repo>.zip без логина студента."""
+    if not isinstance(homework_name, str):
+        return homework_name
+    login, separator, repository = homework_name.partition(LOGIN_SEPARATOR)
+    return HIDDEN + separator + repository if separator else homework_name
+
+
+def hide_fields(work):
+    """Копия домашки без комментария ревьюера и логина в имени."""
+    work = {
+        key: HIDDEN if key in HIDDEN_FIELDS and value else value
+        for key, value in work.items()
+    }
+    if 'homework_name' in work:
+        work['homework_name'] = hide_login(work['homework_name'])
+    return work
+
+
+def sanitise(response):
+    """Копия ответа API без комментариев ревьюеров и логинов."""
+    if not isinstance(response, dict) or not isinstance(
+            response.get('homeworks'), list):
+        return response
+    return {**response, 'homeworks': [
+        hide_fields(work) if isinstance(work, dict) else work
+        for work in response['homeworks']
+    ]}
+
+
+def redact(text, secrets=()):
+    """Текст без значений secrets и без токенов в заголовках и адресах."""
+    for secret in secrets:
+        if secret:
+            text = text.replace(secret, HIDDEN)
+    return SECRET_PATTERN.sub(rf'\1{HIDDEN}', text)
+
+
+def error_entry(error):
+    """Класс ошибки и её текст без токенов для записи."""
+    return {
+        'error_type': type(error).__name__,
+        'error': redact(str(error), (
+            homework.PRACTICUM_TOKEN, homework.TELEGRAM_TOKEN
+        )),
+    }
+
+
+class Recorder:
+    """Дописываем ответы API в сжатый файл NDJSON.
+
+    Строки сбрасываются на диск не чаще раза в FLUSH_PERIOD секунд:
+    запись, оборванная падением процесса, читается до последней
+    сброшенной строки. Соль для хешей имён живёт только в памяти,
+    поэтому в разных записях один студент получает разные хеши.
+    """
+
+    def __init__(self, path, flush_period=FLUSH_PERIOD):
+        """Открываем файл записи на дозапись."""
+        self.path = path
+        self.flush_period = flush_period
+        self._salt = secrets.token_bytes(SALT_BYTES)
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'ab')
+        self.started = self._flushed = time.monotonic()
+
+    def write(self, tenant, **entry):
+        """Дописываем одну строку записи."""
+        now = time.monotonic()
+        entry = {
+            'offset': round(now - self.started, 3),
+            'tenant': hide_tenant(tenant, self._salt),
+            **entry
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line.encode('utf-8') + b'\n')
+            if now - self._flushed >= self.flush_period:
+                self._file.flush()
+                self._flushed = now
+
+    def wrap(self, fetch, tenant):
+        """fetch(timestamp), который записывает каждый ответ или ошибку."""
+        def recording_fetch(timestamp):
+            try:
+                response = fetch(timestamp)
+            except Exception as error:
+                self.write(tenant, **error_entry(error))
+                raise
+            self.write(tenant, response=sanitise(response))
+            return response
+        return recording_fetch
+
+    def close(self):
+        """Закрываем файл записи."""
+        with self._lock:
+            self._file.close()
+
+
+def recorder_from_env():
+    """Recorder для пути из HOMEWORK_BOT_RECORD или None."""
+    path = os.getenv(RECORD_PATH_ENV)
+    return Recorder(path) if path else None
+
+
+def read_recording(path):
+    """Строки записи по порядку; оборванный хвост пропускается."""
+    with gzip.open(path, 'rb') as file:
+        try:
+            for line in file:
+                if line.endswith(b'\n'):
+                    yield json.loads(line)
+        except (EOFError, gzip.BadGzipFile):
+            logger.warning(RECORDING_TRUNCATED.format(path=path))
+
+
+def replay(entries, spans=None, send=None):
+    """Прогоняем записанные ответы через poll по студентам.
+
+    send(message, key=None, status=None) получает каждое сообщение,
+    которое отправил бы бот. Возвращает словарь responses, messages,
+    errors, elapsed.
+    """
+    spans = spans if spans is not None else IterationSpans()
+    states = {}
+    counts = {'responses': 0, 'messages': 0, 'errors': 0}
+
+    def deliver(message, key=None, status=None):
+        counts['messages'] += 1
+        if send is not None:
+            send(message, key, status)
+        return True
+
+    def render_error(error):
+        counts['errors'] += 1
+        return homework.ERROR_MESSAGE.format(error=error)
+
+    started = time.perf_counter()
+    for entry in entries:
+        counts['responses'] += 1
+        tenant = entry['tenant']
+        state = states.get(tenant) or TenantState(timestamp=0)
+        try:
+            if 'error' in entry:
+                raise RecordedError(entry['error'])
+            state = homework.poll(
+                state, spans, lambda timestamp: entry['response'], deliver,
+                validate=homework.validate_response, render_error=render_error
+            )
+        except Exception as error:
+            state = homework.report_error(state, error, deliver, render_error)
+        states[tenant] = state
+    counts['elapsed'] = time.perf_counter() - started
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('recording')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--show', action='store_true',
+                        help='печатать сообщения, которые отправил бы бот')
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    logging.getLogger(homework.__name__).setLevel(logging.CRITICAL)
+    entries = list(read_recording(args.recording)) * args.repeat
+    spans = IterationSpans()
+    result = replay(entries, spans, send=(
+        (lambda message, *args: print(message)) if args.show else None
+    ))
+    logger.info(REPLAY_SUMMARY.format(
+        rate=result['responses'] / (result['elapsed'] or 1), **result
+    ))
+    for name, (count, total, longest) in spans.stats().items():
+        logger.info(SPAN_SUMMARY.format(
+            name=name, count=count, total=total, longest=longest
+        ))
@@ -0,0 +1,170 @@
+"""Планирование уведомлений: приоритеты, тихие часы, сглаживание.
+
+Вердикты (работа принята или возвращена) важнее сообщения о том, что
+работу взяли на проверку, поэтому стоят в очереди раньше. В тихие часы
+чата сообщения откладываются до их окончания и уходят одной сводкой.
+Скорость отправки в Telegram можно ограничить переменной
+HOMEWORK_BOT_SEND_RATE (сообщений в секунду): пики сглаживаются,
+а важные сообщения всё равно уходят первыми.
+"""
+from datetime import datetime, timedelta
+from functools import partial
+import os
+import re
+import time
+from typing import NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+from botapi import send_workers
+from governor import RequestGovernor
+from outbox import DEFAULT_PRIORITY
+
+SEND_RATE_ENV = 'HOMEWORK_BOT_SEND_RATE'
+QUIET_HOURS_ENV = 'HOMEWORK_BOT_QUIET_HOURS'
+TELEGRAM_HOST = 'https://api.telegram.org/'
+PRIORITY_HIGH = DEFAULT_PRIORITY - 1
+PRIORITY_NORMAL = DEFAULT_PRIORITY
+PRIORITY_LOW = DEFAULT_PRIORITY + 1
+STATUS_PRIORITIES = {
+    'approved': PRIORITY_HIGH,
+    'rejected': PRIORITY_HIGH,
+    'reviewing': PRIORITY_LOW,
+}
+
+QUIET_HOURS_ERROR = ('Тихие часы задаются как ЧЧ:ММ-ЧЧ:ММ [часовой пояс], '
+                     'например 23:00-08:00 Europe/Moscow: {value!r}')
+
+_quiet_hours = re.compile(
+    r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})(?:\s+(\S+))?$'
+)
+
+
+def default_quiet_hours():
+    """Тихие часы по умолчанию из HOMEWORK_BOT_QUIET_HOURS."""
+    return os.getenv(QUIET_HOURS_ENV, '')
+
+
+def notification_priority(status):
+    """Приоритет сообщения о смене статуса (меньше — раньше)."""
+    return STATUS_PRIORITIES.get(status, PRIORITY_NORMAL)
+
+
+class QuietHours(NamedTuple):
+    """Тихие часы чата в минутах от полуночи.
+
+    Если start > end, интервал переходит через полночь. zone — часовой
+    пояс IANA получателя (например, Europe/Moscow); без него часы
+    отсчитываются по местному времени сервера, а на сервере в UTC —
+    по UTC.
+    """
+
+    start: int
+    end: int
+    zone: Optional[str] = None
+
+    @classmethod
+    def parse(cls, value):
+        """Разбираем строку ЧЧ:ММ-ЧЧ:ММ [пояс]; пустая строка — None."""
+        if not value:
+            return None
+        match = _quiet_hours.match(str(value).strip())
+        if match is None:
+            raise ValueError(QUIET_HOURS_ERROR.format(value=value))
+        *times, zone = match.groups()
+        hours_start, minutes_start, hours_end, minutes_end = map(int, times)
+        if max(hours_start, hours_end) > 23 or max(
+                minutes_start, minutes_end) > 59:
+            raise ValueError(QUIET_HOURS_ERROR.format(value=value))
+        if zone is not None:
+            try:
+                ZoneInfo(zone)
+            except (KeyError, ValueError):
+                raise ValueError(QUIET_HOURS_ERROR.format(value=value))
+        return cls(hours_start * 60 + minutes_start,
+                   hours_end * 60 + minutes_end, zone)
+
+    def contains(self, minute):
+        """Попадает ли минута суток в тихие часы."""
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def resume_at(self, now):
+        """Конец тихих часов, если now в них попадает, иначе None."""
+        moment = datetime.fromtimestamp(
+            now, ZoneInfo(self.zone) if self.zone else None
+        )
+        minute = moment.hour * 60 + moment.minute
+        if not self.contains(minute):
+            return None
+        midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = midnight + timedelta(minutes=self.end)
+        if end <= moment:
+            end += timedelta(days=1)
+        return end.timestamp()
+
+
+class NotificationScheduler:
+    """Ставим сообщения в Outbox с приоритетом и с учётом тихих часов."""
+
+    def __init__(self, outbox, quiet_hours=None, clock=None, tracer=None):
+        """quiet_hours — словарь {chat_id: QuietHours}.
+
+        С tracer (tracing.Tracer) сообщение запоминает трассу опроса,
+        который его поставил.
+        """
+        self.outbox = outbox
+        self.tracer = tracer
+        self.quiet_hours = {
+            str(chat_id): hours
+            for chat_id, hours in (quiet_hours or {}).items()
+        }
+        self.clock = clock or time.time
+
+    def set_quiet_hours(self, chat_id, quiet_hours):
+        """Задаём (или снимаем, если None) тихие часы чата."""
+        if quiet_hours is None:
+            self.quiet_hours.pop(str(chat_id), None)
+        else:
+            self.quiet_hours[str(chat_id)] = quiet_hours
+
+    def schedule(self, chat_id, text, key=None, status=None):
+        """Ставим сообщение в очередь; status определяет приоритет."""
+        quiet_hours = self.quiet_hours.get(str(chat_id))
+        resume_at = (
+            quiet_hours.resume_at(self.clock()) if quiet_hours else None
+        )
+        return self.outbox.enqueue(
+            chat_id, text, key,
+            priority=notification_priority(status),
+            deliver_at=resume_at,
+            digest=resume_at is not None,
+            trace=self.tracer.context() if self.tracer is not None else None
+        )
+
+    def sender(self, chat_id):
+        """Функция send(message, key=None, status=None) для чата."""
+        return partial(self.schedule, chat_id)
+
+
+def rate_limited(deliver, rate=None, burst=1, workers=None):
+    """deliver(chat_id, text) не чаще rate раз в секунду.
+
+    Без rate (и без HOMEWORK_BOT_SEND_RATE) возвращается deliver как есть.
+    Одновременно идут до workers отправок (по умолчанию — по размеру
+    пула соединений Telegram, см. botapi.send_workers): лимит скорости
+    не должен отменять параллельную отправку в разные чаты.
+    """
+    if rate is None:
+        rate = os.getenv(SEND_RATE_ENV)
+    if not rate:
+        return deliver
+    governor = RequestGovernor(
+        max_per_host=workers or send_workers(), rate=float(rate),
+        burst=burst
+    )
+
+    def limited(chat_id, text):
+        with governor.slot(TELEGRAM_HOST):
+            return deliver(chat_id, text)
+    return limited
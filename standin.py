@@ -0,0 +1,209 @@
+"""Локальная замена API Практикума и Telegram для замеров.
+
+StandInSession отвечает на запросы как API Практикума, не выходя
+в сеть, — с ней `cli.py bench` и тесты гоняют опрос тысяч студентов.
+StandInBotApi — HTTP-сервер на 127.0.0.1, отвечающий как Bot API
+Telegram: на нём сравнивается отправка через TeleBot и через
+botapi.BotApiClient.
+"""
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+HOMEWORKS = 10
+STANDIN_NOW = 1_700_000_000
+BOT_API_DELAY = 0.005
+POLL_INTERVAL = 0.05
+
+
+class StandInResponse:
+    """Ответ API, который можно читать и целиком, и потоком."""
+
+    status_code = HTTPStatus.OK
+
+    def __init__(self, body):
+        """Тело ответа — байты JSON."""
+        self.body = body
+
+    def json(self):
+        """Тело ответа целиком."""
+        return json.loads(self.body)
+
+    def iter_content(self, chunk_size):
+        """Тело ответа кусками по chunk_size байтов."""
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start:start + chunk_size]
+
+    def __enter__(self):
+        """Ответ как контекст, как у requests."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Закрываем ответ."""
+        self.close()
+
+    def close(self):
+        """Освобождаем тело ответа."""
+        self.body = b''
+
+
+class StandInSession:
+    """Session, отвечающая каждому студенту историей его домашек.
+
+    У каждого студента homeworks принятых работ; current_date в ответе —
+    now, его можно сдвигать между циклами опроса.
+    """
+
+    def __init__(self, homeworks=HOMEWORKS, now=STANDIN_NOW):
+        """Запоминаем размер истории и время сервера."""
+        self.homeworks = homeworks
+        self.now = now
+        self.streamed = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, params=None, stream=False, **kwargs):
+        """Ответ студенту с токеном из заголовка Authorization."""
+        token = headers['Authorization'].split()[-1]
+        with self._lock:
+            self.requests += 1
+            self.streamed += stream
+        return StandInResponse(json.dumps({
+            'homeworks': [{
+                'id': f'{token}-{index}',
+                'homework_name': f'{token}-{index}.zip',
+                'status': 'approved',
+                'reviewer_comment': 'Отлично! ' * 40,
+                'date_updated': '2023-11-14T22:13:00Z',
+            } for index in range(self.homeworks)],
+            'current_date': self.now,
+        }, ensure_ascii=False).encode('utf-8'))
+
+    def close(self):
+        """Закрывать нечего."""
+
+
+class CountingBot:
+    """Бот, который только считает отправленные сообщения."""
+
+    def __init__(self):
+        """Пока ничего не отправлено."""
+        self._lock = threading.Lock()
+        self.sent = 0
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        """Засчитываем сообщение."""
+        with self._lock:
+            self.sent += 1
+
+    def get_me(self):
+        """Токен бота всегда верный."""
+        return {'id': 0, 'is_bot': True}
+
+
+class BotApiHandler(BaseHTTPRequestHandler):
+    """Ответы на sendMessage и getMe; соединения keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        """Считаем новое соединение."""
+        super().setup()
+        self.server.opened()
+
+    def params(self):
+        """Параметры запроса из строки запроса, JSON или формы."""
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if body.startswith(b'{'):
+            params.update(json.loads(body))
+        elif body:
+            params.update(parse_qsl(body.decode('utf-8')))
+        return params
+
+    def do_POST(self):
+        """Вызов метода Bot API: /bot<токен>/<метод>."""
+        method = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        params = self.params()
+        time.sleep(self.server.delay)
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'StandIn'}
+        elif method == 'sendMessage':
+            result = self.server.sent(params)
+        else:
+            self.reply(HTTPStatus.NOT_FOUND, {
+                'ok': False, 'error_code': 404, 'description': 'Not Found'
+            })
+            return
+        self.reply(HTTPStatus.OK, {'ok': True, 'result': result})
+
+    do_GET = do_POST
+
+    def reply(self, status, data):
+        """Ответ JSON с длиной тела, чтобы соединение не закрывалось."""
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Не засоряем вывод журналом запросов."""
+
+
+class StandInBotApi(ThreadingHTTPServer):
+    """Bot API на 127.0.0.1 с задержкой delay на каждый запрос.
+
+    messages — принятые сообщения (chat_id, text) по порядку,
+    connections — сколько соединений открыли клиенты.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay=BOT_API_DELAY):
+        """Слушаем свободный порт; start() запускает сервер."""
+        super().__init__(('127.0.0.1', 0), BotApiHandler)
+        self.delay = delay
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        """Адрес сервера для botapi.BotApiClient."""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def opened(self):
+        """Клиент открыл соединение."""
+        with self._lock:
+            self.connections += 1
+
+    def sent(self, params):
+        """Принимаем сообщение; вернём его как Message Bot API."""
+        with self._lock:
+            self.messages.append((str(params['chat_id']), params['text']))
+            return {
+                'message_id': len(self.messages),
+                'date': int(time.time()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'text': params['text'],
+            }
+
+    def start(self):
+        """Обслуживаем запросы в фоновом потоке."""
+        threading.Thread(
+            target=self.serve_forever, args=(POLL_INTERVAL,),
+            name='standin-bot-api', daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        """Останавливаем сервер и закрываем сокет."""
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,297 @@
+"""Хранилище состояния опроса: курсоры студентов и известные домашки."""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import NamedTuple, Optional
+import zlib
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH_ENV = 'HOMEWORK_BOT_STATE'
+DEFAULT_STATE_PATH = 'homework_state.sqlite3'
+SHARDS = 64
+SNAPSHOT_INTERVAL = 30
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tenants (
+    tenant TEXT PRIMARY KEY,
+    timestamp INTEGER NOT NULL,
+    last_verdict TEXT,
+    last_error TEXT,
+    last_status TEXT,
+    seen TEXT
+);
+CREATE TABLE IF NOT EXISTS homeworks (
+    tenant TEXT NOT NULL,
+    homework_id INTEGER NOT NULL,
+    homework_name TEXT,
+    status TEXT,
+    date_updated TEXT,
+    PRIMARY KEY (tenant, homework_id)
+);
+'''
+MIGRATIONS = {
+    'seen': 'ALTER TABLE tenants ADD COLUMN seen TEXT',
+}
+SAVE_TENANT = ('INSERT OR REPLACE INTO tenants '
+               '(tenant, timestamp, last_verdict, last_error, last_status, '
+               'seen) VALUES (?, ?, ?, ?, ?, ?)')
+LOAD_TENANT = ('SELECT timestamp, last_verdict, last_error, last_status, '
+               'seen FROM tenants WHERE tenant = ?')
+LOAD_TENANTS = ('SELECT tenant, timestamp, last_verdict, last_error, '
+                'last_status, seen FROM tenants')
+SAVE_HOMEWORK = ('INSERT OR REPLACE INTO homeworks '
+                 '(tenant, homework_id, homework_name, status, date_updated) '
+                 'VALUES (?, ?, ?, ?, ?)')
+COUNT_HOMEWORKS = 'SELECT COUNT(*) FROM homeworks WHERE tenant = ?'
+LATEST_HOMEWORK = ('SELECT homework_id, homework_name, status, date_updated '
+                   'FROM homeworks WHERE tenant = ? '
+                   'ORDER BY date_updated DESC LIMIT 1')
+
+SNAPSHOT_SAVED = 'Сохранено состояние {count} студентов.'
+SNAPSHOT_ERROR = 'Не удалось сохранить состояние: {error}'
+HOMEWORK_WITHOUT_ID = 'Домашка студента {tenant} без id пропущена: {homework}'
+
+
+class TenantState(NamedTuple):
+    """Состояние опроса одного студента.
+
+    Кортеж неизменяем: обновление — это новый объект (`_replace`),
+    поэтому снимок состояния можно сохранять, не копируя его. seen —
+    пары (домашка, date_updated), уже увиденные в окне перекрытия
+    курсора (см. cursor.py).
+    """
+
+    timestamp: int
+    last_verdict: Optional[str] = None
+    last_error: Optional[str] = None
+    last_status: Optional[str] = None
+    seen: tuple = ()
+
+
+def state_to_row(state):
+    """Значения столбцов таблицы tenants для состояния."""
+    return (*state[:-1], json.dumps(state.seen) if state.seen else None)
+
+
+def state_from_row(row):
+    """Состояние из значений столбцов таблицы tenants."""
+    *values, seen = row
+    return TenantState(*values, seen=tuple(
+        tuple(pair) for pair in json.loads(seen)
+    ) if seen else ())
+
+
+def get_state_path():
+    """Путь к файлу состояния из окружения или путь по умолчанию."""
+    return os.getenv(STATE_PATH_ENV, DEFAULT_STATE_PATH)
+
+
+class StateStore:
+    """Состояние в SQLite. Запись — пачками, одной транзакцией."""
+
+    def __init__(self, path=None):
+        """Открываем базу и создаём таблицы, если их нет."""
+        self.path = path if path is not None else get_state_path()
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            self.path, check_same_thread=False
+        )
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        """Добавляем столбцы, которых нет в базе старой версии."""
+        columns = {
+            row[1] for row in self.connection.execute(
+                'PRAGMA table_info(tenants)'
+            )
+        }
+        with self.connection:
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self.connection.execute(statement)
+
+    def close(self):
+        """Закрываем соединение с базой."""
+        with self._lock:
+            self.connection.close()
+
+    def load_tenant(self, tenant):
+        """Состояние студента или None, если его ещё нет в базе."""
+        with self._lock:
+            row = self.connection.execute(LOAD_TENANT, (tenant,)).fetchone()
+        return state_from_row(row) if row else None
+
+    def load_tenants(self):
+        """Словарь {студент: состояние} для всех сохранённых студентов."""
+        with self._lock:
+            return {
+                tenant: state_from_row(values)
+                for tenant, *values in self.connection.execute(LOAD_TENANTS)
+            }
+
+    def save_tenants(self, states):
+        """Сохраняем словарь {студент: состояние} одной транзакцией."""
+        with self._lock, self.connection:
+            self.connection.executemany(SAVE_TENANT, (
+                (tenant, *state_to_row(state))
+                for tenant, state in states.items()
+            ))
+
+    def save_homeworks(self, tenant, homeworks):
+        """Сохраняем пачку домашек студента одной транзакцией.
+
+        Домашки без id пропускаем с предупреждением в журнале.
+        Возвращает число сохранённых домашек.
+        """
+        rows = []
+        for homework in homeworks:
+            if not isinstance(homework, dict) or 'id' not in homework:
+                logger.warning(HOMEWORK_WITHOUT_ID.format(
+                    tenant=tenant, homework=homework
+                ))
+                continue
+            rows.append((
+                tenant,
+                homework['id'],
+                homework.get('homework_name'),
+                homework.get('status'),
+                homework.get('date_updated')
+            ))
+        with self._lock, self.connection:
+            self.connection.executemany(SAVE_HOMEWORK, rows)
+        return len(rows)
+
+    def count_homeworks(self, tenant):
+        """Количество известных домашек студента."""
+        with self._lock:
+            return self.connection.execute(
+                COUNT_HOMEWORKS, (tenant,)
+            ).fetchone()[0]
+
+    def latest_homework(self, tenant):
+        """Последняя изменённая домашка студента или None.
+
+        Словарь с полями ответа API: id, homework_name, status,
+        date_updated.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                LATEST_HOMEWORK, (tenant,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(
+            ('id', 'homework_name', 'status', 'date_updated'), row
+        ))
+
+
+class ShardedState:
+    """Состояния студентов в памяти, разбитые на шарды.
+
+    У каждого шарда своя блокировка и множество изменённых студентов,
+    поэтому снимок включает только изменённое, а запись в один шард
+    не мешает остальным. TenantState неизменяем: снимок хранит ссылки
+    на текущие объекты, и следующие обновления его не затрагивают
+    (копирование при записи без копирования).
+    """
+
+    def __init__(self, shards=SHARDS):
+        """Создаём пустые шарды."""
+        self._shards = [{} for _ in range(shards)]
+        self._dirty = [set() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def _index(self, tenant):
+        return zlib.crc32(tenant.encode('utf-8')) % len(self._shards)
+
+    def __len__(self):
+        """Число студентов во всех шардах."""
+        return sum(map(len, self._shards))
+
+    def get(self, tenant, default=None):
+        """Текущее состояние студента."""
+        return self._shards[self._index(tenant)].get(tenant, default)
+
+    def set(self, tenant, state):
+        """Заменяем состояние студента и отмечаем его изменённым."""
+        index = self._index(tenant)
+        with self._locks[index]:
+            self._shards[index][tenant] = state
+            self._dirty[index].add(tenant)
+
+    def load(self, states):
+        """Заполняем шарды сохранёнными состояниями, не отмечая их."""
+        for tenant, state in states.items():
+            index = self._index(tenant)
+            with self._locks[index]:
+                self._shards[index][tenant] = state
+
+    def items(self):
+        """Пары (студент, состояние) на момент вызова."""
+        for index, shard in enumerate(self._shards):
+            with self._locks[index]:
+                items = list(shard.items())
+            yield from items
+
+    def take_dirty(self):
+        """Снимок изменённых студентов; отметки об изменении снимаются."""
+        snapshot = {}
+        for index, dirty in enumerate(self._dirty):
+            if not dirty:
+                continue
+            with self._locks[index]:
+                shard = self._shards[index]
+                snapshot.update((tenant, shard[tenant]) for tenant in dirty)
+                dirty.clear()
+        return snapshot
+
+    def mark_dirty(self, tenants):
+        """Снова отмечаем студентов изменёнными (если запись не удалась)."""
+        for tenant in tenants:
+            index = self._index(tenant)
+            with self._locks[index]:
+                self._dirty[index].add(tenant)
+
+
+class StatePersister(threading.Thread):
+    """Фоновое сохранение изменённых состояний раз в interval секунд."""
+
+    def __init__(self, states, store, interval=SNAPSHOT_INTERVAL):
+        """Запоминаем шарды и хранилище."""
+        super().__init__(name='state-persister', daemon=True)
+        self.states = states
+        self.store = store
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def flush(self):
+        """Сохраняем изменённое с прошлого раза; вернём число студентов."""
+        snapshot = self.states.take_dirty()
+        if not snapshot:
+            return 0
+        try:
+            self.store.save_tenants(snapshot)
+        except Exception:
+            self.states.mark_dirty(snapshot)
+            raise
+        logger.debug(SNAPSHOT_SAVED.format(count=len(snapshot)))
+        return len(snapshot)
+
+    def run(self):
+        """Сохраняем снимки, пока поток не остановят."""
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as error:
+                logger.exception(SNAPSHOT_ERROR.format(error=error))
+
+    def stop(self):
+        """Останавливаем поток и сохраняем последние изменения."""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        self.flush()
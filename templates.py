@@ -0,0 +1,206 @@
+"""Шаблоны сообщений бота на разных языках и в разной разметке.
+
+Шаблон разбирается один раз: литералы сразу экранируются под разметку,
+а для смены статуса текст вердикта подставляется заранее. Готовые шаблоны
+кешируются по (язык, разметка, статус), поэтому при отправке остаётся
+только склеить части с названием работы.
+"""
+from functools import lru_cache, partial
+import html
+import re
+from string import Formatter
+from typing import Callable, NamedTuple, Optional
+
+import homework as homework_module
+
+DEFAULT_LOCALE = 'ru'
+PLAIN = 'plain'
+CACHE_SIZE = 256
+
+UNSUPPORTED_FIELD = 'Поле {field} шаблона не должно содержать формат.'
+UNKNOWN_MARKUP = 'Неизвестная разметка {markup}, доступны: {markups}'
+
+_markdown_special = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+
+
+class Locale(NamedTuple):
+    """Тексты сообщений на одном языке; verdicts=None — из настроек."""
+
+    status_change: str
+    error: str
+    comment: str
+    verdicts: Optional[dict]
+
+
+class Markup(NamedTuple):
+    """Разметка сообщения Telegram."""
+
+    parse_mode: Optional[str]
+    escape: Callable[[str], str]
+    emphasis: dict
+
+
+LOCALES = {
+    'ru': Locale(
+        status_change=homework_module.STATUS_CHANGE_MESSAGE,
+        error=homework_module.ERROR_MESSAGE,
+        comment='Комментарий ревьюера: {comment}',
+        verdicts=None
+    ),
+    'en': Locale(
+        status_change='The review status of "{name}" has changed. {status}',
+        error='The bot has failed: {error}',
+        comment="Reviewer's comment: {comment}",
+        verdicts={
+            'approved': 'The reviewer liked everything. Hooray!',
+            'reviewing': 'The reviewer has started reviewing the work.',
+            'rejected': 'The reviewer has some remarks.'
+        }
+    ),
+}
+MARKUPS = {
+    PLAIN: Markup(None, str, {}),
+    'html': Markup(
+        'HTML',
+        partial(html.escape, quote=False),
+        {'name': '<b>{}</b>', 'comment': '<i>{}</i>'}
+    ),
+    'markdown': Markup(
+        'MarkdownV2',
+        lambda text: _markdown_special.sub(r'\\\1', text),
+        {'name': '*{}*', 'comment': '_{}_'}
+    ),
+}
+
+
+def render_field(markup, name, value):
+    """Экранируем значение поля и выделяем его, если так задано."""
+    text = markup.escape(str(value))
+    if name in markup.emphasis:
+        return markup.emphasis[name].format(text)
+    return text
+
+
+class Template:
+    """Шаблон str.format, разобранный один раз.
+
+    parts — строки (готовые литералы) и кортежи (имя поля,) для полей,
+    которые подставляются при render.
+    """
+
+    __slots__ = ('markup', 'parts')
+
+    def __init__(self, source, markup, fixed=None):
+        """Разбираем source; поля из fixed подставляем сразу."""
+        fixed = fixed or {}
+        self.markup = markup
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if literal:
+                parts.append(markup.escape(literal))
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError(UNSUPPORTED_FIELD.format(field=field))
+            if field in fixed:
+                parts.append(render_field(markup, field, fixed[field]))
+            else:
+                parts.append((field,))
+        self.parts = []
+        for part in parts:
+            if (
+                isinstance(part, str) and self.parts
+                and isinstance(self.parts[-1], str)
+            ):
+                self.parts[-1] += part
+            else:
+                self.parts.append(part)
+
+    def render(self, **values):
+        """Подставляем оставшиеся поля."""
+        return ''.join(
+            part if isinstance(part, str)
+            else render_field(self.markup, part[0], values[part[0]])
+            for part in self.parts
+        )
+
+
+def get_locale(locale):
+    """Тексты на языке locale; для неизвестного языка — по умолчанию."""
+    return LOCALES.get(locale, LOCALES[DEFAULT_LOCALE])
+
+
+def get_markup(markup):
+    """Разметка по имени."""
+    try:
+        return MARKUPS[markup]
+    except KeyError:
+        raise ValueError(UNKNOWN_MARKUP.format(
+            markup=markup, markups=', '.join(MARKUPS)
+        ))
+
+
+def parse_mode(markup):
+    """parse_mode Telegram для разметки."""
+    return get_markup(markup).parse_mode
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def status_template(locale, markup, status):
+    """Шаблон сообщения о смене статуса с уже подставленным вердиктом."""
+    texts = get_locale(locale)
+    verdicts = texts.verdicts or homework_module.HOMEWORK_VERDICTS
+    verdict = verdicts.get(status) or homework_module.HOMEWORK_VERDICTS[status]
+    return Template(
+        texts.status_change, get_markup(markup), fixed={'status': verdict}
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def text_template(locale, markup, kind):
+    """Шаблон текста kind ('error' или 'comment') на языке locale."""
+    return Template(getattr(get_locale(locale), kind), get_markup(markup))
+
+
+def cache_stats():
+    """Попадания в кеш готовых шаблонов."""
+    hits = misses = size = 0
+    for template in (status_template, text_template):
+        info = template.cache_info()
+        hits += info.hits
+        misses += info.misses
+        size += info.currsize
+    return {'hits': hits, 'misses': misses, 'size': size}
+
+
+def clear_cache():
+    """Сбрасываем готовые шаблоны (после смены вердиктов в настройках)."""
+    status_template.cache_clear()
+    text_template.cache_clear()
+
+
+def render_status(homework, status=None, locale=DEFAULT_LOCALE,
+                  markup=PLAIN):
+    """Сообщение о смене статуса работы; проверки — как в parse_status.
+
+    status — статус уже проверенной домашки (из validate_homework):
+    тогда повторно она не проверяется. В разметке HTML и Markdown
+    к сообщению добавляется комментарий ревьюера из поля
+    reviewer_comment.
+    """
+    if status is None:
+        status = homework_module.check_homework(homework)
+    text = status_template(locale, markup, status).render(
+        name=homework['homework_name']
+    )
+    comment = homework.get('reviewer_comment')
+    if comment and markup != PLAIN:
+        text += '\n' + text_template(locale, markup, 'comment').render(
+            comment=comment
+        )
+    return text
+
+
+def render_error(error, locale=DEFAULT_LOCALE, markup=PLAIN):
+    """Сообщение о сбое в работе бота."""
+    return text_template(locale, markup, 'error').render(error=error)
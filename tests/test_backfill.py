@@ -0,0 +1,163 @@
+import json
+from http import HTTPStatus
+
+import pytest
+import requests
+
+import backfill
+import latency
+from config import Tenant
+from state import StateStore, TenantState
+
+
+def split_bytes(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def make_history(count):
+    return {
+        'homeworks': [
+            {
+                'id': index,
+                'homework_name': f'работа_{index}.zip',
+                'status': 'approved',
+                'date_updated': '2021-04-11T10:31:09Z'
+            }
+            for index in range(count)
+        ],
+        'current_date': 1000198991
+    }
+
+
+class MockStreamResponse:
+    def __init__(self, data, http_status=HTTPStatus.OK, chunk_size=7):
+        self.body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.status_code = http_status
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(split_bytes(self.body, self.chunk_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.closed = True
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / 'state.sqlite3'))
+    yield store
+    store.close()
+
+
+class TestBackfill:
+    TENANT = Tenant('ivan', 'sometoken', '12345')
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 7, 1024])
+    def test_iter_json_array(self, chunk_size):
+        data = make_history(5)
+        data['nested'] = {'list': [1, 2.5, 'ё'], 'flag': True}
+        chunks = split_bytes(
+            json.dumps(data, ensure_ascii=False).encode('utf-8'), chunk_size
+        )
+        extra = {}
+        items = list(backfill.iter_json_array(chunks, 'homeworks', extra))
+        assert items == data['homeworks']
+        assert extra == {
+            'homeworks': None,
+            'current_date': data['current_date'],
+            'nested': data['nested']
+        }
+
+    @pytest.mark.parametrize('body', [
+        b'{"homeworks": [{"id": 1}',
+        b'{"homeworks": [1 2]}',
+        b'[]',
+    ])
+    def test_iter_json_array_malformed(self, body):
+        with pytest.raises(ValueError):
+            list(backfill.iter_json_array(split_bytes(body, 4), 'homeworks'))
+
+    def test_items_are_streamed(self):
+        def chunks():
+            yield b'{"homeworks": [{"id": 1}, '
+            raise AssertionError('Прочитано больше, чем нужно.')
+
+        items = backfill.iter_json_array(chunks(), 'homeworks')
+        assert next(items) == {'id': 1}
+
+    def test_backfill_saves_batches(self, monkeypatch, store):
+        response = MockStreamResponse(make_history(12))
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            calls.append(kwargs)
+            return response
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        saved = []
+        save_homeworks = store.save_homeworks
+        monkeypatch.setattr(
+            store, 'save_homeworks',
+            lambda tenant, batch: saved.append(len(batch))
+            or save_homeworks(tenant, batch)
+        )
+        count = backfill.backfill([self.TENANT], store, batch_size=5)
+        assert count == 12
+        assert saved == [5, 5, 2]
+        assert calls[0]['params'] == {'from_date': 0}
+        assert calls[0]['stream'] is True
+        assert calls[0]['timeout'] == latency.default_fetcher().timeout(
+            backfill.homework.ENDPOINT
+        )
+        assert response.closed
+        assert store.count_homeworks('ivan') == 12
+        assert store.load_tenant('ivan') == TenantState(
+            1000198991, last_status='approved'
+        )
+
+    def test_resumes_from_saved_homeworks(self, monkeypatch, store):
+        store.save_homeworks('ivan', [{
+            'id': 1, 'homework_name': 'hw.zip', 'status': 'reviewing',
+            'date_updated': '2021-04-11T10:31:09Z'
+        }, {
+            'id': 2, 'homework_name': 'old.zip', 'status': 'approved',
+            'date_updated': '2020-01-01T00:00:00Z'
+        }])
+        calls = []
+
+        def mock_get(*args, **kwargs):
+            calls.append(kwargs)
+            return MockStreamResponse({'homeworks': [], 'current_date': 5})
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        assert backfill.backfill_tenant(self.TENANT, store) == 0
+        assert calls[0]['params'] == {'from_date': 1618137069}
+        assert store.load_tenant('ivan') == TenantState(
+            5, last_status='reviewing'
+        )
+
+    def test_homework_without_id_skipped(self, monkeypatch, store):
+        history = make_history(3)
+        del history['homeworks'][1]['id']
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kw: MockStreamResponse(history)
+        )
+        assert backfill.backfill_tenant(self.TENANT, store) == 2
+        assert store.count_homeworks('ivan') == 2
+
+    @pytest.mark.parametrize('response', [
+        MockStreamResponse({'code': 'not_authenticated'},
+                           HTTPStatus.UNAUTHORIZED),
+        MockStreamResponse({'code': 'UnknownError'}),
+        MockStreamResponse({'current_date': 1}),
+    ])
+    def test_backfill_tenant_errors(self, monkeypatch, store, response):
+        monkeypatch.setattr(requests, 'get', lambda *args, **kw: response)
+        with pytest.raises((backfill.homework.ServerAnswerException,
+                            KeyError)):
+            backfill.backfill_tenant(self.TENANT, store)
+        assert backfill.backfill([self.TENANT], store, pause=0) == 0
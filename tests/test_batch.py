@@ -0,0 +1,46 @@
+import pytest
+
+import batch
+
+
+class TestBatch:
+
+    def test_matches_per_item_functions(self):
+        responses = batch.sample_responses(200) + [
+            [],
+            {'current_date': 1},
+            {'homeworks': {}},
+            {'homeworks': [{'status': 'approved'}]},
+            {'homeworks': [{'homework_name': 'hw'}]},
+            {'homeworks': ['hw']},
+        ]
+        result = batch.validate_batch(responses)
+        messages, errors = batch.check_each(responses)
+        assert batch.batch_messages(result) == messages
+        assert result.errors == errors
+        assert batch.check_results(responses) == (messages, errors)
+
+    @pytest.mark.parametrize('malformed', [0, 0.25, 1])
+    def test_malformed_share(self, malformed):
+        responses = batch.sample_responses(100, malformed)
+        _, errors = batch.check_results(responses)
+        assert len(errors) == 100 * malformed
+
+    def test_malformed_share_checked(self):
+        with pytest.raises(ValueError):
+            batch.sample_responses(10, 2)
+
+    def test_status_codes(self):
+        result = batch.validate_batch([
+            {'homeworks': [{'homework_name': 'a', 'status': 'rejected'}]},
+            {'homeworks': []},
+            {'homeworks': [{'homework_name': 'b', 'status': 'lost'}]},
+        ], verdicts={'approved': 'Да', 'rejected': 'Нет'})
+        assert result.statuses == ('approved', 'rejected')
+        assert result.codes == [1, batch.NO_HOMEWORK, batch.INVALID]
+        assert list(result.errors) == [2]
+
+    def test_benchmark(self):
+        result = batch.benchmark(count=200, repeat=1, malformed=0.5)
+        assert set(result) == {'each', 'results', 'batch'}
+        assert all(value > 0 for value in result.values())
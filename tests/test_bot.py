@@ -674,21 +674,23 @@ class TestHomework:
             homework_module
         )
 
-        func_name = 'check_response'
+        func_name = 'validate_response'
         expecred_data = {
             "homeworks": [],
             "current_date": random_timestamp
         }
-        log_msg = 'Call check_response'
+        log_msg = 'Call validate_response'
         no_response_assert_msg = (
             f'Убедитесь, что в функцию `{func_name}` передан ответ API '
             'домашки.'
         )
+        validate_response = homework_module.validate_response
 
         def mock_check_response(response=None):
             if response != expecred_data:
                 raise SystemExit(no_response_assert_msg)
             logging.warn(log_msg)
+            return validate_response(response)
 
         monkeypatch.setattr(
             homework_module,
@@ -0,0 +1,85 @@
+import pytest
+
+import botapi
+import homework
+from outbox import Outbox
+from standin import StandInBotApi
+
+TOKEN = '1234:abcdefg'
+
+
+class Bot:
+    token = TOKEN
+
+
+@pytest.fixture
+def server():
+    server = StandInBotApi(delay=0.01).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    client = botapi.BotApiClient(TOKEN, pool_size=3, api_url=server.url)
+    yield client
+    client.close()
+
+
+class TestBotApi:
+
+    def test_send_message(self, server, client):
+        message = client.send_message('42', 'Привет', parse_mode='HTML')
+        assert message['text'] == 'Привет'
+        assert client.get_me()['is_bot']
+        assert server.messages == [('42', 'Привет')]
+        assert server.connections == 1
+
+    def test_api_error(self, client):
+        with pytest.raises(botapi.BotApiError) as error:
+            client.call('sendDice')
+        assert error.value.error_code == 404
+
+    def test_pipelined_drain_keeps_chat_order(self, server, client):
+        outbox = Outbox(':memory:')
+        for index in range(30):
+            outbox.enqueue(str(index % 5), f'message {index}')
+        assert outbox.drain(
+            lambda chat_id, text: homework.send_chat_message(
+                client, chat_id, text
+            ),
+            workers=client.pool_size
+        ) == 30
+        outbox.close()
+        assert server.connections <= client.pool_size
+        for chat in range(5):
+            assert [
+                text for chat_id, text in server.messages
+                if chat_id == str(chat)
+            ] == [f'message {index}' for index in range(chat, 30, 5)]
+
+    @pytest.mark.parametrize('value, expected', [
+        ('2', (2.0, 2.0)),
+        ('1.5,20', (1.5, 20.0)),
+    ])
+    def test_parse_timeout(self, value, expected):
+        assert botapi.parse_timeout(value) == expected
+
+    @pytest.mark.parametrize('value', ['', 'fast', '1,2,3', '0,5'])
+    def test_bad_timeout(self, value):
+        with pytest.raises(ValueError):
+            botapi.parse_timeout(value)
+
+    def test_bot_from_env(self, monkeypatch):
+        bot = Bot()
+        monkeypatch.delenv(botapi.POOL_ENV, raising=False)
+        assert botapi.bot_from_env(bot) is bot
+        assert botapi.send_workers() == 1
+        monkeypatch.setenv(botapi.POOL_ENV, '2')
+        monkeypatch.setenv(botapi.TIMEOUT_ENV, '1,5')
+        client = botapi.bot_from_env(bot)
+        assert botapi.bot_from_env(Bot()) is client
+        assert (client.pool_size, client.timeout) == (2, (1.0, 5.0))
+        assert botapi.send_workers() == 2
+        botapi.client_for.cache_clear()
+        client.close()
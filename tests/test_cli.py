@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+import cli
+import health
+import threaded
+from standin import CountingBot, StandInSession
+from state import StateStore, TenantState
+
+
+@pytest.fixture
+def state_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state.sqlite3')
+    monkeypatch.setenv('HOMEWORK_BOT_STATE', path)
+    return path
+
+
+def save(path, states):
+    store = StateStore(path)
+    store.save_tenants(states)
+    store.close()
+
+
+def inspect(capsys, *argv):
+    assert cli.main(['inspect-state', *argv]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+class TestCli:
+
+    def test_inspect_state(self, state_path, capsys, monkeypatch):
+        monkeypatch.delenv(health.HEALTH_PORT_ENV, raising=False)
+        save(state_path, {'ann': TenantState(
+            timestamp=0, last_status='approved', seen=(('1', 'x'),)
+        )})
+        report = inspect(capsys, '--state', state_path)
+        assert report == {'tenants': {'ann': {
+            'timestamp': 0,
+            'from_date': '1970-01-01T00:00:00+00:00',
+            'last_status': 'approved',
+            'last_verdict': None,
+            'last_error': None,
+            'seen': 1,
+        }}}
+
+    def test_inspect_stats(self, state_path, capsys):
+        server = health.start_health_server(
+            health.Heartbeat(), retry_period=lambda: 10, port=0,
+            host='127.0.0.1', stats={
+                'templates': lambda: {'hits': 3, 'misses': 1, 'size': 1},
+                'empty': lambda: {'hits': 0, 'misses': 0},
+            }
+        )
+        host, port = server.server_address[:2]
+        try:
+            report = inspect(capsys, '--url', f'http://{host}:{port}')
+        finally:
+            server.stop()
+        assert report['tenants'] == {}
+        assert report['stats']['templates']['hit_rate'] == 0.75
+        assert report['stats']['empty']['hit_rate'] is None
+
+    def test_inspect_stats_unavailable(self, state_path, capsys):
+        report = inspect(capsys, '--url', 'http://127.0.0.1:1')
+        assert report['stats'] is None
+
+    def test_once_saves_cursors(self, state_path, monkeypatch):
+        bot = CountingBot()
+        session = StandInSession()
+        monkeypatch.setattr('telebot.TeleBot', lambda token: bot)
+        monkeypatch.setattr(threaded, 'make_session', lambda size: session)
+        save(state_path, {'default': TenantState(timestamp=500)})
+        assert cli.main(['once', '--budget', '1']) == 0
+        assert session.requests == 1
+        assert bot.sent == 1
+        store = StateStore(state_path)
+        state = store.load_tenant('default')
+        store.close()
+        assert state.timestamp > 500
+        assert state.last_status == 'approved'
+
+    def test_once_fails_on_api_error(self, state_path, monkeypatch):
+        class BrokenSession(StandInSession):
+            def get(self, url, **kwargs):
+                raise ConnectionError('API is down')
+
+        bot = CountingBot()
+        monkeypatch.setattr('telebot.TeleBot', lambda token: bot)
+        monkeypatch.setattr(
+            threaded, 'make_session', lambda size: BrokenSession()
+        )
+        assert cli.main(['once']) == 1
+        assert bot.sent == 1
+
+    @pytest.mark.timeout(10)
+    def test_bench(self):
+        assert cli.poll_throughput(tenants=20, cycles=2, workers=4) > 0
+        assert cli.main([
+            'bench', '--responses', '100', '--repeat', '1',
+            '--tenants', '10', '--cycles', '1', '--workers', '2',
+            '--messages', '20', '--chats', '4', '--pool', '2',
+        ]) == 0
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def defaults(homework_module):
+    return config.Settings(
+        retry_period=600,
+        endpoint=homework_module.ENDPOINT,
+        verdicts=dict(homework_module.HOMEWORK_VERDICTS),
+        practicum_token='sometoken',
+        chat_id='12345',
+        tenants=()
+    )
+
+
+@pytest.fixture
+def write_config(tmp_path):
+    path = tmp_path / 'config.json'
+
+    def write(data, mtime=None):
+        path.write_text(json.dumps(data), encoding='utf-8')
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+        return str(path)
+
+    return write
+
+
+class TestConfig:
+
+    def test_defaults_without_file(self, defaults):
+        settings = config.load_settings(defaults)
+        assert settings.retry_period == 600
+        assert settings.tenants == (
+            config.Tenant(config.DEFAULT_TENANT_NAME, 'sometoken', '12345'),
+        )
+
+    def test_file_overrides_defaults(self, defaults, write_config):
+        path = write_config({
+            'retry_period': 60,
+            'tenants': [
+                {'name': 'ivan', 'practicum_token': 't1', 'chat_id': 1},
+                {'name': 'olga', 'practicum_token': 't2', 'chat_id': '2'},
+            ]
+        })
+        settings = config.load_settings(defaults, path)
+        assert settings.retry_period == 60
+        assert settings.endpoint == defaults.endpoint
+        assert [tenant.chat_id for tenant in settings.tenants] == ['1', '2']
+        assert settings.tenants[0].locale == 'ru'
+        assert settings.tenants[0].markup == 'plain'
+
+    @pytest.mark.parametrize('data', [
+        {'retry_period': 0},
+        {'retry_period': '600'},
+        {'endpoint': 'ftp://example.com'},
+        {'verdicts': {}},
+        {'tenants': []},
+        {'tenants': [{'name': 'ivan', 'chat_id': '1'}]},
+        {'tenants': [
+            {'name': 'ivan', 'practicum_token': 't', 'chat_id': '1'},
+            {'name': 'ivan', 'practicum_token': 't', 'chat_id': '2'},
+        ]},
+        {'tenants': [
+            {'name': 'ivan', 'practicum_token': 't', 'chat_id': '1',
+             'markup': 'bbcode'},
+        ]},
+        {'tenants': [
+            {'name': 'ivan', 'practicum_token': 't', 'chat_id': '1',
+             'quiet_hours': '23:00'},
+        ]},
+        {'unknown': True},
+        [],
+    ])
+    def test_invalid_file(self, defaults, write_config, data):
+        with pytest.raises(config.ConfigError):
+            config.load_settings(defaults, write_config(data))
+
+    def test_watcher_reloads_on_file_change(self, defaults, write_config):
+        path = write_config({'retry_period': 60}, mtime=1)
+        watcher = config.ConfigWatcher(defaults, path)
+        assert not watcher.refresh()
+        write_config({'retry_period': 30}, mtime=2)
+        assert watcher.refresh()
+        assert watcher.settings.retry_period == 30
+
+    def test_watcher_keeps_settings_on_error(self, defaults, write_config):
+        path = write_config({'retry_period': 60}, mtime=1)
+        watcher = config.ConfigWatcher(defaults, path)
+        write_config({'retry_period': -1}, mtime=2)
+        assert not watcher.refresh()
+        assert watcher.settings.retry_period == 60
+
+    def test_watcher_reload_request(self, defaults, write_config):
+        path = write_config({'retry_period': 60}, mtime=1)
+        watcher = config.ConfigWatcher(defaults, path)
+        write_config({'retry_period': 30}, mtime=1)
+        assert not watcher.refresh()
+        watcher.request_reload()
+        assert watcher.refresh()
+        assert watcher.settings.retry_period == 30
+
+    def test_apply_settings(self, monkeypatch, homework_module, defaults):
+        for name in ('RETRY_PERIOD', 'ENDPOINT', 'HOMEWORK_VERDICTS',
+                     'PRACTICUM_TOKEN', 'TELEGRAM_CHAT_ID', 'HEADERS'):
+            monkeypatch.setattr(
+                homework_module, name, getattr(homework_module, name)
+            )
+        homework_module.apply_settings(defaults._replace(
+            retry_period=60,
+            verdicts={'approved': 'Ок'},
+            practicum_token='newtoken'
+        ))
+        assert homework_module.RETRY_PERIOD == 60
+        assert homework_module.HEADERS == {'Authorization': 'OAuth newtoken'}
+        assert homework_module.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}
+        ).endswith('Ок')
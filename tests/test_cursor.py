@@ -0,0 +1,89 @@
+from contextlib import nullcontext
+
+import pytest
+
+import cursor
+import homework
+from state import StateStore, TenantState
+
+NOW = 1_700_000_000
+
+
+class Spans:
+    def span(self, name):
+        return nullcontext()
+
+
+def work(homework_id, status='approved', date='2023-11-14T22:13:00Z'):
+    return {'id': homework_id, 'homework_name': f'hw{homework_id}.zip',
+            'status': status, 'date_updated': date}
+
+
+def poll(state, response, sent):
+    return homework.poll(
+        state, Spans(), lambda timestamp: response,
+        lambda message, key=None, status=None: sent.append(message) or True
+    )
+
+
+class TestCursor:
+
+    @pytest.mark.parametrize('timestamp, server_now, expected', [
+        (NOW - 600, NOW, NOW - cursor.OVERLAP),
+        (NOW, NOW + 10, NOW),
+        (NOW + 3600, NOW, NOW - cursor.OVERLAP),
+        (NOW, None, NOW),
+        (NOW, '123', NOW),
+    ])
+    def test_next_timestamp(self, timestamp, server_now, expected):
+        assert cursor.next_timestamp(timestamp, server_now) == expected
+
+    def test_advances_without_new_statuses(self):
+        state = poll(
+            TenantState(timestamp=NOW - 3600),
+            {'homeworks': [], 'current_date': NOW}, []
+        )
+        assert state.timestamp == NOW - cursor.OVERLAP
+
+    def test_overlap_deduplicated(self):
+        response = {'homeworks': [work(1)], 'current_date': NOW}
+        sent = []
+        state = poll(TenantState(timestamp=NOW - 600), response, sent)
+        assert state.seen == (('1', '2023-11-14T22:13:00Z'),)
+        state = poll(state._replace(last_verdict=None), response, sent)
+        assert len(sent) == 1
+
+    def test_new_status_in_overlap_is_sent(self):
+        sent = []
+        state = poll(TenantState(timestamp=NOW - 600), {
+            'homeworks': [work(1, 'reviewing')], 'current_date': NOW
+        }, sent)
+        poll(state, {'homeworks': [
+            work(1, 'approved', '2023-11-14T22:13:30Z')
+        ], 'current_date': NOW + 30}, sent)
+        assert len(sent) == 2
+
+    def test_seen_pruned_outside_window(self):
+        state = TenantState(timestamp=NOW - 600, seen=(
+            ('1', '2023-11-14T22:00:00Z'), ('2', '2023-11-14T22:13:00Z')
+        ))
+        state = cursor.advance(state, {'homeworks': [], 'current_date': NOW})
+        assert state.seen == (('2', '2023-11-14T22:13:00Z'),)
+
+    def test_failed_send_keeps_cursor(self):
+        state = TenantState(timestamp=NOW - 600)
+        new_state = homework.poll(
+            state, Spans(),
+            lambda timestamp: {'homeworks': [work(1)], 'current_date': NOW},
+            lambda message, key=None, status=None: False
+        )
+        assert new_state.timestamp == state.timestamp
+        assert new_state.seen == ()
+
+    def test_seen_persisted(self, tmp_path):
+        store = StateStore(str(tmp_path / 'state.sqlite3'))
+        state = TenantState(NOW, seen=(('1', '2023-11-14T22:13:00Z'),))
+        store.save_tenants({'ivan': state})
+        assert store.load_tenant('ivan') == state
+        assert store.load_tenants() == {'ivan': state}
+        store.close()
@@ -0,0 +1,175 @@
+import http.client
+import json
+import socket
+import time
+
+import pytest
+
+import events
+import health
+import threaded
+from config import Tenant
+from history import HistoryStore
+from outbox import Outbox
+from standin import CountingBot, StandInSession
+
+
+def work(status='approved', name='hw.zip'):
+    return {'id': 1, 'homework_name': name, 'status': status,
+            'date_updated': '2023-11-14T22:13:20Z'}
+
+
+@pytest.fixture
+def stream():
+    stream = events.EventStream(replay=3, queue_size=2)
+    yield stream
+    stream.close()
+
+
+class TestEvents:
+
+    def test_transition_event(self, stream):
+        first = stream.status_changed('ivan', work('reviewing'))
+        second = stream.status_changed('ivan', work('approved'))
+        assert (first['id'], second['id']) == (1, 2)
+        assert first['previous_status'] is None
+        assert second == {
+            **second,
+            'type': events.STATUS_CHANGED,
+            'tenant': 'ivan',
+            'homework': '1',
+            'homework_name': 'hw.zip',
+            'status': 'approved',
+            'previous_status': 'reviewing',
+            'changed_at': 1700000000.0,
+        }
+
+    def test_slow_subscriber_loses_oldest(self, stream):
+        subscription = stream.subscribe('slow')
+        for index in range(5):
+            stream.publish(type='test', index=index)
+        assert [event['index'] for event in subscription.get(0)] == [3, 4]
+        assert subscription.dropped == 3
+        assert stream.stats() == {
+            'published': 5, 'subscribers': 1, 'dropped': 3
+        }
+        assert subscription.get(0) == []
+        stream.unsubscribe(subscription)
+        assert subscription.get(0) is None
+
+    def test_replay_after_last_id(self, stream):
+        for index in range(4):
+            stream.publish(type='test', index=index)
+        subscription = stream.subscribe('late', last_id=2)
+        assert [event['id'] for event in subscription.get(0)] == [3, 4]
+        assert stream.subscribe('new').get(0) == []
+
+    def test_recorder_keeps_previous_record(self, stream):
+        recorded = []
+        subscription = stream.subscribe('test')
+        stream.recorder('ivan', recorded.append)(work())
+        assert recorded == [work()]
+        assert subscription.get(0)[0]['tenant'] == 'ivan'
+
+    @pytest.mark.parametrize('outputs', ['', ' , '])
+    def test_disabled_without_outputs(self, outputs):
+        assert events.EventStream.from_env(outputs) is None
+
+    @pytest.mark.parametrize('outputs', ['kafka:topic', 'file', 'unix:'])
+    def test_bad_outputs(self, outputs):
+        with pytest.raises(ValueError):
+            events.EventStream.from_env(outputs)
+
+    def test_file_sink(self, tmp_path):
+        path = tmp_path / 'events.ndjson'
+        stream = events.EventStream.from_env(f'file:{path}')
+        stream.status_changed('ivan', work('reviewing'))
+        stream.status_changed('olga', work())
+        stream.close()
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert [json.loads(line)['tenant'] for line in lines] == [
+            'ivan', 'olga'
+        ]
+
+    def test_statuses_bounded(self):
+        stream = events.EventStream(statuses=2)
+        stream.status_changed('ivan', work('reviewing'))
+        stream.status_changed('olga', work('reviewing'))
+        stream.status_changed('ivan', work('approved'))
+        stream.status_changed('petr', work('reviewing'))
+        assert list(stream.statuses) == [('ivan', '1'), ('petr', '1')]
+        assert stream.status_changed(
+            'olga', work()
+        )['previous_status'] is None
+        stream.close()
+
+    def test_file_sink_retries_open(self, tmp_path, monkeypatch, caplog):
+        monkeypatch.setattr(events, 'SINK_RETRY', 0.05)
+        path = tmp_path / 'later' / 'events.ndjson'
+        stream = events.EventStream.from_env(f'file:{path}')
+        stream.status_changed('ivan', work())
+        time.sleep(0.1)
+        assert 'events-file' in caplog.text
+        path.parent.mkdir()
+        time.sleep(0.1)
+        stream.close()
+        assert json.loads(path.read_text(encoding='utf-8'))['tenant'] == (
+            'ivan'
+        )
+
+    def test_unix_socket_sink(self, tmp_path):
+        path = str(tmp_path / 'events.sock')
+        stream = events.EventStream.from_env(f'unix:{path}')
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(1)
+        client.connect(path)
+        try:
+            while stream.stats()['subscribers'] == 0:
+                time.sleep(0.01)
+            stream.status_changed('ivan', work())
+            line = client.makefile(encoding='utf-8').readline()
+        finally:
+            client.close()
+            stream.close()
+        assert json.loads(line)['status'] == 'approved'
+
+    def test_server_sent_events(self):
+        stream = events.EventStream.from_env('sse')
+        stream.status_changed('ivan', work('reviewing'))
+        stream.status_changed('ivan', work())
+        server = health.start_health_server(
+            health.Heartbeat(), retry_period=lambda: 10, port=0,
+            host='127.0.0.1', events=stream
+        )
+        host, port = server.server_address[:2]
+        connection = http.client.HTTPConnection(host, port, timeout=1)
+        try:
+            connection.request(
+                'GET', health.EVENTS_PATH, headers={'Last-Event-ID': '1'}
+            )
+            response = connection.getresponse()
+            lines = [response.fp.readline() for _ in range(4)]
+        finally:
+            connection.close()
+            stream.close()
+            server.stop()
+        assert response.getheader('Content-Type').startswith(
+            'text/event-stream'
+        )
+        assert lines[:2] == [b'id: 2\n', b'event: status_changed\n']
+        assert json.loads(lines[2][len(b'data: '):])['status'] == 'approved'
+        assert lines[3] == b'\n'
+
+    def test_threaded_poller_publishes(self, stream):
+        subscription = stream.subscribe('test')
+        poller = threaded.ThreadedPoller(
+            CountingBot(), workers=2, session=StandInSession(),
+            outbox=Outbox(':memory:'), history=HistoryStore(':memory:'),
+            events=stream
+        )
+        poller.run_once([Tenant('ivan', 'ivan', '1'),
+                         Tenant('olga', 'olga', '2')])
+        poller.close()
+        assert sorted(
+            event['tenant'] for event in subscription.get(0)
+        ) == ['ivan', 'olga']
@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+import footprint
+import homework
+import threaded
+from config import Tenant
+from footprint import MEGABYTE, MemoryGuard
+from standin import CountingBot, StandInResponse, StandInSession
+
+BUDGET_MB = float(os.getenv('HOMEWORK_BOT_TEST_MEMORY_MB', 256))
+TENANTS = 2000
+
+
+class TestFootprint:
+
+    @pytest.mark.parametrize('data', [
+        {'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+         'current_date': 1},
+        {'homeworks': [], 'current_date': 1},
+        {'homeworks': None},
+        {'current_date': 1},
+    ])
+    def test_streamed_matches_json(self, data):
+        class Session:
+            def get(self, url, headers=None, params=None, stream=False):
+                return StandInResponse(json.dumps(data).encode('utf-8'))
+
+        fetch = dict(timestamp=0, headers={}, http=Session())
+        assert homework.fetch_homeworks(**fetch, stream=True) == (
+            homework.fetch_homeworks(**fetch)
+        )
+
+    def test_guard_backs_off_and_recovers(self):
+        usage = iter([90, 95, 50, 50, 50, None])
+        relieved = []
+        guard = MemoryGuard(
+            100, max_window=8, reliefs=[lambda: relieved.append(1)],
+            measure=lambda: next(usage)
+        )
+        assert guard.check()
+        assert guard.window == 4
+        assert relieved == [1]
+        assert not guard.check()
+        assert guard.window == 8
+        assert guard.peak == 90
+        assert not guard.check()
+
+    def test_invalid_budget(self):
+        with pytest.raises(ValueError):
+            MemoryGuard(0, max_window=1)
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.delenv(footprint.MEMORY_BUDGET_ENV, raising=False)
+        assert MemoryGuard.from_env(max_window=4) is None
+        monkeypatch.setenv(footprint.MEMORY_BUDGET_ENV, '512')
+        assert MemoryGuard.from_env(max_window=4).budget == 512 * MEGABYTE
+
+    def test_windows(self):
+        guard = MemoryGuard(100, max_window=4, measure=lambda: 90)
+        poller = threaded.ThreadedPoller(
+            CountingBot(), workers=2, session=StandInSession(), memory=guard
+        )
+        windows = [len(window) for window in poller.windows(range(10))]
+        poller.close()
+        assert windows == [4, 2, 1, 1, 1, 1]
+
+    @pytest.mark.skipif(footprint.rss() is None, reason='нет /proc')
+    @pytest.mark.timeout(20)
+    def test_steady_state_rss_under_budget(self):
+        api = StandInSession()
+        bot = CountingBot()
+        guard = MemoryGuard(BUDGET_MB * MEGABYTE, max_window=32)
+        poller = threaded.ThreadedPoller(
+            bot, workers=8, session=api, memory=guard
+        )
+        tenants = [
+            Tenant(f'tenant{index}', f'token{index}', str(index))
+            for index in range(TENANTS)
+        ]
+        usage = []
+        for _ in range(4):
+            poller.run_once(tenants)
+            while poller.outbox.drain(poller.deliver):
+                pass
+            poller.outbox.purge(keep=0)
+            api.now += 600
+            usage.append(footprint.rss())
+        poller.close()
+        assert bot.sent == TENANTS
+        assert api.streamed == TENANTS * 4
+        assert max(usage) < BUDGET_MB * MEGABYTE
+        assert usage[-1] - usage[1] < 8 * MEGABYTE
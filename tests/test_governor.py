@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import governor
+import tests.check_utils as check_utils
+
+URL = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestGovernor:
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            governor.RequestGovernor(max_per_host=0)
+        with pytest.raises(ValueError):
+            governor.RequestGovernor(rate=0)
+
+    def test_max_per_host(self):
+        limiter = governor.RequestGovernor(max_per_host=3, rate=None)
+        lock = threading.Lock()
+        active = []
+        peak = []
+
+        def request():
+            with limiter.slot(URL):
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.01)
+                with lock:
+                    active.pop()
+
+        run_threads(request, 12)
+        assert max(peak) == 3
+        stats = limiter.stats()
+        assert stats['requests'] == 12
+        assert stats['active'] == stats['queued'] == 0
+        assert stats['wait_max'] > 0
+        assert stats['wait_p95'] <= stats['wait_max']
+
+    def test_hosts_are_independent(self):
+        limiter = governor.RequestGovernor(max_per_host=1, rate=None)
+        with limiter.slot(URL):
+            with limiter.slot('https://api.telegram.org/bot/getMe'):
+                assert limiter.stats()['active'] == 2
+
+    def test_rate_budget(self):
+        limiter = governor.RequestGovernor(rate=100, burst=1)
+        started = time.monotonic()
+        for _ in range(6):
+            with limiter.slot(URL):
+                pass
+        assert time.monotonic() - started >= 0.045
+
+    def test_priority_order(self):
+        limiter = governor.RequestGovernor(max_per_host=1, rate=None)
+        order = []
+        host = limiter.acquire(URL)
+
+        def request(name, priority):
+            with limiter.slot(URL, priority):
+                order.append(name)
+
+        threads = []
+        for name, priority in (
+            ('first_default', governor.PRIORITY_DEFAULT),
+            ('second_default', governor.PRIORITY_DEFAULT),
+            ('in_review', governor.PRIORITY_IN_REVIEW),
+        ):
+            thread = threading.Thread(target=request, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            while limiter.stats()['queued'] < len(threads):
+                time.sleep(0.001)
+        limiter.release(host)
+        for thread in threads:
+            thread.join()
+        assert order == ['in_review', 'first_default', 'second_default']
+
+    def test_priority_for_status(self):
+        assert governor.priority_for_status('reviewing') == (
+            governor.PRIORITY_IN_REVIEW
+        )
+        assert governor.priority_for_status('approved') == (
+            governor.PRIORITY_DEFAULT
+        )
+
+    def test_fetch_homeworks_uses_governor(
+            self, monkeypatch, random_timestamp, homework_module
+    ):
+        limiter = governor.RequestGovernor()
+
+        def mock_get(*args, **kwargs):
+            assert limiter.stats()['active'] == 1
+            return check_utils.MockResponseGET(
+                random_timestamp=random_timestamp
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        response = homework_module.fetch_homeworks(
+            random_timestamp, {'Authorization': 'OAuth token'},
+            governor=limiter, priority=governor.PRIORITY_IN_REVIEW
+        )
+        assert response['current_date'] == random_timestamp
+        assert limiter.stats()['requests'] == 1
+        assert limiter.stats()['active'] == 0
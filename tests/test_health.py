@@ -0,0 +1,143 @@
+import json
+from types import SimpleNamespace
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import health
+
+
+class StaleHeartbeat(health.Heartbeat):
+    def __init__(self, age):
+        super().__init__()
+        self._age = age
+
+    def age(self):
+        return self._age
+
+
+class MockBot:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+
+    def get_me(self):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('telegram is down')
+        return {'id': 1}
+
+
+def get(server, path, headers=None):
+    host, port = server.server_address[:2]
+    request = Request(f'http://{host}:{port}{path}', headers=headers or {})
+    try:
+        with urlopen(request, timeout=1) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as error:
+        body = error.read()
+        return error.code, json.loads(body) if body.startswith(b'{') else None
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def serve(heartbeat, **kwargs):
+        server = health.start_health_server(
+            heartbeat, retry_period=lambda: 10, port=0, host='127.0.0.1',
+            **kwargs
+        )
+        servers.append(server)
+        return server
+
+    yield serve
+    for server in servers:
+        server.stop()
+
+
+class TestHealth:
+
+    def test_disabled_without_port(self, monkeypatch):
+        monkeypatch.delenv(health.HEALTH_PORT_ENV, raising=False)
+        assert health.start_health_server(
+            health.Heartbeat(), retry_period=lambda: 10
+        ) is None
+
+    def test_healthz(self, serve):
+        server = serve(health.Heartbeat(), backlogs={'outbox': lambda: 3})
+        status, body = get(server, '/healthz')
+        assert status == 200
+        assert body['status'] == 'ok'
+        assert body['max_age'] == 10 * 2 + health.HEARTBEAT_GRACE
+        assert body['backlog'] == {'outbox': 3}
+
+    def test_healthz_stale_loop(self, serve):
+        server = serve(StaleHeartbeat(1000))
+        status, body = get(server, '/healthz')
+        assert status == 503
+        assert body['status'] == 'fail'
+
+    def test_readyz(self, serve):
+        bot = MockBot()
+        server = serve(health.Heartbeat(), checks={
+            'tokens': lambda: True, 'telegram': health.TelegramProbe(bot)
+        })
+        assert get(server, '/readyz')[0] == 200
+        assert get(server, '/readyz')[1]['checks'] == {
+            'tokens': True, 'telegram': True
+        }
+        assert bot.calls == 1
+
+    def test_readyz_failing_check(self, serve):
+        server = serve(health.Heartbeat(), checks={
+            'telegram': health.TelegramProbe(MockBot(fail=True)),
+            'broken': lambda: 1 / 0,
+        })
+        status, body = get(server, '/readyz')
+        assert status == 503
+        assert body['checks'] == {'telegram': False, 'broken': False}
+
+    def test_stats(self, serve):
+        server = serve(health.Heartbeat(), stats={
+            'cache': lambda: {'hits': 3, 'misses': 1},
+            'broken': lambda: 1 / 0,
+        })
+        status, body = get(server, '/stats')
+        assert status == 200
+        assert body['cache'] == {'hits': 3, 'misses': 1}
+        assert body['broken'] is None
+
+    def test_stats_token(self, serve):
+        server = serve(health.Heartbeat(), token='secret')
+        bearer = {'Authorization': 'Bearer secret'}
+        assert get(server, '/stats')[0] == 401
+        assert get(server, '/stats', {'Authorization': 'Bearer x'})[0] == 401
+        assert get(server, '/stats', bearer)[0] == 200
+        assert get(server, '/healthz')[0] == 200
+
+    @pytest.mark.parametrize('client, token, headers, allowed', [
+        ('127.0.0.1', None, {}, True),
+        ('::1', None, {}, True),
+        ('10.0.0.5', None, {}, False),
+        ('10.0.0.5', 'secret', {'Authorization': 'Bearer secret'}, True),
+        ('127.0.0.1', 'secret', {}, False),
+    ])
+    def test_private_paths_access(self, client, token, headers, allowed):
+        handler = SimpleNamespace(
+            server=SimpleNamespace(token=token),
+            client_address=(client, 50000),
+            headers=headers
+        )
+        assert health.HealthHandler.authorized(handler) is allowed
+
+    def test_unknown_path(self, serve):
+        assert get(serve(health.Heartbeat()), '/metrics')[0] == 404
+
+    def test_tokens_ready(self):
+        def missing():
+            raise ValueError('no tokens')
+
+        assert health.tokens_ready(lambda: None)
+        assert not health.tokens_ready(missing)
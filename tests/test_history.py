@@ -0,0 +1,70 @@
+import pytest
+
+import history
+
+HOUR = 60 * 60
+
+
+def homework(status, hour, homework_id=1):
+    return {
+        'id': homework_id,
+        'homework_name': f'hw{homework_id}.zip',
+        'status': status,
+        'date_updated': f'2021-04-11T{hour:02d}:00:00Z'
+    }
+
+
+@pytest.fixture
+def store():
+    store = history.HistoryStore(':memory:', batch_size=3)
+    yield store
+    store.close()
+
+
+class TestHistory:
+
+    def test_batched_commits(self, store):
+        store.record('ivan', homework('reviewing', 10))
+        store.record('ivan', homework('approved', 12))
+        assert store.connection.execute(
+            'SELECT COUNT(*) FROM transitions'
+        ).fetchone()[0] == 0
+        store.record('ivan', homework('reviewing', 10, homework_id=2))
+        assert store.connection.execute(
+            'SELECT COUNT(*) FROM transitions'
+        ).fetchone()[0] == 3
+
+    def test_duplicates_ignored(self, store):
+        for _ in range(3):
+            store.record('ivan', homework('reviewing', 10))
+        assert store.flush() == 0
+        assert len(store.transitions('ivan', 1)) == 1
+
+    def test_time_in_review(self, store):
+        for status, hour in (('reviewing', 10), ('rejected', 12),
+                             ('reviewing', 13), ('approved', 14)):
+            store.record('ivan', homework(status, hour))
+        assert store.time_in_review('ivan', 1) == 3 * HOUR
+
+    def test_time_in_review_ongoing(self, store):
+        store.record('ivan', homework('reviewing', 10))
+        started = store.transitions('ivan', 1)[0][1]
+        assert store.time_in_review('ivan', 1, now=started + HOUR) == HOUR
+
+    def test_reviewer_turnaround(self, store):
+        for tenant, homework_id, start, end in (
+            ('ivan', 1, 10, 11),
+            ('ivan', 2, 10, 13),
+            ('olga', 1, 10, 12),
+        ):
+            store.record(tenant, homework('reviewing', start, homework_id))
+            store.record(tenant, homework('approved', end, homework_id))
+        stats = store.reviewer_turnaround()
+        assert stats['count'] == 3
+        assert stats['mean'] == 2 * HOUR
+        assert stats['median'] == 2 * HOUR
+        assert stats['p95'] == 3 * HOUR
+        assert store.reviewer_turnaround('olga')['count'] == 1
+        assert store.reviewer_turnaround('nobody') == {
+            'count': 0, 'mean': 0.0, 'median': 0.0, 'p95': 0.0
+        }
@@ -0,0 +1,211 @@
+import threading
+import time
+
+import pytest
+
+import governor
+import homework
+import latency
+import threaded
+
+URL = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
+HOST = 'practicum.yandex.ru'
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def json(self):
+        return {'homeworks': [], 'current_date': 1}
+
+    def close(self):
+        self.closed = True
+
+
+class SlowFirstHttp:
+    """Первый запрос зависает на delay секунд, остальные отвечают сразу."""
+
+    def __init__(self, delay=0.5, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.responses = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs)
+            number = len(self.calls)
+        if number == 1:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        response = Response(number)
+        self.responses.append(response)
+        return response
+
+
+class ConcurrentHttp:
+    """Каждый запрос идёт delay секунд; считаем пик одновременных."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return Response(0)
+
+
+class SlowApiHttp:
+    """API отвечает за delay секунд: запрос с меньшим таймаутом чтения
+    обрывается сразу, без ожидания."""
+
+    def __init__(self, delay=1.5):
+        self.delay = delay
+        self.timeouts = 0
+
+    def get(self, url, timeout=None, **kwargs):
+        if timeout[1] < self.delay:
+            self.timeouts += 1
+            raise TimeoutError('read timed out')
+        return Response(0)
+
+
+def trained(fetcher, seconds=0.01, count=latency.MIN_SAMPLES):
+    for _ in range(count):
+        fetcher.tracker.observe(HOST, seconds)
+    return fetcher
+
+
+class TestLatency:
+
+    def test_default_timeout_until_enough_samples(self):
+        fetcher = trained(
+            latency.AdaptiveFetcher(), count=latency.MIN_SAMPLES - 1
+        )
+        assert fetcher.timeout(URL) == latency.DEFAULT_TIMEOUT
+        assert fetcher.hedge_after(URL) is None
+
+    @pytest.mark.parametrize('seconds, expected', [
+        (0.01, (latency.CONNECT_LIMITS[0], latency.READ_LIMITS[0])),
+        (0.5, (1.0, 2.0)),
+        (60, (latency.CONNECT_LIMITS[1], latency.READ_LIMITS[1])),
+    ])
+    def test_timeout_from_percentiles(self, seconds, expected):
+        fetcher = trained(latency.AdaptiveFetcher(), seconds)
+        assert fetcher.timeout(URL) == expected
+
+    def test_deadline_caps_timeout(self):
+        fetcher = latency.AdaptiveFetcher(deadline=time.monotonic() + 1)
+        assert max(fetcher.timeout(URL)) <= 1
+        fetcher.deadline = time.monotonic() - 1
+        assert fetcher.timeout(URL) == (latency.DEADLINE_FLOOR,) * 2
+        assert latency.time_left(None) is None
+
+    def test_tracker_refresh(self):
+        tracker = latency.LatencyTracker(samples=100, refresh=10)
+        for _ in range(latency.MIN_SAMPLES):
+            tracker.observe(HOST, 1.0)
+        assert len(tracker.sorted(HOST)) == latency.MIN_SAMPLES
+        tracker.observe(HOST, 2.0)
+        assert len(tracker.sorted(HOST)) == latency.MIN_SAMPLES
+        for _ in range(9):
+            tracker.observe(HOST, 2.0)
+        assert tracker.sorted(HOST)[-1] == 2.0
+
+    def test_hedged_request_wins(self):
+        fetcher = trained(latency.AdaptiveFetcher(budget=1))
+        http = SlowFirstHttp()
+        started = time.monotonic()
+        response = fetcher.get(http, URL, params={'from_date': 0})
+        assert time.monotonic() - started < 0.3
+        assert response.name == 2
+        assert fetcher.hedges == fetcher.hedge_wins == 1
+        assert all('timeout' in call for call in http.calls)
+        fetcher.close()
+        time.sleep(0.6)
+        assert http.responses[-1].closed
+
+    def test_pool_does_not_limit_callers(self):
+        callers = 16
+        fetcher = trained(
+            latency.AdaptiveFetcher(budget=1, workers=2 * callers), 0.5
+        )
+        http = ConcurrentHttp()
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=fetcher.get, args=(http, URL))
+            for _ in range(callers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        fetcher.close()
+        assert time.monotonic() - started < 0.3
+        assert http.peak == callers
+        assert fetcher.hedges == 0
+
+    def test_timeouts_recover_after_slowdown(self):
+        fetcher = trained(latency.AdaptiveFetcher(hedge=False), 0.05, 100)
+        assert fetcher.timeout(URL) == (0.5, 1.0)
+        http = SlowApiHttp()
+        for _ in range(100):
+            try:
+                fetcher.get(http, URL)
+            except TimeoutError:
+                pass
+        assert http.timeouts < 100 // 2
+        assert fetcher.timeout(URL)[1] >= http.delay
+
+    def test_hedge_takes_own_governor_slot(self):
+        limiter = governor.RequestGovernor(max_per_host=1, rate=None)
+        fetcher = trained(latency.AdaptiveFetcher(budget=1))
+        http = SlowFirstHttp(delay=0.2)
+        assert homework.fetch_homeworks(
+            0, {}, http=http, governor=limiter, latency=fetcher
+        ) == {'homeworks': [], 'current_date': 1}
+        fetcher.executor().shutdown(wait=True)
+        assert fetcher.hedges == 1
+        assert len(http.calls) == 1
+        assert limiter.stats()['requests'] == 2
+
+    def test_threaded_poller_pool_size(self):
+        poller = threaded.ThreadedPoller(object(), workers=16, session=object())
+        assert poller.latency.workers == threaded.HEDGE_SLOTS * 16
+        poller.executor.shutdown()
+
+    def test_hedge_budget(self):
+        fetcher = trained(latency.AdaptiveFetcher(budget=0))
+        http = SlowFirstHttp(delay=0.1)
+        assert fetcher.get(http, URL).name == 1
+        assert len(http.calls) == 1
+        assert fetcher.hedges == 0
+
+    def test_both_failed(self):
+        fetcher = trained(latency.AdaptiveFetcher(budget=1))
+        http = SlowFirstHttp(delay=0.1, error=ConnectionError('нет сети'))
+        with pytest.raises(ConnectionError):
+            fetcher.get(http, URL)
+        assert len(http.calls) == 2
+
+    def test_fetch_homeworks_passes_timeout(self):
+        fetcher = latency.AdaptiveFetcher()
+        http = SlowFirstHttp(delay=0)
+        assert homework.fetch_homeworks(
+            0, {}, http=http, latency=fetcher
+        ) == {'homeworks': [], 'current_date': 1}
+        assert http.calls[0]['timeout'] == latency.DEFAULT_TIMEOUT
+        assert fetcher.stats()['hosts'][HOST]['samples'] == 1
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+
+import pytest
+
+import outbox
+
+
+@pytest.fixture
+def queue():
+    queue = outbox.Outbox(':memory:', backoff=0)
+    yield queue
+    queue.close()
+
+
+class Recipient:
+    def __init__(self, fail=0):
+        self.fail = fail
+        self.delivered = []
+        self.event = threading.Event()
+
+    def __call__(self, chat_id, text):
+        if self.fail:
+            self.fail -= 1
+            return False
+        self.delivered.append((chat_id, text))
+        self.event.set()
+        return True
+
+
+class TestOutbox:
+
+    def test_enqueue_is_idempotent(self, queue):
+        assert queue.enqueue('1', 'Принято', key='hw:approved')
+        assert queue.enqueue('1', 'Принято', key='hw:approved')
+        assert queue.enqueue('2', 'Принято', key='hw:approved')
+        assert queue.enqueue('1', 'Ошибка')
+        assert queue.enqueue('1', 'Ошибка')
+        assert queue.pending() == 4
+
+    def test_drain_in_order(self, queue):
+        for index in range(3):
+            queue.enqueue('1', f'сообщение {index}', key=str(index))
+        recipient = Recipient()
+        assert queue.drain(recipient) == 3
+        assert [text for _, text in recipient.delivered] == [
+            'сообщение 0', 'сообщение 1', 'сообщение 2'
+        ]
+        assert queue.pending() == 0
+        assert queue.drain(recipient) == 0
+
+    def test_retry_with_backoff(self):
+        queue = outbox.Outbox(':memory:', backoff=60)
+        queue.enqueue('1', 'текст', key='k')
+        recipient = Recipient(fail=1)
+        assert queue.drain(recipient) == 0
+        assert queue.pending() == 1
+        assert queue.due() == []
+        queue.connection.execute('UPDATE outbox SET next_attempt_at = 0')
+        assert queue.drain(recipient) == 1
+        assert recipient.delivered == [('1', 'текст')]
+
+    def test_priority_order(self, queue):
+        queue.enqueue('1', 'взята на проверку', priority=2)
+        queue.enqueue('1', 'ошибка')
+        queue.enqueue('1', 'принята', priority=0)
+        recipient = Recipient()
+        queue.drain(recipient)
+        assert [text for _, text in recipient.delivered] == [
+            'принята', 'ошибка', 'взята на проверку'
+        ]
+
+    def test_digest(self, queue):
+        queue.enqueue('1', 'первое', digest=True)
+        queue.enqueue('2', 'другой чат')
+        queue.enqueue('1', 'второе', digest=True)
+        recipient = Recipient()
+        assert queue.drain(recipient) == 3
+        assert recipient.delivered == [
+            ('1', f'{outbox.DIGEST_HEADER}\n\nпервое\n\nвторое'),
+            ('2', 'другой чат'),
+        ]
+
+    def test_migrates_old_queue(self, tmp_path):
+        path = str(tmp_path / 'outbox.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'key TEXT UNIQUE, chat_id TEXT NOT NULL, text TEXT NOT NULL, '
+            'created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'next_attempt_at REAL NOT NULL, sent_at REAL)'
+        )
+        connection.execute(
+            "INSERT INTO outbox (chat_id, text, created_at, next_attempt_at) "
+            "VALUES ('1', 'старое', 0, 0)"
+        )
+        connection.commit()
+        connection.close()
+        queue = outbox.Outbox(path)
+        recipient = Recipient()
+        assert queue.drain(recipient) == 1
+        assert recipient.delivered == [('1', 'старое')]
+        queue.close()
+
+    def test_sent_key_not_requeued(self, queue):
+        queue.enqueue('1', 'текст', key='k')
+        queue.drain(Recipient())
+        queue.enqueue('1', 'текст', key='k')
+        assert queue.pending() == 0
+
+    def test_durable(self, tmp_path):
+        path = str(tmp_path / 'outbox.sqlite3')
+        queue = outbox.Outbox(path)
+        queue.enqueue('1', 'текст', key='k')
+        queue.close()
+        reopened = outbox.Outbox(path)
+        reopened.enqueue('1', 'текст', key='k')
+        recipient = Recipient()
+        assert reopened.drain(recipient) == 1
+        reopened.close()
+
+    def test_sender_thread(self, queue):
+        recipient = Recipient()
+        sender = outbox.OutboxSender(queue, recipient, interval=0.01)
+        sender.start()
+        queue.enqueue('1', 'текст', key='k')
+        assert recipient.event.wait(1)
+        sender.stop()
+        assert recipient.delivered == [('1', 'текст')]
+
+    def test_transition_key(self, homework_module, data_with_new_hw_status):
+        homework = data_with_new_hw_status['homeworks'][0]
+        key = homework_module.transition_key(homework)
+        assert key == homework_module.transition_key(dict(homework))
+        assert key != homework_module.transition_key(
+            dict(homework, status='rejected')
+        )
@@ -0,0 +1,48 @@
+import pytest
+
+import homework
+import polling
+
+
+class StopLoop(BaseException):
+    pass
+
+
+class TestPolling:
+
+    def test_guarded_logs_and_continues(self, caplog):
+        def broken():
+            raise OSError('disk full')
+
+        assert polling.guarded('history', broken) is None
+        assert polling.guarded('sum', sum, [1, 2]) == 3
+        assert 'history' in caplog.text
+        assert 'disk full' in caplog.text
+
+    def test_main_survives_failing_iteration(self, monkeypatch):
+        iterations = []
+        closed = []
+
+        class FailingLoop:
+            def __init__(self, bot):
+                pass
+
+            def close(self):
+                closed.append(True)
+
+            def iterate(self):
+                iterations.append(1)
+                raise RuntimeError('watcher is broken')
+
+        def sleep(seconds):
+            if len(iterations) == 3:
+                raise StopLoop
+
+        monkeypatch.setattr(homework, 'check_tokens', lambda: None)
+        monkeypatch.setattr('telebot.TeleBot', lambda token: object())
+        monkeypatch.setattr(polling, 'PollLoop', FailingLoop)
+        monkeypatch.setattr(homework.time, 'sleep', sleep)
+        with pytest.raises(StopLoop):
+            homework.main()
+        assert len(iterations) == 3
+        assert closed == [True]
@@ -0,0 +1,73 @@
+import logging
+import pstats
+import time
+
+import pytest
+
+import profiling
+
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestProfiling:
+
+    def test_spans(self, caplog):
+        spans = profiling.IterationSpans()
+        for _ in range(2):
+            with spans.span('get_api_answer'):
+                busy_loop(0.002)
+            with spans.span('parse_status'):
+                pass
+            with caplog.at_level(logging.DEBUG):
+                spans.finish()
+        assert 'get_api_answer=' in caplog.records[-1].message
+        count, total, longest = spans.stats()['get_api_answer']
+        assert count == 2
+        assert total >= 0.004
+        assert longest <= total
+        assert spans.current == {}
+
+    def test_unknown_profiler(self):
+        with pytest.raises(ValueError):
+            profiling.Profiler(mode='perf')
+
+    def test_disabled_by_default(self, monkeypatch, tmp_path):
+        monkeypatch.delenv(profiling.PROFILE_ENV, raising=False)
+        path = tmp_path / 'profile.prof'
+        profiler = profiling.Profiler(path=str(path))
+        profiler.start()
+        assert not profiler.active
+        profiler.stop()
+        assert not path.exists()
+
+    def test_cprofile_from_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv(profiling.PROFILE_ENV, '0.05')
+        path = tmp_path / 'profile.prof'
+        profiler = profiling.Profiler(path=str(path))
+        while not path.exists():
+            profiler.start()
+            assert profiler.active
+            busy_loop(0.01)
+            profiler.stop()
+        assert not profiler.active
+        functions = {
+            name for _, _, name in pstats.Stats(str(path)).stats
+        }
+        assert 'busy_loop' in functions
+
+    def test_sampling_profiler(self, tmp_path):
+        path = tmp_path / 'profile.folded'
+        profiler = profiling.Profiler(mode='sampling', path=str(path))
+        profiler.request(0)
+        profiler.start()
+        busy_loop(0.05)
+        profiler.stop()
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert lines
+        assert any('busy_loop' in line for line in lines)
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
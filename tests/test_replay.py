@@ -0,0 +1,134 @@
+import gzip
+
+import pytest
+import requests
+
+import homework
+import replay
+
+
+def response(status, comment=''):
+    return {'homeworks': [{'id': 1, 'homework_name': 'ivan__hw.zip',
+                           'status': status, 'reviewer_comment': comment}],
+            'current_date': 1}
+
+
+@pytest.fixture
+def recording(tmp_path):
+    path = tmp_path / 'recording.ndjson.gz'
+    recorder = replay.Recorder(path)
+    answers = iter([
+        response('reviewing'),
+        response('reviewing'),
+        ConnectionError('timeout'),
+        response('approved', comment='Отлично, Иван!'),
+    ])
+
+    def fetch(timestamp):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    fetch = recorder.wrap(fetch, 'ivan')
+    for _ in range(4):
+        try:
+            fetch(0)
+        except ConnectionError:
+            pass
+    recorder.close()
+    return path
+
+
+class TestReplay:
+
+    def test_recording_sanitised(self, recording):
+        entries = list(replay.read_recording(recording))
+        assert len(entries) == 4
+        assert len({entry['tenant'] for entry in entries}) == 1
+        assert 'ivan' not in gzip.open(recording).read().decode('utf-8')
+        assert entries[0]['response']['homeworks'][0][
+            'homework_name'
+        ] == replay.HIDDEN + '__hw.zip'
+        assert entries[2]['error'] == 'timeout'
+        assert entries[2]['error_type'] == 'ConnectionError'
+        work = entries[3]['response']['homeworks'][0]
+        assert work['reviewer_comment'] == replay.HIDDEN
+        assert entries[0]['response']['homeworks'][0][
+            'reviewer_comment'
+        ] == ''
+
+    def test_replay(self, recording):
+        sent = []
+        result = replay.replay(
+            replay.read_recording(recording),
+            send=lambda message, *args: sent.append(message)
+        )
+        assert result['responses'] == 4
+        assert result['errors'] == 1
+        assert result['messages'] == 3
+        assert sent[1] == 'Сбой в работе программы: timeout'
+        assert sent[2].endswith('ревьюеру всё понравилось. Ура!')
+
+    def test_recording_without_trailer(self, recording):
+        # процесс упал, не успев закрыть файл: нет хвоста gzip
+        data = recording.read_bytes()
+        recording.write_bytes(data[:-8])
+        assert len(list(replay.read_recording(recording))) == 4
+
+    def test_salt_per_recording(self, tmp_path):
+        first = replay.Recorder(tmp_path / 'first.ndjson.gz')
+        second = replay.Recorder(tmp_path / 'second.ndjson.gz')
+        for recorder in (first, second):
+            recorder.write('ivan', response={})
+            recorder.close()
+        tenants = {
+            entry['tenant']
+            for path in ('first.ndjson.gz', 'second.ndjson.gz')
+            for entry in replay.read_recording(tmp_path / path)
+        }
+        assert len(tenants) == 2
+
+    def test_flush_periodically(self, tmp_path, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(replay.time, 'monotonic', lambda: now[0])
+        recorder = replay.Recorder(tmp_path / 'rec.ndjson.gz',
+                                   flush_period=10)
+        flushes = []
+        flush = recorder._file.flush
+        recorder._file.flush = lambda: flushes.append(now[0]) or flush()
+        for second in range(25):
+            now[0] = float(second)
+            recorder.write('ivan', response={})
+        recorder.close()
+        assert flushes == [10.0, 20.0]
+
+    def test_disabled_by_default(self, monkeypatch):
+        monkeypatch.delenv(replay.RECORD_PATH_ENV, raising=False)
+        assert replay.recorder_from_env() is None
+
+    def test_failed_fetch_keeps_no_token(self, tmp_path, monkeypatch):
+        def refuse(*args, **kwargs):
+            raise requests.ConnectionError('connection refused')
+
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'SECRET-TOKEN')
+        monkeypatch.setattr(homework, 'HEADERS', {
+            'Authorization': 'OAuth SECRET-TOKEN'
+        })
+        monkeypatch.setattr('requests.get', refuse)
+        path = tmp_path / 'recording.ndjson.gz'
+        recorder = replay.Recorder(path)
+        with pytest.raises(ConnectionError):
+            recorder.wrap(homework.get_api_answer, 'ivan')(0)
+        recorder.close()
+        recorded = gzip.open(path).read().decode('utf-8')
+        assert 'SECRET-TOKEN' not in recorded
+        assert 'OAuth' in recorded
+
+    @pytest.mark.parametrize('text', [
+        "{'Authorization': 'OAuth y0_abc-DEF'}",
+        'https://api.telegram.org/bot1234:abc-DEF/sendMessage',
+        'Bearer abc-DEF',
+    ])
+    def test_redact(self, text):
+        assert 'abc-DEF' not in replay.redact(text)
@@ -0,0 +1,116 @@
+from datetime import datetime, timezone
+import threading
+import time
+
+import pytest
+
+import outbox
+import scheduler
+
+
+def local(hour, minute=0):
+    return datetime(2024, 3, 1, hour, minute).timestamp()
+
+
+@pytest.fixture
+def queue():
+    queue = outbox.Outbox(':memory:')
+    yield queue
+    queue.close()
+
+
+class TestScheduler:
+
+    @pytest.mark.parametrize('value', ['23:00', '25:00-08:00', '8-9', 'x'])
+    def test_invalid_quiet_hours(self, value):
+        with pytest.raises(ValueError):
+            scheduler.QuietHours.parse(value)
+
+    def test_quiet_hours_over_midnight(self):
+        quiet = scheduler.QuietHours.parse('23:00-08:00')
+        assert quiet.resume_at(local(12)) is None
+        assert quiet.resume_at(local(23, 30)) == local(8) + 24 * 60 * 60
+        assert quiet.resume_at(local(7, 59)) == local(8)
+        assert scheduler.QuietHours.parse('') is None
+
+    def test_quiet_hours_in_recipient_zone(self):
+        def utc(hour, minute=0):
+            return datetime(
+                2024, 3, 1, hour, minute, tzinfo=timezone.utc
+            ).timestamp()
+
+        quiet = scheduler.QuietHours.parse('23:00-08:00 Europe/Moscow')
+        assert quiet.zone == 'Europe/Moscow'
+        assert quiet.resume_at(utc(19, 59)) is None
+        assert quiet.resume_at(utc(20)) == utc(5) + 24 * 60 * 60
+        assert quiet.resume_at(utc(4, 59)) == utc(5)
+        assert quiet.resume_at(utc(5)) is None
+        with pytest.raises(ValueError):
+            scheduler.QuietHours.parse('23:00-08:00 Mars/Olympus')
+
+    def test_quiet_hours_digest(self, queue):
+        clock = [local(23, 30)]
+        planner = scheduler.NotificationScheduler(
+            queue, {1: scheduler.QuietHours.parse('23:00-08:00')},
+            clock=lambda: clock[0]
+        )
+        send = planner.sender(1)
+        send('Работа взята на проверку.', 'a', status='reviewing')
+        send('Работа проверена.', 'b', status='approved')
+        assert queue.connection.execute(
+            'SELECT DISTINCT next_attempt_at, digest FROM outbox'
+        ).fetchall() == [(local(8) + 24 * 60 * 60, 1)]
+        queue.connection.execute('UPDATE outbox SET next_attempt_at = 0')
+        delivered = []
+        queue.drain(lambda chat_id, text: delivered.append(text) or True)
+        assert delivered == ['\n\n'.join([
+            outbox.DIGEST_HEADER, 'Работа проверена.',
+            'Работа взята на проверку.'
+        ])]
+
+    def test_priorities_outside_quiet_hours(self, queue):
+        planner = scheduler.NotificationScheduler(queue)
+        send = planner.sender('1')
+        send('взята', 'a', status='reviewing')
+        send('сбой')
+        send('принята', 'b', status='approved')
+        delivered = []
+        queue.drain(lambda chat_id, text: delivered.append(text) or True)
+        assert delivered == ['принята', 'сбой', 'взята']
+
+    def test_rate_limited(self, monkeypatch):
+        monkeypatch.delenv(scheduler.SEND_RATE_ENV, raising=False)
+
+        def deliver(chat_id, text):
+            return True
+
+        assert scheduler.rate_limited(deliver) is deliver
+        limited = scheduler.rate_limited(deliver, rate=50)
+        started = time.monotonic()
+        assert all(limited('1', 'text') for _ in range(6))
+        assert time.monotonic() - started >= 0.09
+
+    def test_rate_limited_keeps_concurrency(self):
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def deliver(chat_id, text):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return True
+
+        limited = scheduler.rate_limited(deliver, rate=1000, workers=4)
+        threads = [
+            threading.Thread(target=limited, args=(str(chat), 'text'))
+            for chat in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 4
@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Целевые значения холодного старта воркера, в секундах.
+IMPORT_TIME_TARGET = 0.1
+BOOT_TO_FIRST_POLL_TARGET = 1.0
+HEAVY_MODULES = ('requests', 'telebot')
+
+FIRST_POLL_SCRIPT = '''
+import time
+start = time.perf_counter()
+import homework
+import requests
+
+
+def first_poll(*args, **kwargs):
+    print(time.perf_counter() - start)
+    raise SystemExit
+
+
+requests.get = first_poll
+time.sleep = lambda seconds: None
+homework.main()
+'''
+
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=BASE_DIR,
+        env=dict(os.environ),
+        capture_output=True,
+        text=True,
+        timeout=10
+    )
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative seconds} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1_000_000
+    return modules
+
+
+class TestStartup:
+
+    def test_heavy_modules_not_imported(self):
+        modules = parse_importtime(
+            run_python('-X', 'importtime', '-c', 'import homework').stderr
+        )
+        assert 'homework' in modules
+        for name in HEAVY_MODULES:
+            assert name not in modules, (
+                f'Модуль `{name}` не должен импортироваться '
+                'при импорте `homework`.'
+            )
+
+    def test_import_time(self):
+        modules = parse_importtime(
+            run_python('-X', 'importtime', '-c', 'import homework').stderr
+        )
+        assert modules['homework'] < IMPORT_TIME_TARGET, (
+            f'Импорт `homework` занял {modules["homework"]:.3f} с, '
+            f'цель — {IMPORT_TIME_TARGET} с.'
+        )
+
+    def test_boot_to_first_poll(self):
+        result = run_python('-c', FIRST_POLL_SCRIPT)
+        elapsed = float(result.stdout.strip())
+        assert elapsed < BOOT_TO_FIRST_POLL_TARGET, (
+            f'Первый запрос к API отправлен через {elapsed:.3f} с, '
+            f'цель — {BOOT_TO_FIRST_POLL_TARGET} с.'
+        )
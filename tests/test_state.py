@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+
+import pytest
+
+from state import ShardedState, StatePersister, StateStore, TenantState
+
+
+@pytest.fixture
+def store():
+    store = StateStore(':memory:')
+    yield store
+    store.close()
+
+
+class TestShardedState:
+
+    def test_set_get(self):
+        states = ShardedState(shards=4)
+        states.set('ivan', TenantState(1))
+        assert states.get('ivan') == TenantState(1)
+        assert states.get('olga') is None
+        assert len(states) == 1
+
+    def test_take_dirty_only_changed(self):
+        states = ShardedState(shards=4)
+        states.load({f'tenant{i}': TenantState(i) for i in range(100)})
+        assert states.take_dirty() == {}
+        states.set('tenant5', TenantState(500))
+        states.set('tenant7', TenantState(700))
+        assert states.take_dirty() == {
+            'tenant5': TenantState(500), 'tenant7': TenantState(700)
+        }
+        assert states.take_dirty() == {}
+
+    def test_snapshot_is_copy_on_write(self):
+        states = ShardedState()
+        states.set('ivan', TenantState(1))
+        snapshot = states.take_dirty()
+        states.set('ivan', states.get('ivan')._replace(timestamp=2))
+        assert snapshot == {'ivan': TenantState(1)}
+        assert states.get('ivan').timestamp == 2
+
+    def test_concurrent_updates(self):
+        states = ShardedState(shards=8)
+
+        def update(worker):
+            for index in range(200):
+                states.set(f'{worker}-{index}', TenantState(index))
+
+        threads = [
+            threading.Thread(target=update, args=(worker,))
+            for worker in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(states) == len(states.take_dirty()) == 1600
+
+
+class TestStatePersister:
+
+    def test_flush_saves_dirty(self, store):
+        states = ShardedState()
+        states.set('ivan', TenantState(1, last_status='reviewing'))
+        persister = StatePersister(states, store)
+        assert persister.flush() == 1
+        assert persister.flush() == 0
+        assert store.load_tenants() == {
+            'ivan': TenantState(1, last_status='reviewing')
+        }
+
+    def test_failed_save_keeps_dirty(self, store, monkeypatch):
+        states = ShardedState()
+        states.set('ivan', TenantState(1))
+        persister = StatePersister(states, store)
+
+        def broken_save(states):
+            raise OSError('disk full')
+
+        monkeypatch.setattr(store, 'save_tenants', broken_save)
+        with pytest.raises(OSError):
+            persister.flush()
+        monkeypatch.undo()
+        assert persister.flush() == 1
+
+    def test_background_thread(self, store):
+        states = ShardedState()
+        persister = StatePersister(states, store, interval=0.01)
+        persister.start()
+        states.set('ivan', TenantState(1))
+        persister.stop()
+        assert store.load_tenant('ivan') == TenantState(1)
+
+
+class TestStateStoreMigration:
+
+    def test_adds_seen_column(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        connection = sqlite3.connect(path)
+        connection.execute(
+            'CREATE TABLE tenants (tenant TEXT PRIMARY KEY, '
+            'timestamp INTEGER NOT NULL, last_verdict TEXT, '
+            'last_error TEXT, last_status TEXT)'
+        )
+        connection.execute(
+            "INSERT INTO tenants VALUES ('ivan', 5, 'ok', NULL, 'approved')"
+        )
+        connection.commit()
+        connection.close()
+        store = StateStore(path)
+        assert store.load_tenant('ivan') == TenantState(
+            5, 'ok', None, 'approved'
+        )
+        store.close()
@@ -0,0 +1,83 @@
+import pytest
+
+import homework
+import templates
+
+
+def work(status='approved', **extra):
+    return {'homework_name': 'hw<1>_final.zip', 'status': status, **extra}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    templates.clear_cache()
+    yield
+    templates.clear_cache()
+
+
+class TestTemplates:
+
+    def test_plain_ru_matches_parse_status(self):
+        for status in homework.HOMEWORK_VERDICTS:
+            assert templates.render_status(work(status)) == (
+                homework.parse_status(work(status))
+            )
+
+    def test_english(self):
+        assert templates.render_status(work(), locale='en') == (
+            'The review status of "hw<1>_final.zip" has changed. '
+            'The reviewer liked everything. Hooray!'
+        )
+
+    def test_html_escapes_and_adds_comment(self):
+        text = templates.render_status(
+            work(reviewer_comment='Use <code> & tests'), markup='html'
+        )
+        assert text == (
+            'Изменился статус проверки работы "<b>hw&lt;1&gt;_final.zip</b>". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!\n'
+            'Комментарий ревьюера: <i>Use &lt;code&gt; &amp; tests</i>'
+        )
+
+    def test_markdown_escapes(self):
+        text = templates.render_status(work(), markup='markdown')
+        assert r'"*hw<1\>\_final\.zip*"\.' in text
+        assert text.endswith(r'Ура\!')
+
+    def test_plain_ignores_comment(self):
+        assert 'Комментарий' not in templates.render_status(
+            work(reviewer_comment='ok')
+        )
+
+    def test_templates_cached(self):
+        templates.render_status(work())
+        templates.render_status(work(homework_name='other.zip'))
+        info = templates.status_template.cache_info()
+        assert (info.hits, info.misses) == (1, 1)
+        assert templates.cache_stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+    def test_unknown_status(self):
+        with pytest.raises(ValueError):
+            templates.render_status(work('unknown'))
+
+    def test_settings_reset_cache(self, monkeypatch):
+        templates.render_status(work())
+        for name in ('RETRY_PERIOD', 'ENDPOINT', 'HOMEWORK_VERDICTS',
+                     'PRACTICUM_TOKEN', 'TELEGRAM_CHAT_ID', 'HEADERS'):
+            monkeypatch.setattr(homework, name, getattr(homework, name))
+        homework.apply_settings(homework.current_settings()._replace(
+            verdicts={**homework.HOMEWORK_VERDICTS, 'approved': 'Зачтено'}
+        ))
+        assert templates.render_status(work()).endswith('Зачтено')
+
+    def test_error(self):
+        assert templates.render_error('boom', locale='en') == (
+            'The bot has failed: boom'
+        )
+        assert templates.render_error('<x>', markup='html') == (
+            'Сбой в работе программы: &lt;x&gt;'
+        )
+
+    def test_unknown_markup(self):
+        with pytest.raises(ValueError):
+            templates.parse_mode('bbcode')
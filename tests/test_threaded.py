@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+
+import cursor
+import threaded
+import tokens
+import transports
+import tests.check_utils as check_utils
+from config import Tenant
+from state import TenantState
+
+
+class MockSession:
+    """Session, отвечающая каждому студенту его домашкой."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.closed = False
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.calls.append(headers['Authorization'])
+        time.sleep(self.delay)
+        token = headers['Authorization'].split()[-1]
+        return check_utils.MockResponseGET(data={
+            'homeworks': [{'homework_name': f'{token}.zip',
+                           'status': 'approved'}],
+            'current_date': 1000198991
+        })
+
+    def close(self):
+        self.closed = True
+
+
+class MockBot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = {}
+        self.parse_modes = {}
+
+    def send_message(self, chat_id, text, parse_mode=None):
+        with self.lock:
+            self.sent[chat_id] = text
+            self.parse_modes[chat_id] = parse_mode
+
+
+@pytest.fixture
+def tenants():
+    return [Tenant(f'tenant{index}', f'token{index}', str(index))
+            for index in range(20)]
+
+
+class TestThreaded:
+
+    def test_tenant_locale_and_markup(self):
+        bot = MockBot()
+        poller = threaded.ThreadedPoller(bot, workers=2, session=MockSession())
+        poller.run_once([
+            Tenant('ivan', 'ivan', '1', locale='en', markup='html'),
+            Tenant('olga', 'olga', '2'),
+        ])
+        poller.outbox.drain(poller.deliver)
+        poller.close()
+        assert bot.sent['1'] == (
+            'The review status of "<b>ivan.zip</b>" has changed. '
+            'The reviewer liked everything. Hooray!'
+        )
+        assert bot.parse_modes == {'1': 'HTML', '2': None}
+        assert bot.sent['2'].startswith('Изменился статус проверки работы')
+
+    def test_rejected_tokens_not_polled(self, tenants):
+        session = MockSession()
+        poller = threaded.ThreadedPoller(
+            MockBot(), workers=2, session=session, verify_tokens=True
+        )
+        poller.verifier.remember('token1', tokens.INVALID)
+        admitted = poller.admitted(tenants[:3])
+        poller.close()
+        assert admitted == [tenants[0], tenants[2]]
+        assert len(session.calls) == 2
+
+    def test_make_session_pool_size(self):
+        session = threaded.make_session(7)
+        assert session.get_adapter('https://').poolmanager.connection_pool_kw[
+            'maxsize'
+        ] == 7
+
+    def test_run_once(self, tenants):
+        bot = MockBot()
+        session = MockSession(delay=0.05)
+        poller = threaded.ThreadedPoller(bot, workers=10, session=session)
+        started = time.monotonic()
+        poller.run_once(tenants)
+        assert time.monotonic() - started < 0.5
+        assert bot.sent == {}
+        assert poller.outbox.drain(poller.deliver) == len(tenants)
+        poller.close()
+        assert session.closed
+        assert len(session.calls) == len(tenants)
+        for tenant in tenants:
+            assert bot.sent[tenant.chat_id].startswith(
+                f'Изменился статус проверки работы "{tenant.practicum_token}'
+            )
+            state = poller.states.get(tenant.name)
+            assert state.timestamp == 1000198991 - cursor.OVERLAP
+            assert state.last_status == 'approved'
+            assert poller.history.transitions(
+                tenant.name, f'{tenant.practicum_token}.zip'
+            )[0][0] == 'approved'
+
+    def test_run_once_deadline(self, tenants):
+        bot = MockBot()
+        poller = threaded.ThreadedPoller(
+            bot, workers=2, session=MockSession(delay=0.1)
+        )
+        started = time.monotonic()
+        polled = poller.run_once(tenants, deadline=started + 0.25)
+        poller.close(wait=False)
+        assert time.monotonic() - started < 0.4
+        assert 0 < polled < len(tenants)
+        # начатые, но не успевшие опросы дописали состояние до close
+        saved = sum(
+            poller.states.get(tenant.name) is not None for tenant in tenants
+        )
+        assert polled < saved < len(tenants)
+        assert poller.flush() == saved
+        assert len(bot.sent) == saved
+
+    def test_run_once_skipped_not_counted(self, tenants):
+        poller = threaded.ThreadedPoller(
+            MockBot(), workers=2, session=MockSession()
+        )
+        with poller.lock_for(tenants[0].name):
+            assert poller.run_once(tenants[:3]) == 2
+        poller.close()
+
+    def test_flush_waits_for_transports(self, tenants, monkeypatch,
+                                        capsys):
+        monkeypatch.setenv(transports.TRANSPORTS_ENV, 'telegram,stdout')
+        bot = MockBot()
+        poller = threaded.ThreadedPoller(bot, workers=2, session=MockSession())
+        poller.run_once(tenants[:3])
+        assert poller.flush(deadline=time.monotonic() + 1) == 3
+        assert len(capsys.readouterr().out.splitlines()) == 3
+        poller.close(deadline=time.monotonic() + 1)
+        assert not any(
+            worker.is_alive() for worker in poller.transports.workers
+        )
+
+    def test_flush_purges_old_messages(self):
+        poller = threaded.ThreadedPoller(
+            MockBot(), workers=2, session=MockSession()
+        )
+        poller.outbox.enqueue('1', 'old', key='old')
+        poller.outbox.connection.execute('UPDATE outbox SET sent_at = 0')
+        assert poller.flush() == 0
+        poller.close()
+        assert poller.outbox.connection.execute(
+            'SELECT COUNT(*) FROM outbox'
+        ).fetchone()[0] == 0
+
+    def test_same_verdict_not_resent(self, tenants):
+        bot = MockBot()
+        poller = threaded.ThreadedPoller(bot, workers=4, session=MockSession())
+        poller.run_once(tenants[:2])
+        poller.outbox.drain(poller.deliver)
+        bot.sent.clear()
+        poller.run_once(tenants[:2])
+        poller.close()
+        assert poller.outbox.pending() == 0
+
+    def test_busy_tenant_skipped(self, tenants):
+        session = MockSession()
+        poller = threaded.ThreadedPoller(MockBot(), workers=2, session=session)
+        with poller.lock_for(tenants[0].name):
+            poller.poll_tenant(tenants[0])
+        poller.close()
+        assert session.calls == []
+
+    def test_error_reported_to_tenant_chat(self, tenants):
+        class BrokenSession(MockSession):
+            def get(self, *args, **kwargs):
+                raise ConnectionError('нет связи')
+
+        bot = MockBot()
+        poller = threaded.ThreadedPoller(
+            bot, workers=2, session=BrokenSession()
+        )
+        poller.states.set(tenants[0].name, TenantState(timestamp=1))
+        poller.run_once(tenants[:1])
+        poller.outbox.drain(poller.deliver)
+        poller.close()
+        assert 'нет связи' in bot.sent[tenants[0].chat_id]
+        assert poller.states.get(tenants[0].name).last_error
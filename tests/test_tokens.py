@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+import tests.check_utils as check_utils
+import tokens
+from config import Tenant
+
+
+class MockPracticum:
+    """Стенд API: токены с префиксом bad отклоняются."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        token = headers['Authorization'].split()[-1]
+        if token.startswith('bad'):
+            return check_utils.MockResponseGET(
+                data={'code': 'not_authenticated'}, http_status=401
+            )
+        if token.startswith('down'):
+            raise ConnectionError('no route to host')
+        return check_utils.MockResponseGET(
+            data={'homeworks': [], 'current_date': 0}
+        )
+
+
+class BotError(Exception):
+    def __init__(self, error_code):
+        super().__init__(f'Error code: {error_code}')
+        self.error_code = error_code
+
+
+class MockBot:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def get_me(self):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+
+
+def tenant(token):
+    return Tenant(token, token, '1')
+
+
+class TestTokens:
+
+    def test_parallel_verification(self):
+        session = MockPracticum(delay=0.05)
+        verifier = tokens.TokenVerifier(session, workers=10)
+        tenants = [tenant(f'good{index}') for index in range(10)]
+        started = time.monotonic()
+        assert verifier.verify_all(tenants) == {
+            item.name: tokens.VALID for item in tenants
+        }
+        assert time.monotonic() - started < 0.3
+
+    def test_bad_tenants_quarantined_and_cached(self):
+        session = MockPracticum()
+        verifier = tokens.TokenVerifier(session)
+        tenants = [tenant('good'), tenant('bad'), tenant('down')]
+        assert verifier.admit(tenants) == [tenant('good'), tenant('down')]
+        assert session.calls == 3
+        verifier.admit(tenants)
+        assert session.calls == 4
+        assert verifier.stats() == {'hits': 2, 'misses': 4, 'size': 2}
+
+    def test_cache_expires(self):
+        session = MockPracticum()
+        verifier = tokens.TokenVerifier(session, ttl=0)
+        verifier.verify(tenant('good'))
+        verifier.verify(tenant('good'))
+        assert session.calls == 2
+
+    def test_cache_keeps_no_secrets(self):
+        verifier = tokens.TokenVerifier(MockPracticum())
+        verifier.verify(tenant('good-secret'))
+        assert 'good-secret' not in repr(verifier._cache)
+
+    def test_bot_token(self):
+        bot = MockBot()
+        verifier = tokens.TokenVerifier(MockPracticum(), bot)
+        verifier.verify_bot()
+        verifier.verify_bot()
+        assert bot.calls == 1
+        with pytest.raises(ValueError):
+            tokens.TokenVerifier(MockPracticum(), MockBot(BotError(401))
+                                 ).verify_bot()
+
+    @pytest.mark.parametrize('error', [
+        ConnectionError('no route to host'), BotError(502),
+    ])
+    def test_bot_check_retried_after_failure(self, error):
+        bot = MockBot(error)
+        verifier = tokens.TokenVerifier(MockPracticum(), bot)
+        assert verifier.verify_bot() == tokens.UNKNOWN
+        bot.error = None
+        assert verifier.verify_bot() == tokens.VALID
+        assert verifier.verify_bot() == tokens.VALID
+        assert bot.calls == 2
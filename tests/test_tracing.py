@@ -0,0 +1,174 @@
+import json
+import threading
+
+import pytest
+
+import homework
+from outbox import Outbox
+from profiling import IterationSpans
+from scheduler import NotificationScheduler
+from state import TenantState
+import tracing
+
+
+def read_traces(path):
+    with open(path, encoding='utf-8') as file:
+        return [
+            line['resourceSpans'][0]['scopeSpans'][0]['spans']
+            for line in map(json.loads, file)
+        ]
+
+
+class TestTracing:
+
+    def test_poll_spans_exported(self, tmp_path):
+        path = tmp_path / 'traces.json'
+        tracer = tracing.Tracer(
+            IterationSpans(), tracing.FileExporter(path), sample_rate=1
+        )
+        trace_id = tracer.begin('poll', tenant='default')
+        homework.poll(
+            TenantState(timestamp=0), tracer,
+            lambda timestamp: {'homeworks': [{
+                'homework_name': 'hw', 'status': 'approved'
+            }], 'current_date': 100},
+            lambda message, key=None, status=None: True
+        )
+        tracer.finish()
+        tracer.close()
+        [spans] = read_traces(path)
+        root, *stages = spans
+        assert root['name'] == 'poll'
+        assert root['attributes'] == [
+            {'key': 'tenant', 'value': {'stringValue': 'default'}}
+        ]
+        assert [span['name'] for span in stages] == [
+            'get_api_answer', 'check_response', 'parse_status',
+            'send_message',
+        ]
+        assert {span['traceId'] for span in spans} == {trace_id}
+        assert len(trace_id) == 32 and len(root['spanId']) == 16
+        assert all(
+            span['parentSpanId'] == root['spanId'] for span in stages
+        )
+        assert all(
+            int(span['startTimeUnixNano']) <= int(span['endTimeUnixNano'])
+            for span in spans
+        )
+        assert tracer.stats()['send_message'][0] == 1
+
+    def test_delivery_linked_to_poll(self, tmp_path):
+        path = tmp_path / 'traces.json'
+        tracer = tracing.Tracer(
+            IterationSpans(), tracing.FileExporter(path), sample_rate=1
+        )
+        outbox = Outbox(':memory:')
+        send = NotificationScheduler(outbox, tracer=tracer).sender('1')
+        trace_id = tracer.begin('poll')
+        homework.poll(
+            TenantState(timestamp=0), tracer,
+            lambda timestamp: {'homeworks': [{
+                'homework_name': 'hw', 'status': 'approved'
+            }], 'current_date': 100},
+            send
+        )
+        tracer.finish()
+        send('без трассы')
+        delivered = []
+        thread = threading.Thread(target=outbox.drain, kwargs=dict(
+            deliver=lambda chat_id, text: delivered.append(text) or False,
+            tracer=tracer
+        ))
+        thread.start()
+        thread.join()
+        outbox.close()
+        tracer.close()
+        assert len(delivered) == 2
+        [[root, *_], [deliver]] = read_traces(path)
+        assert deliver['name'] == tracing.DELIVER_SPAN
+        assert deliver['traceId'] == trace_id
+        assert deliver['parentSpanId'] == root['spanId']
+        assert deliver['status']['code'] == tracing.STATUS_ERROR
+        assert tracer.stats()[tracing.DELIVER_SPAN][0] == 1
+
+    def test_error_status(self, tmp_path):
+        path = tmp_path / 'traces.json'
+        tracer = tracing.Tracer(
+            IterationSpans(), tracing.FileExporter(path), sample_rate=1
+        )
+        tracer.begin('poll')
+        with pytest.raises(ValueError):
+            with tracer.span('get_api_answer'):
+                raise ValueError('нет ответа')
+        tracer.fail(ValueError('нет ответа'))
+        tracer.end()
+        [[root, stage]] = read_traces(path)
+        assert stage['status'] == {
+            'code': tracing.STATUS_ERROR, 'message': 'нет ответа'
+        }
+        assert root['status']['code'] == tracing.STATUS_ERROR
+
+    def test_sampling(self, tmp_path):
+        path = tmp_path / 'traces.json'
+        spans = IterationSpans()
+        tracer = tracing.Tracer(
+            spans, tracing.FileExporter(path), sample_rate=0.25, seed=1
+        )
+        sampled = 0
+        for _ in range(400):
+            sampled += tracer.begin('poll') is not None
+            with tracer.span('get_api_answer'):
+                pass
+            tracer.finish()
+        tracer.close()
+        assert 60 < sampled < 140
+        assert len(read_traces(path)) == sampled
+        assert spans.stats()['get_api_answer'][0] == 400
+
+    def test_disabled_without_exporter(self):
+        tracer = tracing.Tracer(IterationSpans(), sample_rate=1)
+        assert tracer.begin('poll') is None
+        with tracer.span('get_api_answer'):
+            pass
+        assert tracer.trace_id is None
+
+    def test_invalid_sample_rate(self):
+        with pytest.raises(ValueError):
+            tracing.Tracer(IterationSpans(), sample_rate=1.5)
+
+    def test_traces_per_thread(self, tmp_path):
+        path = tmp_path / 'traces.json'
+        tracer = tracing.Tracer(
+            IterationSpans(), tracing.FileExporter(path), sample_rate=1
+        )
+        barrier = threading.Barrier(4)
+
+        def iteration(index):
+            tracer.begin('poll_tenant', tenant=index)
+            barrier.wait()
+            with tracer.span('get_api_answer'):
+                barrier.wait()
+            tracer.end()
+
+        threads = [
+            threading.Thread(target=iteration, args=(index,))
+            for index in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        tracer.close()
+        traces = read_traces(path)
+        assert len(traces) == 4
+        for root, stage in traces:
+            assert stage['traceId'] == root['traceId']
+            assert stage['parentSpanId'] == root['spanId']
+
+    def test_from_env(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(tracing.TRACE_PATH_ENV, str(tmp_path / 't.json'))
+        monkeypatch.setenv(tracing.TRACE_SAMPLE_ENV, '1')
+        tracer = tracing.Tracer.from_env(IterationSpans())
+        assert tracer.sample_rate == 1
+        monkeypatch.delenv(tracing.TRACE_PATH_ENV)
+        assert tracing.Tracer.from_env(IterationSpans()).sample_rate == 0
@@ -0,0 +1,166 @@
+import io
+import threading
+import time
+
+import pytest
+
+import transports
+
+
+class SlowTransport(transports.Transport):
+    name = 'slow'
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def send_batch(self, messages):
+        self.release.wait(1)
+        self.batches.append(messages)
+
+
+class FailingTransport(transports.Transport):
+    name = 'failing'
+
+    def __init__(self):
+        self.calls = 0
+
+    def send_batch(self, messages):
+        self.calls += 1
+        raise ConnectionError('sink is down')
+
+
+class MockSession:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.posts.append((url, data))
+        return self
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MockSMTP:
+    sent = []
+
+    def __init__(self, host, port, timeout=None):
+        self.address = (host, port)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def send_message(self, message):
+        self.sent.append((self.address, message))
+
+
+class TestTransports:
+
+    def test_telegram_only_is_unchanged(self, monkeypatch):
+        monkeypatch.delenv(transports.TRANSPORTS_ENV, raising=False)
+
+        def deliver(chat_id, text):
+            return True
+
+        assert transports.deliver_from_env(deliver) is deliver
+
+    def test_transport_requires_send_batch(self):
+        class Incomplete(transports.Transport):
+            name = 'incomplete'
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_unknown_transport(self):
+        with pytest.raises(ValueError):
+            transports.deliver_from_env(None, 'telegram,pigeon')
+
+    def test_slow_sink_does_not_block_others(self):
+        slow = SlowTransport()
+        stream = io.StringIO()
+        fan_out = transports.FanOut(
+            lambda chat_id, text: True,
+            [slow, transports.StdoutTransport(stream)]
+        )
+        for index in range(3):
+            assert fan_out('1', f'message {index}')
+        fan_out.workers[1].queue.join()
+        assert stream.getvalue().splitlines() == [
+            '[1] message 0', '[1] message 1', '[1] message 2'
+        ]
+        assert slow.batches == []
+        slow.release.set()
+        fan_out.close()
+        assert sum(map(len, slow.batches)) == 3
+        assert len(slow.batches) <= 2
+
+    def test_join_and_close_bounded(self):
+        slow = SlowTransport()
+        fan_out = transports.FanOut(None, [slow])
+        fan_out('1', 'text')
+        started = time.monotonic()
+        assert not fan_out.join(timeout=0.1)
+        assert not fan_out.close(timeout=0.1)
+        assert time.monotonic() - started < 0.5
+        slow.release.set()
+        assert fan_out.join(timeout=1)
+        assert fan_out.close(timeout=1)
+        assert slow.batches == [[('1', 'text')]]
+
+    def test_primary_failure_is_not_fanned_out(self):
+        stream = io.StringIO()
+        fan_out = transports.FanOut(
+            lambda chat_id, text: False, [transports.StdoutTransport(stream)]
+        )
+        assert not fan_out('1', 'text')
+        fan_out.close()
+        assert stream.getvalue() == ''
+
+    def test_failing_sink_retries_and_drops(self):
+        failing = FailingTransport()
+        fan_out = transports.FanOut(None, [failing], retries=2, retry_pause=0)
+        assert fan_out('1', 'text')
+        fan_out.close()
+        assert failing.calls == 2
+        assert fan_out.workers[0].dropped == 1
+
+    def test_full_queue_drops(self):
+        slow = SlowTransport()
+        fan_out = transports.FanOut(None, [slow], queue_size=1)
+        results = [fan_out.workers[0].put('1', str(index))
+                   for index in range(5)]
+        assert not all(results)
+        slow.release.set()
+        fan_out.close()
+
+    def test_webhook_batches(self):
+        session = MockSession()
+        fan_out = transports.FanOut(None, [
+            transports.WebhookTransport('http://hook', session=session)
+        ])
+        fan_out('1', 'a')
+        fan_out('2', 'b')
+        fan_out.close()
+        assert all(url == 'http://hook' for url, _ in session.posts)
+        assert sum(
+            data.decode().count('"chat_id"') for _, data in session.posts
+        ) == 2
+
+    def test_email(self, monkeypatch):
+        monkeypatch.setattr(transports.smtplib, 'SMTP', MockSMTP)
+        monkeypatch.setenv(transports.TRANSPORTS_ENV, 'email')
+        monkeypatch.setenv(transports.EMAIL_TO_ENV, 'a@example.com')
+        fan_out = transports.deliver_from_env(None)
+        assert fan_out('1', 'Работа проверена')
+        fan_out.close()
+        address, message = MockSMTP.sent[-1]
+        assert address == ('localhost', 25)
+        assert message['To'] == 'a@example.com'
+        assert message.get_content().strip() == 'Работа проверена'
@@ -0,0 +1,92 @@
+from contextlib import nullcontext
+
+import pytest
+
+import homework
+from state import TenantState
+
+
+class Spans:
+    def span(self, name):
+        return nullcontext()
+
+
+class TestValidation:
+
+    @pytest.mark.parametrize('response, code', [
+        ([], homework.RESPONSE_TYPE),
+        ({'current_date': 1}, homework.NO_HOMEWORKS_KEY),
+        ({'homeworks': None}, homework.HOMEWORKS_TYPE),
+    ])
+    def test_invalid_response(self, response, code):
+        result = homework.validate_response(response)
+        assert not result.ok
+        assert result.code == code
+        with pytest.raises(homework.ERROR_TYPES[code]) as error:
+            homework.check_response(response)
+        assert error.value.args[0] == result.message
+
+    @pytest.mark.parametrize('work, code', [
+        ('hw', homework.NO_HOMEWORK_NAME),
+        ({'status': 'approved'}, homework.NO_HOMEWORK_NAME),
+        ({'homework_name': 'hw'}, homework.NO_HOMEWORK_STATUS),
+        ({'homework_name': 'hw', 'status': 'lost'}, homework.UNKNOWN_STATUS),
+    ])
+    def test_invalid_homework(self, work, code):
+        result = homework.validate_homework(work)
+        assert not result.ok
+        assert result.code == code
+        with pytest.raises(homework.ERROR_TYPES[code]) as error:
+            homework.parse_status(work)
+        assert error.value.args[0] == result.message
+
+    def test_valid(self):
+        work = {'homework_name': 'hw', 'status': 'approved'}
+        assert homework.validate_response({'homeworks': [work]}) == (
+            homework.Validation(True, [work])
+        )
+        assert homework.validate_homework(work).value == 'approved'
+        assert homework.status_message(work, 'approved') == (
+            homework.parse_status(work)
+        )
+
+    @pytest.mark.parametrize('response', [
+        {'current_date': 1},
+        {'homeworks': [{'homework_name': 'hw', 'status': 'lost'}]},
+    ])
+    def test_poll_reports_without_raising(self, response):
+        sent = []
+        state = homework.poll(
+            TenantState(timestamp=0), Spans(), lambda timestamp: response,
+            lambda message, key=None, status=None: sent.append(message) or 1,
+            validate=homework.validate_response,
+            render_error=lambda error: f'error: {error}'
+        )
+        assert sent == [state.last_error]
+        assert state.last_error.startswith('error: ')
+        assert state.timestamp == 0
+
+    def test_poll_does_not_raise_by_default(self):
+        sent = []
+        state = homework.poll(
+            TenantState(timestamp=0), Spans(),
+            lambda timestamp: {'current_date': 1},
+            lambda message, key=None, status=None: sent.append(message) or 1
+        )
+        assert sent == [state.last_error]
+        assert homework.NO_HOMEWORK_KEY_ERROR in state.last_error
+
+    def test_homework_validated_once(self, monkeypatch):
+        calls = []
+        validate = homework.validate_homework
+        monkeypatch.setattr(
+            homework, 'validate_homework',
+            lambda work: calls.append(work) or validate(work)
+        )
+        work = {'homework_name': 'hw', 'status': 'approved'}
+        homework.poll(
+            TenantState(timestamp=0), Spans(),
+            lambda timestamp: {'homeworks': [work], 'current_date': 1},
+            lambda message, key=None, status=None: True
+        )
+        assert calls == [work]
@@ -0,0 +1,446 @@
+"""Опрос многих студентов в пуле потоков.
+
+Каждый студент опрашивается теми же функциями, что и в main(), но
+параллельно: запросы идут через одну общую Session с пулом соединений
+по числу потоков, а состояние студента обновляется под его блокировкой
+в шардированной карте состояний, которую фоновый поток сохраняет
+снимками только изменённых студентов. Сообщения собираются по шаблонам
+на языке и в разметке студента и ставятся в очередь Outbox, её
+разбирает отдельный поток.
+
+run_single_shot — разовый запуск для cron и бессерверных платформ:
+один цикл опроса всех студентов с курсорами из StateStore, доставка
+очереди и выход, всё в пределах бюджета времени.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+import logging
+import threading
+import time
+
+import homework
+from botapi import bot_from_env, send_workers
+from governor import RequestGovernor, priority_for_status
+from footprint import MemoryGuard, tune_gc
+from history import HistoryStore
+from latency import AdaptiveFetcher, time_left
+from outbox import Outbox, OutboxSender
+from profiling import IterationSpans
+from scheduler import NotificationScheduler, QuietHours, rate_limited
+from state import ShardedState, StatePersister, StateStore, TenantState
+import templates
+from tokens import TokenVerifier
+from tracing import Tracer
+from transports import deliver_from_env, FanOut
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 16
+TENANT_TRACE = 'poll_tenant'
+MEMORY_WINDOW = 4
+HEDGE_SLOTS = 2
+SINGLE_SHOT_BUDGET = 60
+POLL_SHARE = 0.75
+
+TENANT_SKIPPED = 'Студент {tenant} ещё опрашивается, пропускаем цикл.'
+CYCLE_DONE = 'Опрошено студентов: {count} за {elapsed:.3f} с.'
+CYCLE_LATE = ('Бюджет времени исчерпан, не опрошено студентов: '
+              '{count}.')
+SINGLE_SHOT_DONE = ('Разовый запуск: опрошено {polled} из {total}, '
+                    'доставлено сообщений: {sent}, ошибок: {errors}.')
+
+
+def make_session(pool_size):
+    """Session с пулом keep-alive соединений на pool_size потоков."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class ThreadedPoller:
+    """Опрашиваем студентов параллельно в ThreadPoolExecutor."""
+
+    def __init__(self, bot, workers=WORKERS, session=None, governor=None,
+                 outbox=None, history=None, store=None, recorder=None,
+                 verify_tokens=False, memory=None, latency=None,
+                 events=None):
+        """Создаём пул потоков и общую Session такого же размера.
+
+        Если передано хранилище store, состояния студентов загружаются
+        из него и сохраняются в него в фоне. Если передан recorder,
+        ответы API записываются для воспроизведения (replay.py).
+        С verify_tokens студенты с отклонённым токеном не опрашиваются.
+        С memory (footprint.MemoryGuard) студенты опрашиваются окнами
+        по memory.window, а ответы API разбираются потоком. latency —
+        AdaptiveFetcher с таймаутами по задержке (по умолчанию свой,
+        с пулом на основной и дублирующий запрос каждого потока).
+        В events (events.EventStream) публикуются смены статусов.
+        """
+        self.bot = bot
+        self.parse_modes = {}
+        self.outbox = outbox if outbox is not None else Outbox()
+        self.spans = Tracer.from_env(IterationSpans())
+        self.scheduler = NotificationScheduler(self.outbox, tracer=self.spans)
+        self.transports = deliver_from_env(self.deliver)
+        self.delivery = rate_limited(self.transports)
+        self.history = history if history is not None else HistoryStore()
+        self.workers = workers
+        self.session = session if session is not None else make_session(
+            workers
+        )
+        self.governor = governor
+        self.latency = (
+            latency if latency is not None
+            else AdaptiveFetcher(workers=HEDGE_SLOTS * workers)
+        )
+        self.recorder = recorder
+        self.verifier = TokenVerifier(
+            self.session, bot, governor
+        ) if verify_tokens else None
+        self.memory = memory
+        self.events = events
+        if memory is not None:
+            memory.add_relief(templates.clear_cache)
+            if self.verifier is not None:
+                memory.add_relief(self.verifier.prune)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='poller'
+        )
+        self.states = ShardedState()
+        self.persister = None
+        if store is not None:
+            self.states.load(store.load_tenants())
+            self.persister = StatePersister(self.states, store)
+        self.locks = {}
+        self._locks_guard = threading.Lock()
+        self.running = set()
+        self.started = int(time.time())
+
+    def deliver(self, chat_id, text):
+        """Доставляем сообщение из очереди в разметке его чата."""
+        return homework.send_chat_message(
+            self.bot, chat_id, text, parse_mode=self.parse_modes.get(chat_id)
+        )
+
+    def lock_for(self, name):
+        """Блокировка состояния студента name."""
+        with self._locks_guard:
+            return self.locks.setdefault(name, threading.Lock())
+
+    def poll_tenant(self, tenant):
+        """Опрашиваем одного студента и сохраняем его новое состояние.
+
+        Если предыдущий опрос этого студента ещё идёт, цикл пропускаем,
+        чтобы не обгонять самих себя и не отправлять вердикт дважды.
+        Возвращает True, если студент опрошен, и False, если пропущен.
+        """
+        lock = self.lock_for(tenant.name)
+        if not lock.acquire(blocking=False):
+            logger.warning(TENANT_SKIPPED.format(tenant=tenant.name))
+            return False
+        self.spans.begin(TENANT_TRACE, tenant=tenant.name)
+        try:
+            state = self.states.get(tenant.name) or TenantState(
+                timestamp=self.started
+            )
+            fetch = partial(
+                homework.fetch_homeworks,
+                headers=homework.tenant_headers(tenant),
+                http=self.session,
+                governor=self.governor,
+                priority=priority_for_status(state.last_status),
+                stream=self.memory is not None,
+                latency=self.latency
+            )
+            if self.recorder is not None:
+                fetch = self.recorder.wrap(fetch, tenant.name)
+            self.parse_modes[tenant.chat_id] = templates.parse_mode(
+                tenant.markup
+            )
+            self.scheduler.set_quiet_hours(
+                tenant.chat_id, QuietHours.parse(tenant.quiet_hours)
+            )
+            send = self.scheduler.sender(tenant.chat_id)
+            record = partial(self.history.record, tenant.name)
+            if self.events is not None:
+                record = self.events.recorder(tenant.name, record)
+            style = dict(locale=tenant.locale, markup=tenant.markup)
+            try:
+                state = homework.poll(
+                    state, self.spans, fetch, send, record,
+                    render=partial(templates.render_status, **style),
+                    validate=homework.validate_response,
+                    render_error=partial(templates.render_error, **style)
+                )
+            except Exception as error:
+                self.spans.fail(error)
+                state = homework.report_error(
+                    state, error, send,
+                    render=partial(templates.render_error, **style)
+                )
+            self.states.set(tenant.name, state)
+        finally:
+            self.spans.end()
+            lock.release()
+        return True
+
+    def admitted(self, tenants):
+        """Студенты для опроса: без тех, чей токен отклонён.
+
+        Токен бота проверяется здесь же: если Telegram не ответил,
+        проверка повторится в следующем цикле.
+        """
+        if self.verifier is None:
+            return tenants
+        self.verifier.verify_bot()
+        return self.verifier.admit(tenants)
+
+    def windows(self, tenants):
+        """Студенты окнами по memory.window, а без memory — все сразу.
+
+        Размер окна перечитывается после каждого окна: при нехватке
+        памяти MemoryGuard его уменьшает.
+        """
+        if self.memory is None:
+            yield tenants
+            return
+        tenants = list(tenants)
+        start = 0
+        while start < len(tenants):
+            window = tenants[start:start + self.memory.window]
+            yield window
+            start += len(window)
+            self.memory.check()
+
+    def run_once(self, tenants, deadline=None):
+        """Один цикл: опрашиваем всех студентов и ждём окончания.
+
+        С deadline (момент по time.monotonic()) ждём не дольше него:
+        ещё не начатые опросы отменяются, а начатые обрываются
+        таймаутами запросов; close дожидается их, чтобы не потерять
+        состояние. Возвращает число опрошенных студентов: пропущенные
+        из-за ещё идущего опроса не считаются.
+        """
+        started = time.perf_counter()
+        tenants = list(tenants)
+        count = submitted = 0
+        for window in self.windows(tenants):
+            futures = [
+                self.executor.submit(self.poll_tenant, tenant)
+                for tenant in window
+            ]
+            submitted += len(futures)
+            done, pending = wait(futures, timeout=time_left(deadline))
+            count += sum(
+                future.exception() is None and future.result()
+                for future in done
+            )
+            if pending:
+                for future in pending:
+                    if not future.cancel():
+                        self.running.add(future)
+                logger.warning(CYCLE_LATE.format(
+                    count=len(tenants) - submitted + len(pending)
+                ))
+                break
+        self.history.flush()
+        self.spans.finish()
+        logger.debug(CYCLE_DONE.format(
+            count=count, elapsed=time.perf_counter() - started
+        ))
+        return count
+
+    def flush(self, deadline=None):
+        """Доставляем подошедшие сообщения очереди, не дожидаясь потока.
+
+        Сообщения, отложенные тихими часами или повтором после ошибки,
+        остаются в очереди. Дополнительные каналы (transports.FanOut)
+        успевают разобрать свои очереди до deadline. Старые доставленные
+        сообщения удаляются из очереди (для разовых запусков, где нет
+        OutboxSender). Возвращает число доставленных сообщений.
+        """
+        sent = 0
+        while deadline is None or time.monotonic() < deadline:
+            delivered = self.outbox.drain(
+                self.delivery, workers=send_workers(), tracer=self.spans
+            )
+            if not delivered:
+                break
+            sent += delivered
+        if isinstance(self.transports, FanOut):
+            self.transports.join(time_left(deadline))
+        self.outbox.purge()
+        return sent
+
+    def run(self, watcher, heartbeat=None):
+        """Бесконечный цикл опроса; настройки перечитываются на лету.
+
+        После каждого цикла отмечаемся в heartbeat, если он передан.
+        """
+        OutboxSender(
+            self.outbox, self.delivery, workers=send_workers(),
+            tracer=self.spans
+        ).start()
+        if self.persister is not None:
+            self.persister.start()
+        if self.memory is not None:
+            tune_gc()
+        while True:
+            if watcher.refresh():
+                homework.apply_settings(watcher.settings)
+            self.run_once(self.admitted(watcher.settings.tenants))
+            if heartbeat is not None:
+                heartbeat.beat()
+            time.sleep(homework.RETRY_PERIOD)
+
+    def finish_running(self, deadline=None):
+        """Ждём начатых опросов, оборванных бюджетом, не дольше deadline."""
+        wait(self.running, timeout=time_left(deadline))
+        self.running.clear()
+
+    def close(self, wait=True, deadline=None):
+        """Останавливаем пул, сохраняем состояние, закрываем соединения.
+
+        Без wait неначатые опросы отменяем, а начатые (оборванные
+        бюджетом run_once) ждём не дольше deadline (момент по
+        time.monotonic()), чтобы их состояние попало в последнее
+        сохранение. Дополнительные каналы доставки дописывают очереди
+        не дольше deadline.
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+        self.finish_running(deadline)
+        if isinstance(self.transports, FanOut):
+            self.transports.close(time_left(deadline))
+        self.spans.close()
+        self.latency.close()
+        if self.events is not None:
+            self.events.close()
+        if self.persister is not None:
+            self.persister.stop()
+        self.session.close()
+
+
+def run_threaded(workers=WORKERS, rate=None):
+    """Опрашиваем студентов из настроек в пуле потоков, без остановки."""
+    from telebot import TeleBot
+
+    from config import ConfigWatcher
+    from events import EventStream
+    from health import (
+        Heartbeat, start_health_server, TelegramProbe, tokens_ready
+    )
+    from replay import recorder_from_env
+
+    homework.check_tokens()
+    watcher = ConfigWatcher(homework.current_settings())
+    watcher.install_signal_handler()
+    homework.apply_settings(watcher.settings)
+    bot = bot_from_env(TeleBot(token=homework.TELEGRAM_TOKEN))
+    governor = RequestGovernor(max_per_host=workers, rate=rate)
+    poller = ThreadedPoller(
+        bot,
+        workers=workers,
+        governor=governor,
+        store=StateStore(),
+        recorder=recorder_from_env(),
+        verify_tokens=True,
+        memory=MemoryGuard.from_env(max_window=workers * MEMORY_WINDOW),
+        events=EventStream.from_env()
+    )
+    stats = {
+        'templates': templates.cache_stats,
+        'tokens': poller.verifier.stats,
+        'latency': poller.latency.stats,
+        'governor': governor.stats,
+        'spans': poller.spans.stats,
+    }
+    if poller.events is not None:
+        stats['events'] = poller.events.stats
+    heartbeat = Heartbeat()
+    start_health_server(
+        heartbeat,
+        retry_period=lambda: homework.RETRY_PERIOD,
+        checks={
+            'tokens': partial(tokens_ready, homework.check_tokens),
+            'telegram': TelegramProbe(bot),
+        },
+        backlogs={
+            'outbox': poller.outbox.pending,
+            'history': poller.history.pending,
+        },
+        stats=stats,
+        events=poller.events
+    )
+    poller.run(watcher, heartbeat)
+
+
+def run_single_shot(budget=SINGLE_SHOT_BUDGET, workers=WORKERS, rate=None):
+    """Один цикл опроса всех студентов не дольше budget секунд.
+
+    Опросу достаётся POLL_SHARE бюджета, остаток — доставке сообщений
+    и сохранению курсоров. Студенты, которых не успели опросить,
+    сохраняют прежний курсор и будут опрошены в следующий запуск.
+    Токены студентов заранее не проверяются: кеш проверок не пережил бы
+    запуска. Возвращает True, если все студенты опрошены без ошибок.
+    """
+    from telebot import TeleBot
+
+    from config import ConfigWatcher
+    from events import EventStream
+    from replay import recorder_from_env
+
+    started = time.monotonic()
+    deadline = started + budget
+    homework.check_tokens()
+    settings = ConfigWatcher(homework.current_settings()).settings
+    homework.apply_settings(settings)
+    store = StateStore()
+    poller = ThreadedPoller(
+        bot_from_env(TeleBot(token=homework.TELEGRAM_TOKEN)),
+        workers=workers,
+        governor=RequestGovernor(max_per_host=workers, rate=rate),
+        store=store,
+        recorder=recorder_from_env(),
+        memory=MemoryGuard.from_env(max_window=workers * MEMORY_WINDOW),
+        latency=AdaptiveFetcher(
+            workers=HEDGE_SLOTS * workers,
+            deadline=started + budget * POLL_SHARE
+        ),
+        events=EventStream.from_env()
+    )
+    try:
+        polled = poller.run_once(
+            settings.tenants, deadline=poller.latency.deadline
+        )
+        sent = poller.flush(deadline)
+    finally:
+        poller.close(wait=False, deadline=deadline)
+        store.close()
+    errors = sum(
+        poller.states.get(tenant.name, TenantState(0)).last_error
+        is not None
+        for tenant in settings.tenants
+    )
+    logger.info(SINGLE_SHOT_DONE.format(
+        polled=polled, total=len(settings.tenants), sent=sent, errors=errors
+    ))
+    return polled == len(settings.tenants) and not errors
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--rate', type=float, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(
+        format='%(threadName)s - %(asctime)s - %(name)s - '
+               '%(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    run_threaded(args.workers, args.rate)
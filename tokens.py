@@ -0,0 +1,208 @@
+"""Проверка токенов студентов до начала опроса.
+
+check_tokens видит только отсутствующие переменные, а неверный токен
+обнаруживается лишь на первом опросе. Здесь токен Практикума каждого
+студента проверяется пробным запросом, токен бота — вызовом getMe;
+студенты проверяются параллельно, а результаты кешируются на ttl
+секунд по хешу токена (сами токены в кеше не хранятся). Студенты
+с отклонённым токеном исключаются из опроса, пока кеш не истечёт.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import hashlib
+from http import HTTPStatus
+import logging
+import threading
+import time
+
+import homework
+
+logger = logging.getLogger(__name__)
+
+VALID = 'valid'
+INVALID = 'invalid'
+UNKNOWN = 'unknown'
+TTL = 60 * 60
+INVALID_TTL = 5 * 60
+WORKERS = 8
+TIMEOUT = 10
+REJECTED_CODES = (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN)
+BOT_REJECTED_CODES = (HTTPStatus.UNAUTHORIZED, HTTPStatus.NOT_FOUND)
+
+TENANT_QUARANTINED = 'Токен студента {tenant} отклонён, опрос приостановлен.'
+TOKEN_UNVERIFIED = 'Не удалось проверить токен студента {tenant}: {error}'
+BOT_TOKEN_INVALID = 'Токен бота отклонён Telegram: {error}'
+BOT_TOKEN_UNVERIFIED = 'Не удалось проверить токен бота: {error}'
+
+
+def token_digest(token):
+    """Ключ кеша: хеш токена вместо самого токена."""
+    return hashlib.sha256(str(token).encode('utf-8')).hexdigest()
+
+
+def error_code(error):
+    """Код ответа HTTP из ошибки TeleBot или BotApiClient или None.
+
+    У сетевых ошибок кода нет.
+    """
+    code = getattr(error, 'error_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'result', None), 'status_code', None)
+    return code
+
+
+class TokenVerifier:
+    """Параллельная проверка токенов с кешем результатов."""
+
+    def __init__(self, session=None, bot=None, governor=None, ttl=TTL,
+                 invalid_ttl=INVALID_TTL, workers=WORKERS):
+        """Запоминаем Session (или модуль requests) и бота TeleBot.
+
+        Пробные запросы идут через governor, если он передан, чтобы
+        проверка тысяч студентов не превысила общий лимит запросов.
+        """
+        self.session = session
+        self.bot = bot
+        self.governor = governor
+        self.ttl = ttl
+        self.invalid_ttl = invalid_ttl
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, token):
+        """Результат из кеша или None, если его нет или он истёк."""
+        with self._lock:
+            entry = self._cache.get(token_digest(token))
+            fresh = entry is not None and entry[1] > time.monotonic()
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry[0] if fresh else None
+
+    def remember(self, token, result):
+        """Кладём результат в кеш; неизвестный результат не кешируем."""
+        if result == UNKNOWN:
+            return
+        ttl = self.ttl if result == VALID else self.invalid_ttl
+        with self._lock:
+            self._cache[token_digest(token)] = (
+                result, time.monotonic() + ttl
+            )
+
+    def stats(self):
+        """Попадания в кеш результатов проверки."""
+        with self._lock:
+            return {
+                'hits': self.hits, 'misses': self.misses,
+                'size': len(self._cache),
+            }
+
+    def prune(self):
+        """Выбрасываем из кеша истёкшие результаты."""
+        now = time.monotonic()
+        with self._lock:
+            self._cache = {
+                key: entry for key, entry in self._cache.items()
+                if entry[1] > now
+            }
+
+    def check_practicum(self, tenant):
+        """Пробный запрос к API от имени студента."""
+        http = self.session
+        if http is None:
+            import requests as http
+        slot = (
+            self.governor.slot(homework.ENDPOINT)
+            if self.governor is not None else nullcontext()
+        )
+        try:
+            with slot:
+                response = http.get(
+                    homework.ENDPOINT,
+                    headers=homework.tenant_headers(tenant),
+                    params={'from_date': int(time.time())},
+                    timeout=TIMEOUT
+                )
+        except Exception as error:
+            logger.warning(TOKEN_UNVERIFIED.format(
+                tenant=tenant.name, error=error
+            ))
+            return UNKNOWN
+        if response.status_code in REJECTED_CODES:
+            return INVALID
+        if response.status_code == HTTPStatus.OK:
+            return VALID
+        logger.warning(TOKEN_UNVERIFIED.format(
+            tenant=tenant.name, error=response.status_code
+        ))
+        return UNKNOWN
+
+    def verify(self, tenant):
+        """Результат проверки токена студента (из кеша, если он свежий)."""
+        result = self.cached(tenant.practicum_token)
+        if result is None:
+            result = self.recheck(tenant)
+        return result
+
+    def recheck(self, tenant):
+        """Проверяем токен студента запросом и запоминаем результат."""
+        result = self.check_practicum(tenant)
+        self.remember(tenant.practicum_token, result)
+        if result == INVALID:
+            logger.error(TENANT_QUARANTINED.format(tenant=tenant.name))
+        return result
+
+    def verify_bot(self):
+        """Проверяем токен бота через getMe.
+
+        Отказ Telegram (401 или 404) — ValueError: с таким токеном бот
+        не работает. Сбой сети или ошибка сервера только пишется
+        в журнал и возвращает UNKNOWN: результат не кешируется, и
+        следующий вызов проверит токен заново.
+        """
+        if self.bot is None:
+            return None
+        result = self.cached(homework.TELEGRAM_TOKEN)
+        if result is not None:
+            return result
+        try:
+            self.bot.get_me()
+        except Exception as error:
+            if error_code(error) in BOT_REJECTED_CODES:
+                raise ValueError(BOT_TOKEN_INVALID.format(error=error))
+            logger.warning(BOT_TOKEN_UNVERIFIED.format(error=error))
+            return UNKNOWN
+        self.remember(homework.TELEGRAM_TOKEN, VALID)
+        return VALID
+
+    def verify_all(self, tenants):
+        """Проверяем всех студентов параллельно: {имя: результат}."""
+        results = {}
+        stale = []
+        for tenant in tenants:
+            result = self.cached(tenant.practicum_token)
+            if result is None:
+                stale.append(tenant)
+            else:
+                results[tenant.name] = result
+        if stale:
+            with ThreadPoolExecutor(
+                max_workers=min(self.workers, len(stale)),
+                thread_name_prefix='tokens'
+            ) as executor:
+                results.update(zip(
+                    (tenant.name for tenant in stale),
+                    executor.map(self.recheck, stale)
+                ))
+        return results
+
+    def admit(self, tenants):
+        """Студенты, которых стоит опрашивать: все, кроме отклонённых."""
+        results = self.verify_all(tenants)
+        return [
+            tenant for tenant in tenants if results[tenant.name] != INVALID
+        ]
@@ -0,0 +1,301 @@
+"""Трассировка итераций опроса в формате OpenTelemetry.
+
+Каждая итерация (в main() — цикл опроса, в threaded.py — опрос одного
+студента) получает свой trace id, а этапы get_api_answer,
+check_response, parse_status и send_message становятся её дочерними
+спанами. Сообщение в очереди хранит контекст трассы, которая его
+поставила (context()), и когда отправитель очереди его доставит,
+в ту же трассу дописывается спан deliver (delivered()). Трассы пишутся
+построчно в файл HOMEWORK_BOT_TRACE_PATH в JSON-формате OTLP (как
+у file exporter в OpenTelemetry Collector), поэтому медленное
+уведомление можно найти вместе с запросом, который его породил.
+Записывается только доля итераций HOMEWORK_BOT_TRACE_SAMPLE (от 0 до 1):
+решение принимается в начале итерации, и у несэмплированной итерации
+этапы только замеряются для IterationSpans.
+"""
+from contextlib import contextmanager
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_PATH_ENV = 'HOMEWORK_BOT_TRACE_PATH'
+TRACE_SAMPLE_ENV = 'HOMEWORK_BOT_TRACE_SAMPLE'
+DEFAULT_SAMPLE_RATE = 0.1
+SERVICE_NAME = 'homework-bot'
+SCOPE_NAME = 'homework_bot.tracing'
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+DELIVER_SPAN = 'deliver'
+
+SAMPLE_RATE_ERROR = 'Доля трассируемых итераций должна быть от 0 до 1: {rate}'
+TRACE_EXPORT_FAILED = 'Не удалось записать трассу в {path}: {error}'
+NOT_DELIVERED = 'Сообщение не доставлено.'
+
+
+def otlp_attributes(values):
+    """Атрибуты спана в формате OTLP."""
+    return [
+        {'key': key, 'value': (
+            {'intValue': str(value)} if isinstance(value, int)
+            else {'stringValue': str(value)}
+        )}
+        for key, value in values.items()
+    ]
+
+
+class Span:
+    """Спан трассы: время в наносекундах с эпохи."""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'start', 'end',
+                 'attributes', 'error', 'links')
+
+    def __init__(self, name, span_id, parent_id=None, attributes=None):
+        """Начинаем спан сейчас."""
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes or {}
+        self.error = None
+        self.links = []
+
+    def to_otlp(self, trace_id):
+        """Спан в формате OTLP JSON."""
+        span = {
+            'traceId': trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': SPAN_KIND_INTERNAL,
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'attributes': otlp_attributes(self.attributes),
+            'status': (
+                {'code': STATUS_ERROR, 'message': self.error}
+                if self.error is not None else {'code': STATUS_OK}
+            ),
+        }
+        if self.parent_id is not None:
+            span['parentSpanId'] = self.parent_id
+        if self.links:
+            span['links'] = [
+                {'traceId': trace_id, 'spanId': span_id}
+                for trace_id, span_id in self.links
+            ]
+        return span
+
+
+class Trace:
+    """Трасса одной итерации: корневой спан и этапы."""
+
+    def __init__(self, trace_id, root):
+        """Начинаем трассу с корневого спана root."""
+        self.trace_id = trace_id
+        self.root = root
+        self.spans = [root]
+
+
+class FileExporter:
+    """Пишем трассы в файл, по одному запросу OTLP на строку."""
+
+    def __init__(self, path, service=SERVICE_NAME):
+        """Файл дописывается; открываем его при первой трассе."""
+        self.path = path
+        self.resource = {
+            'attributes': otlp_attributes({'service.name': service})
+        }
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, trace):
+        """Записываем законченную трассу."""
+        line = json.dumps({'resourceSpans': [{
+            'resource': self.resource,
+            'scopeSpans': [{
+                'scope': {'name': SCOPE_NAME},
+                'spans': [span.to_otlp(trace.trace_id)
+                          for span in trace.spans],
+            }],
+        }]}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        """Закрываем файл."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Tracer:
+    """IterationSpans с трассировкой сэмплированных итераций.
+
+    Поддерживает тот же span(name), что и IterationSpans, и передаёт
+    ему все замеры. Итерация начинается с begin() и заканчивается end()
+    (или finish() в однопоточном цикле); трасса текущей итерации у
+    каждого потока своя.
+    """
+
+    def __init__(self, spans, exporter=None, sample_rate=DEFAULT_SAMPLE_RATE,
+                 seed=None):
+        """Без exporter трассы не собираются."""
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(SAMPLE_RATE_ERROR.format(rate=sample_rate))
+        self.spans = spans
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter is not None else 0
+        self._random = random.Random(seed)
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, spans):
+        """Трассировка по HOMEWORK_BOT_TRACE_PATH и _TRACE_SAMPLE."""
+        path = os.getenv(TRACE_PATH_ENV)
+        return cls(
+            spans,
+            FileExporter(path) if path else None,
+            float(os.getenv(TRACE_SAMPLE_ENV, DEFAULT_SAMPLE_RATE))
+        )
+
+    @property
+    def trace(self):
+        """Трасса текущей итерации этого потока или None."""
+        return getattr(self._local, 'trace', None)
+
+    @property
+    def trace_id(self):
+        """Идентификатор трассы текущей итерации, если она сэмплирована."""
+        trace = self.trace
+        return trace.trace_id if trace is not None else None
+
+    def context(self):
+        """Контекст «trace_id-span_id» корня текущей трассы или None.
+
+        Его хранят вместе с сообщением в очереди, чтобы связать доставку
+        с опросом, который поставил сообщение.
+        """
+        trace = self.trace
+        if trace is None:
+            return None
+        return f'{trace.trace_id}-{trace.root.span_id}'
+
+    def new_id(self, bits):
+        """Случайный идентификатор в шестнадцатеричном виде."""
+        return f'{self._random.getrandbits(bits):0{bits // 4}x}'
+
+    def begin(self, name, **attributes):
+        """Начинаем итерацию; трассируем её с вероятностью sample_rate."""
+        self.end()
+        if (not self.sample_rate
+                or self._random.random() >= self.sample_rate):
+            return None
+        trace = Trace(self.new_id(128), Span(
+            name, self.new_id(64), attributes=attributes
+        ))
+        self._local.trace = trace
+        return trace.trace_id
+
+    def span(self, name):
+        """Замеряем этап и, если итерация трассируется, пишем спан.
+
+        Вне трассы это просто замер IterationSpans, без лишних обёрток.
+        """
+        trace = self.trace
+        if trace is None:
+            return self.spans.span(name)
+        return self.traced_span(trace, name)
+
+    @contextmanager
+    def traced_span(self, trace, name):
+        """Спан этапа трассы trace."""
+        span = Span(name, self.new_id(64), trace.root.span_id)
+        try:
+            with self.spans.span(name):
+                yield
+        except Exception as error:
+            span.error = str(error)
+            raise
+        finally:
+            span.end = time.time_ns()
+            trace.spans.append(span)
+
+    def delivered(self, deliver, chat_id, text, contexts=()):
+        """deliver(chat_id, text) со спаном deliver в трассе опроса.
+
+        contexts — контексты трасс сообщений (context()); сводка тихих
+        часов собирает несколько. Спан становится дочерним для первой
+        трассы и ссылается (links) на остальные. Если ни одна из них
+        не сэмплирована, deliver просто вызывается.
+        """
+        contexts = [
+            context.split('-') for context in contexts if context
+        ]
+        if self.exporter is None or not contexts:
+            return deliver(chat_id, text)
+        (trace_id, parent_id), *links = contexts
+        span = Span(DELIVER_SPAN, self.new_id(64), parent_id, {
+            'chat_id': chat_id,
+        })
+        span.links = links
+        try:
+            with self.spans.span(DELIVER_SPAN):
+                delivered = deliver(chat_id, text)
+            if not delivered:
+                span.error = NOT_DELIVERED
+            return delivered
+        except Exception as error:
+            span.error = str(error)
+            raise
+        finally:
+            span.end = time.time_ns()
+            self.export(Trace(trace_id, span))
+
+    def fail(self, error):
+        """Отмечаем итерацию как закончившуюся ошибкой."""
+        trace = self.trace
+        if trace is not None:
+            trace.root.error = str(error)
+
+    def end(self):
+        """Заканчиваем трассу текущей итерации и записываем её."""
+        trace = self.trace
+        if trace is None:
+            return
+        self._local.trace = None
+        trace.root.end = time.time_ns()
+        self.export(trace)
+
+    def export(self, trace):
+        """Записываем трассу; сбой записи только пишем в журнал."""
+        try:
+            self.exporter.export(trace)
+        except OSError as error:
+            logger.warning(TRACE_EXPORT_FAILED.format(
+                path=self.exporter.path, error=error
+            ))
+
+    def finish(self):
+        """Конец итерации однопоточного цикла: трасса и IterationSpans."""
+        self.end()
+        self.spans.finish()
+
+    def stats(self):
+        """Статистика IterationSpans."""
+        return self.spans.stats()
+
+    def close(self):
+        """Заканчиваем трассу и закрываем файл."""
+        self.end()
+        if self.exporter is not None:
+            self.exporter.close()
@@ -0,0 +1,337 @@
+"""Доставка сообщений в несколько каналов сразу.
+
+Основной канал — Telegram через Outbox с повторами. Дополнительные
+каналы (webhook, почта через SMTP, stdout) перечисляются в переменной
+HOMEWORK_BOT_TRANSPORTS, например `telegram,webhook,stdout`. У каждого
+дополнительного канала своя очередь и свой поток: сообщения уходят
+пачками и параллельно, поэтому медленный канал не задерживает остальные.
+В дополнительные каналы сообщение попадает один раз — после того, как
+его принял основной (или сразу, если Telegram в списке нет).
+"""
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+import json
+import logging
+import os
+import queue
+import smtplib
+import sys
+import threading
+import time
+
+from latency import time_left
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS_ENV = 'HOMEWORK_BOT_TRANSPORTS'
+WEBHOOK_URL_ENV = 'HOMEWORK_BOT_WEBHOOK_URL'
+SMTP_HOST_ENV = 'HOMEWORK_BOT_SMTP_HOST'
+SMTP_PORT_ENV = 'HOMEWORK_BOT_SMTP_PORT'
+EMAIL_FROM_ENV = 'HOMEWORK_BOT_EMAIL_FROM'
+EMAIL_TO_ENV = 'HOMEWORK_BOT_EMAIL_TO'
+TELEGRAM = 'telegram'
+DEFAULT_SMTP_HOST = 'localhost'
+DEFAULT_SMTP_PORT = 25
+DEFAULT_EMAIL_FROM = 'homework-bot@localhost'
+EMAIL_SUBJECT = 'Статус домашней работы'
+QUEUE_SIZE = 1000
+BATCH_SIZE = 20
+RETRIES = 3
+RETRY_PAUSE = 1
+TIMEOUT = 10
+
+UNKNOWN_TRANSPORT = 'Неизвестный канал {name}, доступны: {names}'
+TRANSPORT_SETTING_MISSING = 'Для канала {name} не задана переменная {var}.'
+QUEUE_FULL = 'Очередь канала {name} переполнена, сообщение отброшено.'
+BATCH_FAILED = ('Канал {name} не принял {count} сообщений '
+                '(попытка {attempt}): {error}')
+BATCH_DROPPED = ('Канал {name}: {count} сообщений отброшено '
+                 'после {attempts} попыток.')
+STOP_LATE = ('Канал {name} не успел разобрать очередь, '
+             'осталось сообщений: {count}.')
+
+
+class Transport(ABC):
+    """Канал доставки: send_batch получает список пар (chat_id, text)."""
+
+    name = None
+
+    @abstractmethod
+    def send_batch(self, messages):
+        """Доставляем пачку; при неудаче выбрасываем исключение."""
+
+    def close(self):
+        """Освобождаем ресурсы канала."""
+
+
+class StdoutTransport(Transport):
+    """Печать сообщений в поток вывода."""
+
+    name = 'stdout'
+
+    def __init__(self, stream=None):
+        """По умолчанию печатаем в sys.stdout."""
+        self.stream = stream
+
+    def send_batch(self, messages):
+        """Печатаем пачку одной записью."""
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(''.join(
+            f'[{chat_id}] {text}\n' for chat_id, text in messages
+        ))
+        stream.flush()
+
+
+class WebhookTransport(Transport):
+    """POST пачки сообщений в формате JSON на адрес url."""
+
+    name = 'webhook'
+
+    def __init__(self, url, session=None, timeout=TIMEOUT):
+        """Запоминаем адрес; Session создаётся при первой отправке."""
+        self.url = url
+        self.session = session
+        self.timeout = timeout
+
+    def send_batch(self, messages):
+        """Одна пачка — один запрос."""
+        if self.session is None:
+            import requests
+
+            self.session = requests.Session()
+        response = self.session.post(
+            self.url,
+            data=json.dumps({'messages': [
+                {'chat_id': chat_id, 'text': text}
+                for chat_id, text in messages
+            ]}, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json; charset=utf-8'},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+    def close(self):
+        """Закрываем Session."""
+        if self.session is not None:
+            self.session.close()
+
+
+class EmailTransport(Transport):
+    """Письма через SMTP (например, локальный relay)."""
+
+    name = 'email'
+
+    def __init__(self, recipients, sender=DEFAULT_EMAIL_FROM,
+                 host=DEFAULT_SMTP_HOST, port=DEFAULT_SMTP_PORT,
+                 timeout=TIMEOUT):
+        """Запоминаем адресатов и сервер."""
+        self.recipients = recipients
+        self.sender = sender
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def send_batch(self, messages):
+        """Все письма пачки — за одно соединение с сервером."""
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            for _, text in messages:
+                message = EmailMessage()
+                message['Subject'] = EMAIL_SUBJECT
+                message['From'] = self.sender
+                message['To'] = ', '.join(self.recipients)
+                message.set_content(text)
+                smtp.send_message(message)
+
+
+class TransportWorker(threading.Thread):
+    """Поток одного канала: разбирает его очередь пачками."""
+
+    def __init__(self, transport, queue_size=QUEUE_SIZE,
+                 batch_size=BATCH_SIZE, retries=RETRIES,
+                 retry_pause=RETRY_PAUSE):
+        """Создаём очередь канала."""
+        super().__init__(name=f'transport-{transport.name}', daemon=True)
+        self.transport = transport
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_pause = retry_pause
+        self.sent = 0
+        self.dropped = 0
+
+    def put(self, chat_id, text):
+        """Ставим сообщение в очередь канала, не дожидаясь места в ней."""
+        try:
+            self.queue.put_nowait((chat_id, text))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(QUEUE_FULL.format(name=self.transport.name))
+            return False
+        return True
+
+    def next_batch(self):
+        """Ждём первое сообщение и добираем то, что уже есть в очереди."""
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def deliver(self, batch):
+        """Отправляем пачку с повторами; True — доставлена."""
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.transport.send_batch(batch)
+                return True
+            except Exception as error:
+                logger.warning(BATCH_FAILED.format(
+                    name=self.transport.name, count=len(batch),
+                    attempt=attempt, error=error
+                ))
+                if attempt < self.retries:
+                    time.sleep(self.retry_pause * attempt)
+        return False
+
+    def run(self):
+        """Разбираем очередь, пока не встретим None."""
+        while True:
+            batch = self.next_batch()
+            stop = None in batch
+            batch = [message for message in batch if message is not None]
+            if batch and self.deliver(batch):
+                self.sent += len(batch)
+            elif batch:
+                self.dropped += len(batch)
+                logger.error(BATCH_DROPPED.format(
+                    name=self.transport.name, count=len(batch),
+                    attempts=self.retries
+                ))
+            for _ in range(len(batch) + stop):
+                self.queue.task_done()
+            if stop:
+                return
+
+    def drained(self, timeout=None):
+        """Ждём, пока очередь разберут; True — разобрана.
+
+        С timeout ждём не дольше timeout секунд.
+        """
+        with self.queue.all_tasks_done:
+            return self.queue.all_tasks_done.wait_for(
+                lambda: not self.queue.unfinished_tasks, timeout
+            )
+
+    def stop(self, timeout=None):
+        """Доставляем уже поставленное и останавливаем поток.
+
+        С timeout ждём не дольше timeout секунд; если поток не успел,
+        он остаётся дорабатывать в фоне, а неразобранное — в журнале.
+        Возвращает True, если поток остановлен.
+        """
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.join(timeout)
+        if self.is_alive():
+            logger.warning(STOP_LATE.format(
+                name=self.transport.name, count=self.queue.unfinished_tasks
+            ))
+            return False
+        self.transport.close()
+        return True
+
+
+class FanOut:
+    """Функция доставки deliver(chat_id, text) для Outbox.
+
+    Сначала сообщение доставляет основной канал primary (если он есть),
+    затем оно ставится в очереди всех дополнительных каналов.
+    """
+
+    def __init__(self, primary, transports, **worker_options):
+        """Запускаем по потоку на каждый дополнительный канал."""
+        self.primary = primary
+        self.workers = [
+            TransportWorker(transport, **worker_options)
+            for transport in transports
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def __call__(self, chat_id, text):
+        """True, если основной канал доставил сообщение."""
+        if self.primary is not None and not self.primary(chat_id, text):
+            return False
+        for worker in self.workers:
+            worker.put(chat_id, text)
+        return True
+
+    def join(self, timeout=None):
+        """Ждём, пока каналы разберут свои очереди.
+
+        С timeout ждём все каналы вместе не дольше timeout секунд.
+        Возвращает True, если разобраны все очереди.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self.workers:
+            if not worker.drained(time_left(deadline)):
+                return False
+        return True
+
+    def close(self, timeout=None):
+        """Останавливаем потоки каналов, не дольше timeout секунд на все.
+
+        Возвращает True, если остановлены все потоки.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stopped = True
+        for worker in self.workers:
+            stopped = worker.stop(time_left(deadline)) and stopped
+        return stopped
+
+
+def env_setting(name, var, default=None):
+    """Значение переменной окружения для канала name."""
+    value = os.getenv(var, default)
+    if not value:
+        raise ValueError(TRANSPORT_SETTING_MISSING.format(name=name, var=var))
+    return value
+
+
+def build_transport(name):
+    """Канал по имени с настройками из окружения."""
+    if name == StdoutTransport.name:
+        return StdoutTransport()
+    if name == WebhookTransport.name:
+        return WebhookTransport(env_setting(name, WEBHOOK_URL_ENV))
+    if name == EmailTransport.name:
+        return EmailTransport(
+            recipients=env_setting(name, EMAIL_TO_ENV).split(','),
+            sender=env_setting(name, EMAIL_FROM_ENV, DEFAULT_EMAIL_FROM),
+            host=env_setting(name, SMTP_HOST_ENV, DEFAULT_SMTP_HOST),
+            port=int(env_setting(name, SMTP_PORT_ENV, DEFAULT_SMTP_PORT))
+        )
+    raise ValueError(UNKNOWN_TRANSPORT.format(name=name, names=', '.join((
+        TELEGRAM, StdoutTransport.name, WebhookTransport.name,
+        EmailTransport.name
+    ))))
+
+
+def deliver_from_env(telegram_deliver, names=None):
+    """Функция доставки по списку каналов из HOMEWORK_BOT_TRANSPORTS.
+
+    Без переменной (или только с telegram) возвращается telegram_deliver
+    как есть.
+    """
+    if names is None:
+        names = os.getenv(TRANSPORTS_ENV, TELEGRAM)
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    if names == [TELEGRAM]:
+        return telegram_deliver
+    return FanOut(
+        telegram_deliver if TELEGRAM in names else None,
+        [build_transport(name) for name in names if name != TELEGRAM]
+    )